@@ -3,6 +3,8 @@ import pandas as pd
 import time
 import os
 
+from instrument import timed, add
+
 # =========================================
 # 1️⃣  CONFIGURATION GLOBALE
 # =========================================
@@ -18,12 +20,16 @@ ANNEES = ["2021", "2022", "2023"]
 # Communes Paris (ID 75)
 PARIS_COMMUNES = ["Paris"]  # ici tu peux ajouter d'autres communes si nécessaire
 
+# Pause entre deux pages (politesse envers l'API ; 0 pour le stub local)
+PAGE_DELAY = float(os.getenv("ENEDIS_PAGE_DELAY", "0.2"))
+
 # Crée le dossier de sauvegarde si inexistant
 os.makedirs("data", exist_ok=True)
 
 # =========================================
 # 2️⃣  FONCTION D’EXTRACTION ENEDIS
 # =========================================
+@timed("enedis.fetch")
 def fetch_enedis_data(dataset_url, params, filter_commune=None):
     """Récupère les données Enedis avec pagination et filtre sur la commune"""
     all_records = []
@@ -39,6 +45,7 @@ def fetch_enedis_data(dataset_url, params, filter_commune=None):
             print(f"❌ Erreur {r.status_code}: {r.text}")
             break
 
+        add(bytes=len(r.content))
         data = r.json()
         records = data.get("results", [])
         if not records:
@@ -50,7 +57,7 @@ def fetch_enedis_data(dataset_url, params, filter_commune=None):
 
         all_records.extend(records)
         params["offset"] += limit
-        time.sleep(0.2)
+        time.sleep(PAGE_DELAY)
 
         # if params["offset"] + limit > 10000:  # Limite API Enedis
             # print("⚠️  Limite de 10k atteinte pour ce filtre.")
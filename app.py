@@ -2,60 +2,95 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 import joblib
 import plotly.express as px
 import plotly.graph_objects as go
+import os
+from forest_export import load_forest
+from weather_client import WeatherClient, PARIS_ARRONDISSEMENTS
+from batch_forecast import forecast_daily, forecast_intraday
+from materialize_forecasts import latest_etag, read_forecasts
+from instrument import stage
 
 st.set_page_config(page_title="Prévisions Électricité IDF", layout="wide")
 
-# --- Charger le modèle ---
-model = joblib.load("random_forest_meteo_only.pkl")
+# --- Charger le modèle (format compact memory-mappé si disponible) ---
+# Mis en cache pour tout le processus : chargé une seule fois, pas à chaque rerun.
+COMPACT_MODEL_DIR = "models/rf_compact"
+
+@st.cache_resource(show_spinner="Chargement du modèle...")
+def get_model():
+    with stage("dashboard.load_model"):
+        if os.path.isdir(COMPACT_MODEL_DIR):
+            return load_forest(COMPACT_MODEL_DIR)
+        return joblib.load("random_forest_meteo_only.pkl")
+
+model = get_model()
 
 # --- Sidebar ---
 st.sidebar.header("Paramètres")
 city = st.sidebar.text_input("Ville", "Paris")
 days = st.sidebar.slider("Nombre de jours de prévision", 1, 7, 7)
+zones = st.sidebar.multiselect("Arrondissements", list(PARIS_ARRONDISSEMENTS))
 
 # --- Récupérer les données météo ---
-API_KEY = "ad835a8d9bf14e938e0204738251610"
+# Client avec cache disque (TTL), timeouts bornés et repli sur la dernière
+# prévision valide ; le résultat reste en plus en cache Streamlit 30 min.
+@st.cache_resource
+def get_weather_client():
+    return WeatherClient()
 
+@st.cache_data(ttl=1800, show_spinner="Récupération de la météo...")
 def get_weather(city, days=7):
-    url = f"http://api.weatherapi.com/v1/forecast.json?key={API_KEY}&q={city}&days={days}&aqi=no&alerts=no"
-    response = requests.get(url)
-    data = response.json()
-    
-    forecast = []
-    for day in data['forecast']['forecastday']:
-        forecast.append({
-            "date": day["date"],
-            "Pluie_mm": day["day"]["totalprecip_mm"],
-            "Tn_Min": day["day"]["mintemp_c"],
-            "Tx_Max": day["day"]["maxtemp_c"],
-            "T_Moyenne": day["day"]["avgtemp_c"],
-            "Vent_Moyen": day["day"]["maxwind_kph"],  # ou avg si dispo
-            "Vent_Max": day["day"]["maxwind_kph"]
-        })
-    return pd.DataFrame(forecast)
+    df = get_weather_client().forecast(city, days)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    return df
+
+@st.cache_data(ttl=1800, show_spinner="Récupération de la météo par arrondissement...")
+def get_weather_zones(zones, days=7):
+    return get_weather_client().forecast_many(list(zones), days)
 
 weather_df = get_weather(city, days)
 
 st.subheader(f"Prévisions météo pour {city} ({days} jours)")
 st.dataframe(weather_df)
 
-# --- Préparation pour le modèle ---
-weather_df["date"] = pd.to_datetime(weather_df["date"])
-weather_df["annee"] = weather_df["date"].dt.year
-weather_df["mois"] = weather_df["date"].dt.month
-weather_df["jour"] = weather_df["date"].dt.day
-weather_df["jour_semaine"] = weather_df["date"].dt.weekday
-
-# Supprimer les lags (pas disponibles)
-X_pred = weather_df.drop(columns=["date"])
-
 # --- Prédictions ---
-y_pred = model.predict(X_pred)
-weather_df["elec_MW_pred"] = y_pred
+# Arrondissements : lus dans les prévisions pré-calculées (bucket GOLD) si un
+# run existe, sinon calculés avec la ville en un seul appel à model.predict
+# (les lags ne sont pas disponibles). La clé de cache inclut l'ETag de
+# forecasts/latest.json (revalidé toutes les 30 s) : un nouveau run invalide
+# l'entrée au lieu d'attendre l'expiration du TTL.
+@st.cache_data(ttl=30, show_spinner=False)
+def get_forecasts_etag():
+    try:
+        return latest_etag()
+    except Exception:
+        return None
+
+@st.cache_data(ttl=600, show_spinner="Chargement des prévisions pré-calculées...")
+def get_materialized_zones(zones, days, etag):
+    if etag is None:
+        return None
+    try:
+        daily = read_forecasts("daily", list(zones))
+    except Exception:
+        return None
+    if daily is None or set(daily["zone"]) != set(zones):
+        return None
+    return daily[daily["horizon_j"] <= days]
+
+zone_preds = get_materialized_zones(tuple(zones), days, get_forecasts_etag()) if zones else None
+all_weather = weather_df.assign(zone=city)
+if zones and zone_preds is None:
+    all_weather = pd.concat([all_weather, get_weather_zones(tuple(zones), days)], ignore_index=True)
+with stage("dashboard.predict", rows=len(all_weather)):
+    preds = forecast_daily(model, all_weather)
+
+weather_df["date"] = pd.to_datetime(weather_df["date"])
+weather_df["elec_MW_pred"] = preds["prediction"].iloc[:len(weather_df)].to_numpy()
+if zone_preds is None:
+    zone_preds = preds.iloc[len(weather_df):]
 
 # --- Graphiques interactifs ---
 st.subheader("Prévision de consommation électrique (interactive)")
@@ -66,6 +101,13 @@ fig1 = px.line(weather_df, x="date", y="elec_MW_pred", markers=True,
                labels={"elec_MW_pred": "Électricité (MW)", "date": "Date"})
 st.plotly_chart(fig1, use_container_width=True)
 
+if not zone_preds.empty:
+    st.subheader("Prévision par arrondissement")
+    fig_z = px.line(zone_preds, x="date", y="prediction", facet_col="zone", facet_col_wrap=4,
+                    markers=True, labels={"prediction": "Électricité (MW)", "date": "Date"})
+    fig_z.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+    st.plotly_chart(fig_z, use_container_width=True)
+
 # 2️⃣ Graphique combiné météo vs consommation
 st.subheader("Météo vs consommation prévue")
 fig2 = go.Figure()
@@ -103,13 +145,21 @@ st.write(f"Température min : {weather_df['Tn_Min'].min():.2f} °C")
 =======
 
 import os, io
+import logging
 import pandas as pd
 from datetime import timedelta
 import streamlit as st
 from minio import Minio
+from minio.error import S3Error
 from dotenv import load_dotenv
 from joblib import load
 import matplotlib.pyplot as plt
+from model_store import load_model, resolve
+from batch_forecast import forecast_intraday, INTRADAY_FEATURES
+from materialize_forecasts import latest_etag, read_latest, read_forecasts, read_peaks
+from columnar_store import open_parquet, read_schema, read_time_range, time_bounds, TIME_COL
+from downsample import choose_level, downsample_for_chart
+from instrument import stage, timed
 
 st.set_page_config(page_title="SmartEnergy Dashboard", layout="wide")
 
@@ -123,7 +173,23 @@ BUCKET = os.getenv('MINIO_BUCKET','smartcity-energy')
 PREFIX = os.getenv('MINIO_PREFIX','raw/')
 MODELS_PREFIX = PREFIX.replace('raw/','models/')
 
-client = Minio(ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=SECURE)
+# --------------------- Cache ---------------------
+# - ressources (client, modèle) : partagées par tout le processus
+# - données : clé de cache = (objet, ETag) ; l'ETag est revérifié toutes les
+#   ETAG_TTL secondes, un nouvel objet dans MinIO invalide donc l'entrée.
+# Bouger un widget ne relance que la prévision et les graphiques.
+ETAG_TTL = 30
+DATA_TTL = 3600
+
+@st.cache_resource
+def get_client():
+    return Minio(ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, secure=SECURE)
+
+client = get_client()
+
+@st.cache_data(ttl=ETAG_TTL, show_spinner=False)
+def object_etag(bucket, key):
+    return client.stat_object(bucket, key).etag
 
 def read_csv_from_minio(bucket, key):
     resp = client.get_object(bucket, key)
@@ -173,77 +239,185 @@ def detect_target_col(df: pd.DataFrame) -> str:
         return numerics[-1]
     raise ValueError("Impossible de détecter la colonne cible (consommation).")
 
+@st.cache_data(ttl=DATA_TTL, show_spinner="Chargement de l'historique RTE...")
+@timed("dashboard.load_history")
+def load_rte_history(bucket, key, etag):
+    """Lit, normalise et prépare l'historique RTE (`etag` ne sert qu'à la clé de cache)."""
+    df = normalize_cols(read_csv_from_minio(bucket, key))
+    try:
+        time_col = detect_time_col(df)
+    except ValueError:
+        if 'date_-_heure' not in df.columns:
+            raise ValueError("Impossible d'identifier la colonne date/heure. Vérifie le notebook/ingestion.")
+        df['date_heure_std'] = pd.to_datetime(df['date_-_heure'], errors='coerce')
+        time_col = 'date_heure_std'
+    target_col = detect_target_col(df)
+
+    df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
+    df = df.dropna(subset=[time_col, target_col]).sort_values(time_col)
+    return add_calendar_features(df, time_col), time_col, target_col, df[time_col].max()
+
+def add_calendar_features(df, time_col):
+    df['hour'] = df[time_col].dt.hour
+    df['dow'] = df[time_col].dt.dayofweek
+    df['is_weekend'] = df['dow'].isin([5,6]).astype(int)
+    return df
+
+CHART_WIDTH_PX = 1200  # largeur visée du graphique historique
+
+def level_key(key, factor):
+    return key if factor == 1 else key.replace('.parquet', f'_L{factor}.parquet')
+
+@st.cache_data(ttl=DATA_TTL, show_spinner="Chargement de l'historique RTE...")
+@timed("dashboard.load_history")
+def load_rte_window(bucket, key, etag, days):
+    """
+    Lecture Parquet : footer + row groups de la fenêtre [max - days, max],
+    colonnes temps et cible uniquement (`etag` ne sert qu'à la clé de cache).
+    Sur les longues fenêtres, lit un niveau min/max pré-calculé (_L<f>).
+    """
+    pf = open_parquet(bucket, key)  # footer lu une seule fois pour le schéma, les bornes et la lecture
+    target_col = detect_target_col(read_schema(bucket, key, pf=pf))
+    _, t_max = time_bounds(bucket, key, pf=pf)
+    t_min = t_max - pd.Timedelta(days=days)
+    factor = choose_level(t_min, t_max, CHART_WIDTH_PX)
+    try:
+        df = read_time_range(bucket, level_key(key, factor), [target_col], t_min, t_max)
+    except OSError:
+        df = read_time_range(bucket, key, [target_col], t_min, t_max, pf=pf)
+    df = df.dropna(subset=[TIME_COL, target_col])
+    return add_calendar_features(df, TIME_COL), TIME_COL, target_col, t_max
+
+@st.cache_data(ttl=ETAG_TTL, show_spinner=False)
+def current_model_version(name):
+    return resolve(name)
+
+@st.cache_resource(show_spinner="Chargement du modèle...")
+@timed("dashboard.load_model", rows=None)
+def get_registry_model(name, version):
+    # refuse une version publiée pour d'autres features (ex. modèle météo journalier)
+    return load_model(name, version, features=INTRADAY_FEATURES)
+
+@st.cache_resource(show_spinner="Chargement du modèle...")
+@timed("dashboard.load_model", rows=None)
+def get_legacy_model(bucket, key, etag):
+    resp = client.get_object(bucket, key)
+    try:
+        return load(io.BytesIO(resp.read()))
+    finally:
+        resp.close(); resp.release_conn()
+
+@st.cache_data(ttl=ETAG_TTL, show_spinner=False)
+def forecasts_etag():
+    return latest_etag()
+
+@st.cache_data(ttl=DATA_TTL, show_spinner="Chargement des prévisions...")
+def load_materialized(etag):
+    latest = read_latest()
+    return latest, read_forecasts("intraday", ["national"], latest), read_peaks(latest)
+
 # --------------------- Sidebar ---------------------
 st.sidebar.title("⚙️ Options")
 forecast_hours = st.sidebar.select_slider("Horizon de prévision", options=[6,12,24], value=24)
 peak_threshold = st.sidebar.number_input("Seuil d'alerte pic (MW)", value=60000.0, step=500.0, format="%.0f")
+history_days = st.sidebar.select_slider("Fenêtre historique (jours)", options=[1,3,7,14,30,90,365], value=30)
 rte_key = PREFIX + "rte_eco2mix_national_tr_last30d.csv"
+rte_parquet_key = PREFIX.replace('raw/','silver/') + "rte_eco2mix_national_tr.parquet"
 model_key = MODELS_PREFIX + "rf_baseline.joblib"
+MODEL_NAME = os.getenv('MODEL_NAME', 'rf_baseline')
+if st.sidebar.button("🔄 Recharger les données"):
+    st.cache_data.clear()
 
 st.title("⚡ SmartEnergy – Consommation & Prévision courte échéance")
 
 # --------------------- Charge RTE ---------------------
+# Parquet colonnaire (seule la fenêtre affichée est transférée) ; sinon CSV
+# complet des 30 derniers jours. Seule l'absence de la copie silver déclenche
+# le repli silencieux, toute autre erreur est journalisée et affichée.
+SILVER_MISSING = ("NoSuchKey", "NoSuchBucket")
+df = None
 try:
-    df = read_csv_from_minio(BUCKET, rte_key)
+    df, time_col, target_col, last_ts = load_rte_window(BUCKET, rte_parquet_key,
+                                               object_etag(BUCKET, rte_parquet_key), history_days)
+    history_label = f"{history_days} derniers jours"
+except S3Error as e:
+    if e.code not in SILVER_MISSING:
+        logging.exception("Lecture Parquet silver %s", rte_parquet_key)
+        st.warning(f"Copie Parquet illisible ({e.code}), repli sur le CSV RTE.")
 except Exception as e:
-    st.error(f"Erreur de lecture du CSV RTE depuis MinIO : {e}")
-    st.stop()
-
-df = normalize_cols(df)
-try:
-    time_col = detect_time_col(df)
-except Exception:
-    if 'date_-_heure' in df.columns:
-        df['date_heure_std'] = pd.to_datetime(df['date_-_heure'], errors='coerce')
-        time_col = 'date_heure_std'
-    else:
-        st.error("Impossible d'identifier la colonne date/heure. Vérifie le notebook/ingestion.")
+    logging.exception("Lecture Parquet silver %s", rte_parquet_key)
+    st.warning(f"Copie Parquet illisible ({e}), repli sur le CSV RTE.")
+if df is None:
+    try:
+        df, time_col, target_col, last_ts = load_rte_history(BUCKET, rte_key, object_etag(BUCKET, rte_key))
+        history_label = "30 derniers jours"
+    except ValueError as e:
+        st.error(str(e)); st.stop()
+    except Exception as e:
+        st.error(f"Erreur de lecture du CSV RTE depuis MinIO : {e}")
         st.stop()
 
-try:
-    target_col = detect_target_col(df)
-except Exception as e:
-    st.error(str(e)); st.stop()
-
-df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
-df = df.dropna(subset=[time_col, target_col]).sort_values(time_col)
-df['hour'] = df[time_col].dt.hour
-df['dow'] = df[time_col].dt.dayofweek
-df['is_weekend'] = df['dow'].isin([5,6]).astype(int)
-
 # --------------------- Graph historique ---------------------
-st.subheader("Historique – 30 derniers jours")
-hist = df[[time_col, target_col]].set_index(time_col)
+st.subheader(f"Historique – {history_label}")
+# min/max par bucket : quelques milliers de points au plus, pics conservés
+hist = downsample_for_chart(df[[time_col, target_col]], time_col, target_col, CHART_WIDTH_PX)
+hist = hist.set_index(time_col)
 st.line_chart(hist)
 
-# --------------------- Chargement du modèle ---------------------
-model = None
+# --------------------- Prévisions pré-calculées ---------------------
+# Écrites dans le bucket GOLD par materialize_forecasts.py ; la clé de cache
+# est l'ETag de forecasts/latest.json, un nouveau run invalide donc l'entrée.
+materialized = None
 try:
-    resp = client.get_object(BUCKET, model_key)
-    by = io.BytesIO(resp.read())
-    resp.close(); resp.release_conn()
-    model = load(by)
-    st.success("Modèle chargé depuis MinIO : rf_baseline.joblib")
+    etag = forecasts_etag()
+    if etag is not None:
+        materialized = load_materialized(etag)
 except Exception:
-    st.info("Modèle introuvable dans MinIO. Lance d'abord le notebook pour l'entraîner et le sauvegarder.")
-    
-# --------------------- Prévision ---------------------
-if model is not None:
-    periods = int(forecast_hours * 60 / 15)  # pas 15 min
-    last_ts = df[time_col].max()
-    future_idx = pd.date_range(last_ts + pd.Timedelta(minutes=15), periods=periods, freq="15T")
-    fut = pd.DataFrame({time_col: future_idx})
-    fut['hour'] = fut[time_col].dt.hour
-    fut['dow'] = fut[time_col].dt.dayofweek
-    fut['is_weekend'] = fut['dow'].isin([5,6]).astype(int)
-
-    feats = ['hour','dow','is_weekend']
-    fut['prediction'] = model.predict(fut[feats])
+    materialized = None
 
+model = None
+if materialized is None:
+    # --------------------- Chargement du modèle ---------------------
+    # Registre versionné (bucket GOLD) : téléchargé une fois par version, puis
+    # gardé en cache disque + mémoire ; sinon ancien emplacement MinIO.
+    try:
+        model, manifest = get_registry_model(MODEL_NAME, current_model_version(MODEL_NAME))
+        st.success(f"Modèle chargé depuis le registre GOLD : {MODEL_NAME}@{manifest['version'][:12]}")
+    except ValueError as e:
+        # version incompatible ou artefact corrompu : ne pas masquer par le repli
+        st.error(f"Modèle {MODEL_NAME} du registre GOLD inutilisable : {e}")
+    except Exception:
+        try:
+            model = get_legacy_model(BUCKET, model_key, object_etag(BUCKET, model_key))
+            st.success("Modèle chargé depuis MinIO : rf_baseline.joblib")
+        except Exception:
+            st.info("Modèle introuvable dans MinIO. Lance d'abord le notebook pour l'entraîner et le sauvegarder.")
+
+# --------------------- Prévision ---------------------
+fut = None
+nb_peaks = None
+if materialized is not None:
+    latest, intraday, peaks = materialized
+    fut = intraday[(intraday['zone'] == 'national') & (intraday['horizon_h'] <= forecast_hours)]
+    fut = fut.rename(columns={"timestamp": time_col})
+    row = peaks[(peaks['zone'] == 'national') & (peaks['horizon_h'] == forecast_hours)
+                & (peaks['threshold_mw'] == peak_threshold)]
+    if len(row):
+        nb_peaks = int(row['n_peaks'].iloc[0])
+    st.caption(f"Prévisions pré-calculées – run {latest['run_id']} (dernière mesure {latest['last_observation']})")
+elif model is not None:
+    # pas 15 min ; forecast_intraday accepte plusieurs zones en un seul predict
+    with stage("dashboard.predict"):
+        fut = forecast_intraday(model, {"national": last_ts}, forecast_hours,
+                                features=INTRADAY_FEATURES)
+    fut = fut.rename(columns={"timestamp": time_col})
+
+if fut is not None:
     st.subheader(f"Prévision prochaine(s) {forecast_hours} h (pas 15 min)")
     st.line_chart(fut.set_index(time_col)['prediction'])
 
-    nb_peaks = int((fut['prediction'] > peak_threshold).sum())
+    if nb_peaks is None:
+        nb_peaks = int((fut['prediction'] > peak_threshold).sum())
     if nb_peaks > 0:
         st.warning(f"⚠️ {nb_peaks} intervalles dépassent le seuil de {peak_threshold:.0f} MW.")
     else:
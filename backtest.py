@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+backtest.py
+
+Backtesting walk-forward (rolling-origin) des modèles enregistrés dans
+model_registry.py.
+
+- les features sont calculées une seule fois puis écrites en .npy ; chaque
+  worker du pool de processus les ouvre en memory-map (pas de copie par fold)
+- chaque (modèle, fold) est une tâche indépendante exécutée en parallèle
+- les métriques par fold (MAE / RMSE / R²) sont écrites en Parquet
+- les modèles à lags de la cible (model_registry.is_recursive) sont évalués
+  comme au service : sur l'horizon du fold, chaque pas reçoit en lags les
+  prédictions des pas précédents (RecursiveForecaster), pas les valeurs
+  observées ; sans cela leur score serait un score à 1 pas
+
+Exemple :
+    python backtest.py --models linear random_forest --initial 730 --horizon 7 --step 7
+"""
+
+import os
+import time
+import logging
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from model_registry import MODELS, DATA_PATH, TARGET, load_dataset, make_model, model_features, is_recursive
+from recursive_forecast import LAG_FEATURES, LagState, RecursiveForecaster
+
+OUTPUT_DIR = "backtest_results"
+
+# Matrices partagées, ouvertes une fois par worker
+_X = None
+_Y = None
+_COLS = None
+
+
+# ----------------------------------------------------------------------
+# Découpage rolling-origin
+# ----------------------------------------------------------------------
+def rolling_origin_folds(n, initial, horizon, step, window=None):
+    """
+    Renvoie la liste des folds (train_start, train_end, test_end) en indices.
+    - initial : taille minimale du premier jeu d'entraînement
+    - horizon : nombre de pas prédits par fold
+    - step    : décalage de l'origine entre deux folds
+    - window  : si renseigné, fenêtre glissante de cette taille (sinon expanding)
+    """
+    folds = []
+    origin = initial
+    while origin + horizon <= n:
+        start = 0 if window is None else max(0, origin - window)
+        folds.append((start, origin, origin + horizon))
+        origin += step
+    return folds
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+def _init_worker(x_path, y_path, cols):
+    global _X, _Y, _COLS
+    _X = np.load(x_path, mmap_mode="r")
+    _Y = np.load(y_path, mmap_mode="r")
+    _COLS = {c: i for i, c in enumerate(cols)}
+
+
+def _predict_recursive(model, features, train_end, test_end):
+    """
+    Prédit [train_end, test_end) pas à pas : les lags partent des valeurs
+    observées avant l'origine, puis sont alimentés par les prédictions du fold.
+    """
+    exog_features = [c for c in features if c not in LAG_FEATURES]
+    state = LagState(["fold"], _Y[:train_end][None, :])
+    exog = pd.DataFrame(_X[train_end:test_end][:, [_COLS[c] for c in exog_features]], columns=exog_features)
+    exog["zone"] = "fold"
+    exog["date"] = np.arange(train_end, test_end)
+    return RecursiveForecaster(model, state, exog_features).forecast(exog)["prediction"].to_numpy()
+
+
+def _run_fold(model_name, fold_id, train_start, train_end, test_end, params):
+    features = model_features(model_name)
+    recursive = is_recursive(model_name)
+    idx = [_COLS[c] for c in features]
+    X_train = _X[train_start:train_end][:, idx]
+    y_train = _Y[train_start:train_end]
+    X_test = _X[train_end:test_end][:, idx]
+    y_test = _Y[train_end:test_end]
+
+    model = make_model(model_name, **params)
+    t0 = time.perf_counter()
+    # noms de colonnes conservés pour que le forecaster récursif retrouve l'ordre des features
+    model.fit(pd.DataFrame(X_train, columns=features) if recursive else X_train, y_train)
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    y_pred = _predict_recursive(model, features, train_end, test_end) if recursive else model.predict(X_test)
+    predict_s = time.perf_counter() - t0
+
+    return {
+        "model": model_name,
+        "fold": fold_id,
+        "scoring": "recursive" if recursive else "direct",
+        "train_start": train_start,
+        "train_end": train_end,
+        "test_end": test_end,
+        "n_train": len(y_train),
+        "n_test": len(y_test),
+        "mae": mean_absolute_error(y_test, y_pred),
+        "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "r2": r2_score(y_test, y_pred) if len(y_test) > 1 else np.nan,
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+    }
+
+
+# ----------------------------------------------------------------------
+# Orchestration
+# ----------------------------------------------------------------------
+def run_backtest(models, initial, horizon, step, window=None, workers=None,
+                 data_path=DATA_PATH, target=TARGET, model_params=None):
+    """
+    Lance le backtest de `models` et renvoie un DataFrame (une ligne par
+    modèle × fold) avec les dates de début/fin de chaque fold.
+    """
+    model_params = model_params or {}
+    unknown = [m for m in models if m not in MODELS]
+    if unknown:
+        raise ValueError(f"Modèles inconnus : {unknown} (disponibles : {sorted(MODELS)})")
+
+    feats, y = load_dataset(data_path, target)
+    cols = sorted({c for m in models for c in model_features(m)})
+    folds = rolling_origin_folds(len(feats), initial, horizon, step, window)
+    if not folds:
+        raise ValueError(f"Pas assez d'historique ({len(feats)} lignes) pour initial={initial}, horizon={horizon}")
+    logging.info("%d folds × %d modèles sur %d lignes", len(folds), len(models), len(feats))
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="backtest_") as tmp:
+        x_path = os.path.join(tmp, "X.npy")
+        y_path = os.path.join(tmp, "y.npy")
+        np.save(x_path, feats[cols].to_numpy(dtype=np.float64))
+        np.save(y_path, y.to_numpy(dtype=np.float64))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(x_path, y_path, cols)) as pool:
+            futures = [
+                pool.submit(_run_fold, m, i, *fold, model_params.get(m, {}))
+                for m in models
+                for i, fold in enumerate(folds)
+            ]
+            for fut in as_completed(futures):
+                rows.append(fut.result())
+
+    results = pd.DataFrame(rows).sort_values(["model", "fold"]).reset_index(drop=True)
+    dates = feats.index
+    results["test_start_date"] = dates[results["train_end"]]
+    results["test_end_date"] = dates[results["test_end"] - 1]
+    return results
+
+
+def save_results(results, output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, datetime.utcnow().strftime("backtest_%Y%m%dT%H%M%SZ.parquet"))
+    results.to_parquet(path, index=False)
+    return path
+
+
+def summarize(results):
+    """Moyenne des métriques par modèle (tri par MAE croissante)."""
+    return (results.groupby("model")[["mae", "rmse", "r2", "fit_s", "predict_s"]]
+            .mean()
+            .sort_values("mae"))
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", default=sorted(MODELS))
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--target", default=TARGET)
+    parser.add_argument("--initial", type=int, default=730, help="taille du 1er train (jours)")
+    parser.add_argument("--horizon", type=int, default=7, help="pas prédits par fold")
+    parser.add_argument("--step", type=int, default=7, help="décalage entre folds")
+    parser.add_argument("--window", type=int, default=None, help="fenêtre glissante (sinon expanding)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=OUTPUT_DIR)
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    t0 = time.perf_counter()
+    results = run_backtest(args.models, args.initial, args.horizon, args.step,
+                           window=args.window, workers=args.workers,
+                           data_path=args.data, target=args.target)
+    path = save_results(results, args.out)
+
+    print("=== Backtest walk-forward ===")
+    print(summarize(results).to_string(float_format=lambda v: f"{v:.3f}"))
+    print(f"\n✅ {len(results)} folds enregistrés dans {path} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+batch_forecast.py
+
+Prévisions en batch pour plusieurs zones × horizons : une seule matrice de
+features est construite (opérations vectorisées, sans boucle par zone) puis
+passée en un seul appel à `model.predict`. Le résultat est un DataFrame
+"tidy" (une ligne par zone × instant) facile à facetter dans le dashboard.
+
+- forecast_daily    : modèle météo journalier (Random Forest météo)
+- forecast_intraday : modèle calendaire 15 min (hour / dow / is_weekend)
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrument import timed
+
+WEATHER_COLS = ["Pluie_mm", "Tn_Min", "Tx_Max", "T_Moyenne", "Vent_Moyen", "Vent_Max"]
+DAILY_FEATURES = WEATHER_COLS + ["annee", "mois", "jour", "jour_semaine"]
+INTRADAY_FEATURES = ["hour", "dow", "is_weekend"]
+
+
+def _feature_order(model, default):
+    names = getattr(model, "feature_names_in_", None)
+    return list(names) if names is not None else list(default)
+
+
+@timed("forecast.daily")
+def forecast_daily(model, weather, features=None):
+    """
+    `weather` : une ligne par (zone, date) avec les colonnes météo
+    (cf. weather_client.WeatherClient.forecast_many).
+    Renvoie zone, date, horizon_j, colonnes météo, prediction.
+    """
+    df = weather.copy()
+    if "zone" not in df.columns:
+        df["zone"] = "default"
+    dates = pd.to_datetime(df["date"])
+    df["date"] = dates
+    df["annee"] = dates.dt.year
+    df["mois"] = dates.dt.month
+    df["jour"] = dates.dt.day
+    df["jour_semaine"] = dates.dt.weekday
+    df["horizon_j"] = (dates - dates.groupby(df["zone"]).transform("min")).dt.days + 1
+
+    cols = features or _feature_order(model, DAILY_FEATURES)
+    df["prediction"] = model.predict(df[cols])
+    return df[["zone", "date", "horizon_j"] + WEATHER_COLS + ["prediction"]]
+
+
+@timed("forecast.intraday")
+def forecast_intraday(model, last_ts, hours, freq_minutes=15, features=None):
+    """
+    `last_ts` : dernier horodatage observé par zone (dict ou Series zone -> ts).
+    `hours`   : horizon maximal (int) ou liste d'horizons ; la grille est
+    construite jusqu'au plus grand et chaque pas est étiqueté par le plus
+    petit horizon qui le couvre.
+    Renvoie zone, timestamp, step, horizon_h, hour, dow, is_weekend, prediction.
+    """
+    last_ts = pd.Series(last_ts)
+    horizons = np.sort(np.atleast_1d(hours))
+    periods = int(horizons[-1] * 60 / freq_minutes)
+
+    # (n_zones, periods) construit par broadcasting puis aplati
+    steps = np.arange(1, periods + 1)
+    base = pd.to_datetime(last_ts.values).values.astype("datetime64[ns]")
+    ts = base[:, None] + (steps * freq_minutes).astype("timedelta64[m]")[None, :]
+
+    df = pd.DataFrame({
+        "zone": np.repeat(last_ts.index.values, periods),
+        "timestamp": ts.ravel(),
+        "step": np.tile(steps, len(last_ts)),
+    })
+    step_hours = df["step"].to_numpy() * freq_minutes / 60
+    df["horizon_h"] = horizons[np.searchsorted(horizons, step_hours)]
+    df["hour"] = df["timestamp"].dt.hour
+    df["dow"] = df["timestamp"].dt.dayofweek
+    df["is_weekend"] = df["dow"].isin([5, 6]).astype(int)
+
+    cols = features or _feature_order(model, INTRADAY_FEATURES)
+    df["prediction"] = model.predict(df[cols])
+    return df
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Suite de benchmarks reproductible du pipeline, sur données synthétiques
+(synthetic_data.py) à échelle fixée, pour suivre débit et mémoire d'un
+commit à l'autre.
+
+Étapes mesurées :
+- enedis.fetch               : fetch_enedis_data contre l'API paginée du stub local
+- clean.load_consommation    : load_clean_consommation
+- clean.load_meteo           : load_clean_meteo
+- clean.merge                : merge_datasets
+- model.fit.<nom>            : entraînement des modèles du registre
+- dashboard.predict_daily    : forecast_daily (Paris + arrondissements, météo stub)
+- dashboard.predict_intraday : forecast_intraday (15 min, toutes zones)
+
+Chaque étape est exécutée une fois à blanc puis --repeats fois (temps médian
+et minimum, lignes/s, Mo/s), puis une fois pour le pic de RSS et une
+dernière fois sous tracemalloc pour le pic d'allocation. Les données sont régénérées seulement si l'échelle ou la
+graine changent (manifest.json).
+
+Résultats : RESULTS_DIR/<commit>-<échelle>.json. --compare compare au
+résultat d'un autre commit (ou au précédent) et sort en erreur si une étape
+régresse de plus de --threshold en temps médian ou en mémoire.
+
+Exemple :
+    python benchmark.py --scale small
+    python benchmark.py --scale medium --compare previous
+    python benchmark.py --only clean --compare main --threshold 0.15
+"""
+
+import io
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import tempfile
+import logging
+import subprocess
+import statistics
+import tracemalloc
+from datetime import date, datetime
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from instrument import RssPeak
+
+DATA_DIR = os.getenv("BENCH_DATA_DIR", "data/synthetic")
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "benchmarks/results")
+REPEATS = 3
+THRESHOLD = 0.10
+MIN_DELTA_S = 0.005     # écarts de temps plus petits ignorés (bruit)
+MIN_DELTA_MB = 1.0      # idem pour la mémoire
+SEED = 0
+
+SCALES = {
+    "small": dict(years=2, regions=1, stations=3, freq="30min", eco2mix_years=0.25, enedis_rows=5000),
+    "medium": dict(years=5, regions=13, stations=10, freq="15min", eco2mix_years=1, enedis_rows=50000),
+    "large": dict(years=10, regions=13, stations=30, freq="15min", eco2mix_years=3, enedis_rows=200000),
+}
+FIT_MODELS = ["linear", "random_forest", "hist_gbm"]
+FORECAST_DAYS = 7
+INTRADAY_HOURS = 48
+
+
+# ----------------------------------------------------------------------
+# Données
+# ----------------------------------------------------------------------
+def prepare_data(scale, seed=SEED, data_dir=DATA_DIR):
+    """Génère (ou réutilise) le jeu synthétique ; renvoie (répertoire, manifeste)."""
+    params = {**SCALES[scale], "seed": seed}
+    out = os.path.join(data_dir, f"{scale}-s{seed}")
+    manifest_path = os.path.join(out, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params and all(os.path.exists(p) for p, _ in manifest["files"].values()):
+            logging.info("Données synthétiques réutilisées : %s", out)
+            return out, manifest
+
+    logging.info("Génération des données synthétiques (%s) dans %s", scale, out)
+    files = synthetic_data.generate(out, **params)
+    manifest = {"params": params, "files": files}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return out, manifest
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+# nom -> fonction(ctx) renvoyant (callable mesuré, lignes, octets)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def wrap(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return wrap
+
+
+def _file(ctx, name):
+    return ctx["manifest"]["files"][name]
+
+
+def _cached(ctx, key, build):
+    """Résultat intermédiaire partagé entre benchmarks (hors mesure)."""
+    if key not in ctx["cache"]:
+        ctx["cache"][key] = build()
+    return ctx["cache"][key]
+
+
+@benchmark("enedis.fetch")
+def _bench_enedis(ctx):
+    import api_enedis
+    import stub_server
+    api_enedis.PAGE_DELAY = 0.0
+    server, base = _cached(ctx, "stub", lambda: stub_server.serve(
+        ctx["dir"], port=0, handler=stub_server.EnedisHandler,
+        enedis_dir=os.path.join(ctx["dir"], "enedis")))
+    slug = synthetic_data.ENEDIS_DATASETS["conso_residentielle"]
+    url = f"{base}/api/explore/v2.1/catalog/datasets/{slug}/records"
+    path, rows = _file(ctx, "enedis_conso_residentielle")
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            return api_enedis.fetch_enedis_data(url, {"limit": 1000}, filter_commune=api_enedis.PARIS_COMMUNES)
+    return run, rows, os.path.getsize(path)
+
+
+@benchmark("clean.load_consommation")
+def _bench_load_cons(ctx):
+    from clean_data import load_clean_consommation
+    path, rows = _file(ctx, "consommation_idf")
+    return (lambda: load_clean_consommation(path)), rows, os.path.getsize(path)
+
+
+@benchmark("clean.load_meteo")
+def _bench_load_meteo(ctx):
+    from clean_data import load_clean_meteo
+    path, rows = _file(ctx, "meteo_csv")
+    return (lambda: load_clean_meteo(path)), rows, os.path.getsize(path)
+
+
+def _merged(ctx):
+    from clean_data import load_clean_consommation, load_clean_meteo, merge_datasets
+    cons = _cached(ctx, "cons", lambda: load_clean_consommation(_file(ctx, "consommation_idf")[0]))
+    meteo = _cached(ctx, "meteo", lambda: load_clean_meteo(_file(ctx, "meteo_csv")[0]))
+    return cons, meteo, _cached(ctx, "merged", lambda: merge_datasets(cons, meteo))
+
+
+@benchmark("clean.merge")
+def _bench_merge(ctx):
+    from clean_data import merge_datasets
+    cons, meteo, _ = _merged(ctx)
+    return (lambda: merge_datasets(cons, meteo)), len(cons) + len(meteo), None
+
+
+def _training_set(ctx):
+    from model_registry import TARGET, build_features
+    def build():
+        df = build_features(_merged(ctx)[2].sort_index())
+        return df.dropna(subset=[TARGET])
+    return _cached(ctx, "features", build)
+
+
+def _fit_benchmark(name):
+    def setup(ctx):
+        from model_registry import TARGET, make_model, model_features
+        df = _training_set(ctx)
+        X, y = df[model_features(name)], df[TARGET]
+        return (lambda: make_model(name).fit(X, y)), len(X), None
+    benchmark(f"model.fit.{name}")(setup)
+
+
+for _name in FIT_MODELS:
+    _fit_benchmark(_name)
+
+
+@benchmark("dashboard.predict_daily")
+def _bench_predict_daily(ctx):
+    from model_registry import TARGET, make_model, model_features
+    from batch_forecast import forecast_daily
+    from weather_client import PARIS_ARRONDISSEMENTS, StubProvider, WeatherClient
+    features = model_features("random_forest")
+    df = _training_set(ctx)
+    model = _cached(ctx, "daily_model", lambda: make_model("random_forest").fit(df[features], df[TARGET]))
+    client = WeatherClient(StubProvider(start=date(2024, 1, 1)), cache_dir=ctx["tmp"])
+    weather = client.forecast_many(["Paris"] + list(PARIS_ARRONDISSEMENTS), FORECAST_DAYS)
+    return (lambda: forecast_daily(model, weather, features)), len(weather), None
+
+
+@benchmark("dashboard.predict_intraday")
+def _bench_predict_intraday(ctx):
+    from model_registry import make_model
+    from batch_forecast import forecast_intraday, INTRADAY_FEATURES
+    def fit():
+        eco = pd.read_csv(_file(ctx, "eco2mix")[0], sep=";")
+        ts = pd.to_datetime(eco["Date"] + " " + eco["Heure"])
+        X = pd.DataFrame({"hour": ts.dt.hour, "dow": ts.dt.dayofweek,
+                          "is_weekend": (ts.dt.dayofweek >= 5).astype(int)})[INTRADAY_FEATURES]
+        return make_model("hist_gbm", max_iter=100).fit(X, eco["Consommation (MW)"]), ts.max()
+    model, last_ts = _cached(ctx, "intraday_model", fit)
+    zones = ["national"] + [name for _, name, _ in synthetic_data.REGIONS]
+    last = {zone: last_ts for zone in zones}
+    rows = len(zones) * INTRADAY_HOURS * 4
+    return (lambda: forecast_intraday(model, last, INTRADAY_HOURS, features=INTRADAY_FEATURES)), rows, None
+
+
+# ----------------------------------------------------------------------
+# Mesure
+# ----------------------------------------------------------------------
+def measure(fn, repeats=REPEATS):
+    """Temps (1 exécution à blanc + `repeats`), puis pic de RSS et pic d'allocation (tracemalloc)."""
+    fn()
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    with RssPeak() as rss:
+        fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak, rss.peak
+
+
+def run_benchmarks(ctx, names, repeats=REPEATS):
+    results = {}
+    for name in names:
+        fn, rows, nbytes = BENCHMARKS[name](ctx)
+        times, peak, hwm = measure(fn, repeats)
+        median = statistics.median(times)
+        results[name] = {
+            "repeats": repeats,
+            "median_s": round(median, 6),
+            "min_s": round(min(times), 6),
+            "rows": rows,
+            "bytes": nbytes,
+            "rows_per_s": round(rows / median, 1) if rows and median else None,
+            "mb_per_s": round(nbytes / 2**20 / median, 2) if nbytes and median else None,
+            "peak_alloc_mb": round(peak / 2**20, 2),
+            "peak_rss_mb": round(hwm / 2**20, 1),
+        }
+        logging.info("%-28s médiane %8.4fs  %s", name, median,
+                     f"{results[name]['rows_per_s']:,.0f} lignes/s" if results[name]["rows_per_s"] else "")
+    return results
+
+
+# ----------------------------------------------------------------------
+# Résultats et comparaison
+# ----------------------------------------------------------------------
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def git_commit():
+    """(sha court, arbre modifié ?) du commit courant."""
+    sha = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return sha, dirty
+
+
+def environment():
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def result_path(commit, scale, results_dir=RESULTS_DIR):
+    return os.path.join(results_dir, f"{commit}-{scale}.json")
+
+
+def save_result(result, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    path = result_path(result["commit"] + ("-dirty" if result["dirty"] else ""), result["scale"], results_dir)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def load_baseline(ref, scale, current_commit, results_dir=RESULTS_DIR):
+    """
+    Résultat de référence : `previous` = dernier résultat enregistré d'un autre
+    commit à la même échelle ; sinon une révision git (branche, tag, sha).
+    """
+    if ref == "previous":
+        candidates = []
+        for name in os.listdir(results_dir) if os.path.isdir(results_dir) else []:
+            if not name.endswith(f"-{scale}.json"):
+                continue
+            with open(os.path.join(results_dir, name), encoding="utf-8") as f:
+                r = json.load(f)
+            if r.get("commit") != current_commit:
+                candidates.append(r)
+        return max(candidates, key=lambda r: r["timestamp"]) if candidates else None
+    sha = _git("rev-parse", "--short", ref) or ref
+    for suffix in ("", "-dirty"):
+        path = result_path(sha + suffix, scale, results_dir)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Lignes de comparaison par étape ; `regression` si temps médian ou mémoire dépassent le seuil."""
+    rows = []
+    for name, cur in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            rows.append({"stage": name, "regression": False, "note": "nouvelle étape"})
+            continue
+        dt = cur["median_s"] - base["median_s"]
+        dm = cur["peak_alloc_mb"] - base["peak_alloc_mb"]
+        time_ratio = dt / base["median_s"] if base["median_s"] else 0.0
+        mem_ratio = dm / base["peak_alloc_mb"] if base["peak_alloc_mb"] else 0.0
+        slower = time_ratio > threshold and dt > MIN_DELTA_S
+        heavier = mem_ratio > threshold and dm > MIN_DELTA_MB
+        rows.append({
+            "stage": name, "time_ratio": time_ratio, "mem_ratio": mem_ratio,
+            "regression": slower or heavier,
+            "note": ", ".join(n for n, hit in (("temps", slower), ("mémoire", heavier)) if hit),
+        })
+    return rows
+
+
+def print_report(result, comparison=None):
+    by_stage = {r["stage"]: r for r in comparison or []}
+    print(f"\nCommit {result['commit']}{' (modifié)' if result['dirty'] else ''} – échelle {result['scale']}")
+    print(f"{'étape':<28} {'médiane (s)':>11} {'lignes/s':>13} {'Mo/s':>8} {'alloc (Mo)':>10}"
+          + ("   Δ temps   Δ mém." if comparison else ""))
+    for name, r in result["benchmarks"].items():
+        line = (f"{name:<28} {r['median_s']:>11.4f} {r['rows_per_s'] or 0:>13,.0f} "
+                f"{r['mb_per_s'] or 0:>8.1f} {r['peak_alloc_mb']:>10.1f}")
+        c = by_stage.get(name)
+        if c and "time_ratio" in c:
+            line += f"  {c['time_ratio']:+8.1%} {c['mem_ratio']:+8.1%}"
+        if c and c["note"]:
+            line += f"  {'❌' if c['regression'] else ''} {c['note']}"
+        print(line)
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--only", nargs="+", default=None, help="préfixes d'étapes (ex. clean model.fit)")
+    parser.add_argument("--compare", default=None, help="commit / branche de référence, ou 'previous'")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="régression tolérée (0.10 = 10 %%)")
+    parser.add_argument("--no-save", action="store_true", help="n'enregistre pas le résultat")
+    parser.add_argument("--list", action="store_true", help="liste les étapes et quitte")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    names = [n for n in BENCHMARKS if not args.only or any(n.startswith(p) for p in args.only)]
+    if not names:
+        sys.exit(f"Aucune étape ne correspond à {args.only}")
+
+    data_dir, manifest = prepare_data(args.scale, args.seed)
+    commit, dirty = git_commit()
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = {"dir": data_dir, "manifest": manifest, "tmp": tmp, "cache": {}}
+        try:
+            results = run_benchmarks(ctx, names, args.repeats)
+        finally:
+            if "stub" in ctx["cache"]:
+                ctx["cache"]["stub"][0].shutdown()
+
+    result = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "scale": args.scale,
+        "seed": args.seed,
+        "params": manifest["params"],
+        "environment": environment(),
+        "benchmarks": results,
+    }
+
+    comparison = None
+    if args.compare:
+        baseline = load_baseline(args.compare, args.scale, commit)
+        if baseline is None:
+            logging.warning("Aucun résultat de référence pour '%s' (échelle %s)", args.compare, args.scale)
+        else:
+            comparison = compare(result, baseline, args.threshold)
+            print(f"\nRéférence : commit {baseline['commit']} ({baseline['timestamp']})")
+    print_report(result, comparison)
+
+    if not args.no_save:
+        print(f"\n✅ Résultats enregistrés dans {save_result(result)}")
+    regressions = [c["stage"] for c in comparison or [] if c["regression"]]
+    if regressions:
+        print(f"❌ {len(regressions)} régression(s) > {args.threshold:.0%} : {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@
 
 import pandas as pd
 
+from instrument import timed, path_size
+
 # --- PARAMÈTRES GÉNÉRAUX ---
 TZ = "Europe/Paris"
 PATH_CONS = "data/consommation-idf.csv"
@@ -12,6 +14,7 @@ PATH_METEO = "data/meteo75.csv"
 OUTPUT_PATH = "cleaned_data/idf_conso_meteo_clean.parquet"
 
 # --- 1. CHARGEMENT ET NETTOYAGE CONSOMMATION ---
+@timed("clean.load_consommation", bytes=path_size)
 def load_clean_consommation(path):
     cons = pd.read_csv(path, sep=";", encoding="utf-8")
     cons["Date - Heure"] = pd.to_datetime(cons["Date - Heure"], utc=True)
@@ -61,6 +64,7 @@ def add_lag_features(df):
 
 
 # --- 2. CHARGEMENT ET NETTOYAGE MÉTÉO ---
+@timed("clean.load_meteo", bytes=path_size)
 def load_clean_meteo(path):
     meteo = pd.read_csv(path, sep=",", encoding="utf-8")
     meteo["Date"] = pd.to_datetime(meteo["Date"])
@@ -86,6 +90,7 @@ def load_clean_meteo(path):
     return meteo_day
 
 # --- 3. FUSION ---
+@timed("clean.merge")
 def merge_datasets(cons_df, meteo_df):
     merged = cons_df.join(meteo_df, how="inner").dropna(subset=["conso_totale_MW"])
     return merged
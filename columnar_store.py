@@ -0,0 +1,123 @@
+"""
+columnar_store.py
+
+Lecture colonnaire des séries RTE depuis MinIO : au lieu de télécharger tout
+le CSV, on lit une copie Parquet (triée par temps, row groups de taille
+fixe) en ne récupérant que :
+- le footer (schéma + statistiques min/max par row group),
+- les row groups qui recoupent la fenêtre demandée,
+- les colonnes demandées.
+pyarrow fait des GET avec en-tête Range sur l'objet S3, le volume transféré
+suit donc la fenêtre affichée et non la taille du fichier.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+
+TIME_COL = "date_heure_std"
+ROW_GROUP_ROWS = 96 * 7  # ~1 semaine de points 15 min par row group
+
+_fs = None
+
+
+def get_fs():
+    """Système de fichiers S3 pyarrow (lectures par plages d'octets)."""
+    global _fs
+    if _fs is None:
+        _fs = pafs.S3FileSystem(access_key=ACCESS_KEY, secret_key=SECRET_KEY,
+                                endpoint_override=ENDPOINT, scheme="https" if SECURE else "http")
+    return _fs
+
+
+# ----------------------------------------------------------------------
+# Écriture
+# ----------------------------------------------------------------------
+def write_time_sorted_parquet(df, path, time_col=TIME_COL, row_group_rows=ROW_GROUP_ROWS):
+    """
+    Écrit `df` trié par `time_col` en Parquet local, avec des row groups de
+    `row_group_rows` lignes : les statistiques min/max de chaque row group
+    permettent ensuite d'ignorer tout ce qui est hors de la fenêtre lue.
+    """
+    df = df.copy()
+    df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
+    df = df.dropna(subset=[time_col]).sort_values(time_col)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, row_group_size=row_group_rows, compression="zstd",
+                   write_statistics=True)
+    return path
+
+
+# ----------------------------------------------------------------------
+# Lecture
+# ----------------------------------------------------------------------
+def open_parquet(bucket, key, filesystem=None):
+    """
+    Ouvre l'objet et lit son footer. Le ParquetFile renvoyé peut être passé
+    (`pf=`) aux fonctions ci-dessous pour ne pas relire le footer à chaque appel.
+    """
+    fs = filesystem or get_fs()
+    path = f"{bucket}/{key}" if bucket else key
+    return pq.ParquetFile(fs.open_input_file(path))
+
+
+def read_schema(bucket, key, filesystem=None, pf=None):
+    """DataFrame vide avec les colonnes/dtypes du fichier (lecture du footer seulement)."""
+    pf = pf or open_parquet(bucket, key, filesystem)
+    return pf.schema_arrow.empty_table().to_pandas()
+
+
+def time_bounds(bucket, key, time_col=TIME_COL, filesystem=None, pf=None):
+    """(min, max) de `time_col` d'après les statistiques des row groups."""
+    pf = pf or open_parquet(bucket, key, filesystem)
+    idx = pf.schema_arrow.get_field_index(time_col)
+    mins, maxs = [], []
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(idx).statistics
+        if stats is not None and stats.has_min_max:
+            mins.append(pd.Timestamp(stats.min))
+            maxs.append(pd.Timestamp(stats.max))
+    if not mins:
+        return None, None
+    return min(mins), max(maxs)
+
+
+def read_time_range(bucket, key, columns, start=None, end=None, time_col=TIME_COL, filesystem=None, pf=None):
+    """
+    Lit uniquement `columns` (+ `time_col`) pour start <= t <= end.
+    Les row groups dont les statistiques tombent hors de la fenêtre ne sont
+    pas téléchargés.
+    """
+    pf = pf or open_parquet(bucket, key, filesystem)
+    columns = list(dict.fromkeys([time_col] + list(columns)))
+    idx = pf.schema_arrow.get_field_index(time_col)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    groups = []
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(idx).statistics
+        if stats is not None and stats.has_min_max:
+            if start is not None and pd.Timestamp(stats.max) < start:
+                continue
+            if end is not None and pd.Timestamp(stats.min) > end:
+                continue
+        groups.append(i)
+
+    if not groups:
+        return pf.schema_arrow.empty_table().select(columns).to_pandas()
+    df = pf.read_row_groups(groups, columns=columns).to_pandas()
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[time_col] >= start
+    if end is not None:
+        mask &= df[time_col] <= end
+    return df[mask].reset_index(drop=True)
@@ -18,6 +18,10 @@ from dotenv import load_dotenv
 from minio import Minio
 from minio.error import S3Error
 
+from columnar_store import write_time_sorted_parquet
+from downsample import build_levels
+from instrument import timed, add
+
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     # Nettoie noms colonnes → snake_case simple
     mapping = {}
@@ -72,6 +76,7 @@ SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
 BUCKET = os.getenv("MINIO_BUCKET", "smartcity-energy")
 PREFIX = os.getenv("MINIO_PREFIX", "raw/")
+SILVER_PREFIX = PREFIX.replace("raw/", "silver/")
 
 GET_RTE_NATIONAL_TR = os.getenv("GET_RTE_NATIONAL_TR", "true").lower() == "true"
 GET_ODRE_CONSO_QJ   = os.getenv("GET_ODRE_CONSO_QJ", "true").lower() == "true"
@@ -99,14 +104,32 @@ def save_and_push(df: pd.DataFrame, fname: str):
     df.to_csv(p, index=False)
     upload_file(p, BUCKET, f"{PREFIX}{fname}")
 
+def save_and_push_parquet(df: pd.DataFrame, fname: str, time_col: str):
+    # Copie colonnaire triée par temps : le dashboard n'en lit que les
+    # colonnes et row groups utiles (requêtes Range)
+    p = local_dl / fname
+    write_time_sorted_parquet(df, p, time_col)
+    upload_file(p, BUCKET, f"{SILVER_PREFIX}{fname}")
+
+def save_and_push_levels(df: pd.DataFrame, fname: str, time_col: str, value_col: str):
+    # Niveaux min/max pré-calculés (<fname>_L4, _L16, ...) pour les graphiques
+    # sur de longues périodes
+    df = df.copy()
+    df[value_col] = pd.to_numeric(df[value_col], errors="coerce")
+    for factor, level in build_levels(df, time_col, value_col).items():
+        if factor > 1:
+            save_and_push_parquet(level, fname.replace(".parquet", f"_L{factor}.parquet"), time_col)
+
 # ------------------ Download helpers ------------------
 
+@timed("minio.download_csv")
 def download_csv(url: str, params: dict | None = None) -> pd.DataFrame:
     if params:
         url = url + ("&" if "?" in url else "?") + urlencode(params)
     print(f"[GET] {url}")
     r = requests.get(url, timeout=60)
     r.raise_for_status()
+    add(bytes=len(r.content))
     content = r.content.decode("utf-8", errors="ignore")
 
     # 1ère passe: séparateur virgule (par défaut)
@@ -134,6 +157,10 @@ def get_rte_national_tr():
     df_small = df[df["date_heure_std"] >= cutoff].copy()
 
     save_and_push(df_small, "rte_eco2mix_national_tr_last30d.csv")
+    save_and_push_parquet(df, "rte_eco2mix_national_tr.parquet", "date_heure_std")
+    conso_cols = [c for c in df.columns if "consommation" in c]
+    if conso_cols:
+        save_and_push_levels(df, "rte_eco2mix_national_tr.parquet", "date_heure_std", conso_cols[0])
 
 def get_odre_conso_qj():
     """
@@ -0,0 +1,110 @@
+"""
+downsample.py
+
+Sous-échantillonnage visuel des longues séries de consommation, côté
+serveur, avant l'envoi au navigateur :
+- minmax_downsample : garde le min et le max de chaque bucket (les pics
+  restent visibles), entièrement vectorisé
+- lttb              : Largest-Triangle-Three-Buckets, pour ramener une série
+  à exactement n points en préservant sa forme
+- build_levels / choose_level : niveaux multi-résolution pré-calculés
+  (facteurs 1, 4, 16, ...) et choix du niveau selon la fenêtre visible et la
+  largeur du graphique
+
+Le nombre de points envoyés reste de l'ordre de quelques milliers quelle que
+soit la longueur de l'historique.
+"""
+
+import numpy as np
+import pandas as pd
+
+BASE_FREQ = pd.Timedelta(minutes=15)
+LEVEL_FACTORS = (1, 4, 16, 64, 256)
+POINTS_PER_PX = 2
+
+
+def minmax_downsample(df, time_col, value_col, n_buckets):
+    """
+    Découpe la série (triée par temps) en `n_buckets` buckets de même nombre
+    de points et garde, pour chacun, la ligne du min et celle du max.
+    """
+    n = len(df)
+    if n <= 2 * n_buckets:
+        return df.reset_index(drop=True)
+    y = df[value_col].to_numpy(dtype=float)
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+
+    # NaN neutralisés pour les réductions
+    y_min = np.where(np.isnan(y), np.inf, y)
+    y_max = np.where(np.isnan(y), -np.inf, y)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+    mins = np.minimum.reduceat(y_min, starts)
+    maxs = np.maximum.reduceat(y_max, starts)
+    is_min = y_min == mins[bucket]
+    is_max = y_max == maxs[bucket]
+
+    # premier indice atteignant le min / max de chaque bucket
+    idx = np.arange(n)
+    first_min = np.minimum.reduceat(np.where(is_min, idx, n), starts)
+    first_max = np.minimum.reduceat(np.where(is_max, idx, n), starts)
+    keep = np.unique(np.concatenate([first_min, first_max]))
+    keep = keep[keep < n]
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def lttb(df, time_col, value_col, n_out):
+    """Largest-Triangle-Three-Buckets : `n_out` points représentatifs."""
+    n = len(df)
+    if n_out >= n or n_out < 3:
+        return df.reset_index(drop=True)
+    x = pd.to_datetime(df[time_col]).to_numpy().astype("datetime64[ns]").astype(np.int64).astype(float)
+    y = df[value_col].to_numpy(dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        keep[i + 1] = a
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def build_levels(df, time_col, value_col, factors=LEVEL_FACTORS):
+    """
+    Niveaux pré-calculés : le niveau `f` garde min + max de chaque bucket de
+    `f` points (le niveau 1 est la série brute).
+    """
+    df = df.sort_values(time_col).reset_index(drop=True)
+    levels = {}
+    for f in factors:
+        levels[f] = df if f == 1 else minmax_downsample(df, time_col, value_col, max(1, len(df) // f))
+    return levels
+
+
+def choose_level(start, end, width_px, factors=LEVEL_FACTORS, base_freq=BASE_FREQ,
+                 points_per_px=POINTS_PER_PX):
+    """
+    Plus fin niveau dont le nombre de points sur [start, end] tient dans
+    `width_px * points_per_px` (un niveau minmax produit 2 points par bucket).
+    """
+    budget = width_px * points_per_px
+    n_raw = (pd.Timestamp(end) - pd.Timestamp(start)) / base_freq
+    for f in sorted(factors):
+        expected = n_raw if f == 1 else 2 * n_raw / f
+        if expected <= budget:
+            return f
+    return max(factors)
+
+
+def downsample_for_chart(df, time_col, value_col, width_px, points_per_px=POINTS_PER_PX):
+    """Dernière passe avant tracé : min/max par bucket si la série dépasse le budget."""
+    budget = width_px * points_per_px
+    if len(df) <= budget:
+        return df
+    return minmax_downsample(df, time_col, value_col, budget // 2)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+forest_export.py
+
+Export compact d'un RandomForestRegressor scikit-learn : tous les arbres sont
+aplatis dans quelques tableaux numpy contigus (feature, threshold, left, right,
+value) écrits en .npy, rechargés en memory-map et évalués par un parcours
+vectorisé (tous les échantillons × tous les arbres avancent d'un niveau à
+chaque itération).
+
+Options :
+- float32 : seuils / valeurs en float32 (seuils arrondis vers le bas pour
+  garder exactement la décision `x <= seuil` de scikit-learn)
+- quantize : valeurs des feuilles quantifiées sur 8 ou 16 bits
+
+Exemple :
+    python forest_export.py export random_forest_meteo_only.pkl models/rf_compact --float32
+    python forest_export.py bench random_forest_meteo_only.pkl models/rf_compact
+"""
+
+import os
+import json
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def _round_down_f32(thr):
+    """Plus grand float32 <= thr : x32 <= t32 équivaut alors à x32 <= thr."""
+    t32 = thr.astype(np.float32)
+    too_big = t32.astype(np.float64) > thr
+    t32[too_big] = np.nextafter(t32[too_big], np.float32(-np.inf))
+    return t32
+
+
+def _quantize(values, bits):
+    dtype = np.uint8 if bits == 8 else np.uint16
+    levels = np.iinfo(dtype).max
+    vmin, vmax = float(values.min()), float(values.max())
+    scale = (vmax - vmin) / levels if vmax > vmin else 1.0
+    codes = np.rint((values - vmin) / scale).astype(dtype)
+    return codes, vmin, scale
+
+
+def export_forest(model, out_dir, float32=False, quantize=None, feature_names=None):
+    """
+    Aplatit `model` (RandomForestRegressor mono-sortie) dans `out_dir`.
+    Les feuilles bouclent sur elles-mêmes (left = right = soi) avec un seuil
+    +inf, ce qui permet un nombre fixe d'itérations sans branchement.
+    """
+    if quantize not in (None, 8, 16):
+        raise ValueError("quantize doit valoir None, 8 ou 16")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Seuls les modèles mono-sortie sont supportés")
+
+    trees = [est.tree_ for est in model.estimators_]
+    sizes = np.array([t.node_count for t in trees], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    feature = np.concatenate([t.feature for t in trees]).astype(np.int32)
+    threshold = np.concatenate([t.threshold for t in trees]).astype(np.float64)
+    left = np.concatenate([t.children_left for t in trees]).astype(np.int64)
+    right = np.concatenate([t.children_right for t in trees]).astype(np.int64)
+    value = np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64)
+
+    offsets = np.repeat(roots, sizes)
+    node_ids = np.arange(len(feature), dtype=np.int64)
+    is_leaf = left == -1
+    left = np.where(is_leaf, node_ids, left + offsets).astype(np.int32)
+    right = np.where(is_leaf, node_ids, right + offsets).astype(np.int32)
+    feature[is_leaf] = 0
+    threshold[is_leaf] = np.inf
+
+    if float32:
+        threshold = _round_down_f32(threshold)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "n_trees": len(trees),
+        "n_nodes": int(len(feature)),
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "feature_names": list(feature_names if feature_names is not None
+                              else getattr(model, "feature_names_in_", [])),
+        "float32": bool(float32),
+        "quantize": quantize,
+    }
+    if quantize:
+        value, meta["value_offset"], meta["value_scale"] = _quantize(value, quantize)
+    elif float32:
+        value = value.astype(np.float32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in zip(ARRAYS, (feature, threshold, left, right, value, roots)):
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ----------------------------------------------------------------------
+# Chargement / prédiction
+# ----------------------------------------------------------------------
+class CompactForest:
+    """Forêt aplatie, chargée en memory-map ; API `predict` compatible sklearn."""
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        mode = "r" if mmap else None
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode))
+        self.feature_names_in_ = self.meta["feature_names"] or None
+        self.n_features_in_ = self.meta["n_features"]
+        self._leaf_values = None
+
+    def _values(self):
+        if self._leaf_values is None:
+            v = np.asarray(self.value, dtype=np.float64)
+            if self.meta.get("quantize"):
+                v = v * self.meta["value_scale"] + self.meta["value_offset"]
+            self._leaf_values = v
+        return self._leaf_values
+
+    def _as_array(self, X):
+        if hasattr(X, "columns") and self.feature_names_in_:
+            X = X[self.feature_names_in_]
+        # scikit-learn évalue les arbres en float32
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X doit avoir {self.n_features_in_} colonnes, reçu {X.shape}")
+        return X
+
+    def apply(self, X, batch_size=4096):
+        """Indices (globaux) des feuilles atteintes, shape (n_samples, n_trees)."""
+        X = self._as_array(X)
+        feature, threshold = self.feature, self.threshold
+        left, right = self.left, self.right
+        n_trees = self.meta["n_trees"]
+        roots = np.asarray(self.roots, dtype=np.int32)
+        out = np.empty((len(X), n_trees), dtype=np.int32)
+        for start in range(0, len(X), batch_size):
+            xb = X[start:start + batch_size]
+            # une entrée par couple (échantillon, arbre) ; on ne garde que les
+            # couples qui ne sont pas encore sur une feuille
+            node = np.tile(roots, len(xb))
+            rows = np.repeat(np.arange(len(xb)), n_trees)
+            active = np.flatnonzero(left[node] != node)
+            while len(active):
+                nd = node[active]
+                go_left = xb[rows[active], feature[nd]] <= threshold[nd]
+                nxt = np.where(go_left, left[nd], right[nd])
+                node[active] = nxt
+                active = active[left[nxt] != nxt]
+            out[start:start + len(xb)] = node.reshape(len(xb), n_trees)
+        return out
+
+    def predict(self, X, batch_size=4096):
+        return self._values()[self.apply(X, batch_size)].mean(axis=1)
+
+
+def load_forest(path, mmap=True):
+    return CompactForest(path, mmap=mmap)
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+def _percentiles(samples_s):
+    ms = np.array(samples_s) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def benchmark(pkl_path, compact_path, n_rows=1000, repeat=200, seed=0):
+    """Compare chargement et latence de prédiction joblib vs format compact."""
+    import joblib
+
+    t0 = time.perf_counter()
+    model = joblib.load(pkl_path)
+    joblib_load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    forest = load_forest(compact_path)
+    compact_load_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, forest.n_features_in_)).astype(np.float32)
+    if forest.feature_names_in_:
+        import pandas as pd
+        X = pd.DataFrame(X, columns=forest.feature_names_in_)
+
+    ref = model.predict(X)
+    got = forest.predict(X)
+    max_abs_err = float(np.max(np.abs(ref - got)))
+
+    results = {"joblib_load_ms": joblib_load_s * 1000, "compact_load_ms": compact_load_s * 1000,
+               "max_abs_err": max_abs_err}
+    for label, predictor in (("sklearn", model), ("compact", forest)):
+        one = X.iloc[:1] if hasattr(X, "iloc") else X[:1]
+        single, batch = [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            predictor.predict(one)
+            single.append(time.perf_counter() - t0)
+        for _ in range(max(1, repeat // 10)):
+            t0 = time.perf_counter()
+            predictor.predict(X)
+            batch.append(time.perf_counter() - t0)
+        results[f"{label}_p50_1row_ms"], results[f"{label}_p99_1row_ms"] = _percentiles(single)
+        results[f"{label}_p50_{n_rows}rows_ms"], results[f"{label}_p99_{n_rows}rows_ms"] = _percentiles(batch)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    import joblib
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_exp = sub.add_parser("export", help="exporte un .pkl en format compact")
+    p_exp.add_argument("pkl")
+    p_exp.add_argument("out")
+    p_exp.add_argument("--float32", action="store_true")
+    p_exp.add_argument("--quantize", type=int, choices=[8, 16], default=None)
+
+    p_bench = sub.add_parser("bench", help="compare joblib et format compact")
+    p_bench.add_argument("pkl")
+    p_bench.add_argument("compact")
+    p_bench.add_argument("--rows", type=int, default=1000)
+    p_bench.add_argument("--repeat", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.cmd == "export":
+        meta = export_forest(joblib.load(args.pkl), args.out,
+                             float32=args.float32, quantize=args.quantize)
+        size = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out))
+        print(f"✅ {meta['n_trees']} arbres / {meta['n_nodes']} nœuds exportés dans {args.out} "
+              f"({size / 1e6:.1f} Mo, pkl : {os.path.getsize(args.pkl) / 1e6:.1f} Mo)")
+    else:
+        res = benchmark(args.pkl, args.compact, n_rows=args.rows, repeat=args.repeat)
+        print("=== Benchmark forêt compacte ===")
+        for k, v in res.items():
+            print(f"{k:<28}: {v:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+geo_join.py
+
+Jointure spatiale entre l'infrastructure Enedis (poteaux HTA / BT, réseau
+souterrain HTA) et la consommation résidentielle par adresse, toutes trois
+déposées dans le bucket RAW par ingest_raw.py.
+
+- Les géométries sont projetées en mètres (équirectangulaire locale centrée
+  sur l'Île-de-France, erreur < 0,5 % à l'échelle de la région).
+- Les lignes souterraines sont rééchantillonnées le long de leur longueur
+  (un point au plus tous les DENSIFY_M mètres) ; chaque point renvoie à sa
+  ligne d'origine et porte la longueur de ligne qu'il représente.
+- Un KD-tree par type d'actif est construit une fois puis persisté
+  (INDEX_PATH) ; il n'est reconstruit que si les fichiers sources changent.
+- Les adresses sont lues en streaming par blocs ; pour chaque bloc, les
+  requêtes plus-proche-voisin et dans-un-rayon sont vectorisées et
+  parallélisées (workers=-1), sans produit cartésien.
+
+Sortie : Parquet partitionné par année / département (OUT_DIR, poussé
+optionnellement dans le bucket SILVER sous geo/adresses_reseau/) avec, par
+type d'actif : identifiant le plus proche, distance (m), nombre de poteaux
+ou longueur de câble (m) dans le rayon.
+
+Exemple :
+    python geo_join.py --radius 100
+    python geo_join.py --addresses conso.csv --poteaux poteaux.csv --souterrain souterrain.csv --pairs
+"""
+
+import os
+import json
+import logging
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.spatial import cKDTree
+
+from model_store import get_s3
+from raw_sources import (RAW_BUCKET, SEP, SILVER_BUCKET, SOURCE_NAMES, normalize_column, open_source,
+                         pick_column, source_fingerprint)
+
+INDEX_PATH = "geo_index/infra_index.joblib"
+OUT_DIR = "geo_join"
+SILVER_PREFIX = "geo/adresses_reseau/"
+
+IDF_BBOX = (1.40, 48.10, 3.60, 49.25)  # lon_min, lat_min, lon_max, lat_max
+LAT0 = 48.85
+EARTH_RADIUS_M = 6_371_000.0
+DENSIFY_M = 25.0
+RADIUS_M = 100.0
+MAX_NEAREST_M = 5_000.0
+CHUNK_ROWS = 200_000
+
+
+# ----------------------------------------------------------------------
+# Utils
+# ----------------------------------------------------------------------
+def project(lon, lat, lat0=LAT0):
+    """(lon, lat) en degrés → (x, y) en mètres."""
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    return np.column_stack([EARTH_RADIUS_M * lon * np.cos(np.radians(lat0)), EARTH_RADIUS_M * lat])
+
+
+def parse_geo_point(s):
+    """Colonne "lat, lon" → deux arrays float (NaN si absent)."""
+    parts = s.astype(str).str.split(",", n=1, expand=True)
+    if parts.shape[1] < 2:
+        nan = np.full(len(s), np.nan)
+        return nan, nan.copy()
+    lat = pd.to_numeric(parts[0].str.strip(), errors="coerce").to_numpy()
+    lon = pd.to_numeric(parts[1].str.strip(), errors="coerce").to_numpy()
+    return lat, lon
+
+
+def in_bbox(lon, lat, bbox=IDF_BBOX):
+    if bbox is None:
+        return np.isfinite(lon) & np.isfinite(lat)
+    return (lon >= bbox[0]) & (lat >= bbox[1]) & (lon <= bbox[2]) & (lat <= bbox[3])
+
+
+# ----------------------------------------------------------------------
+# Sources (bucket RAW ou fichiers locaux)
+# ----------------------------------------------------------------------
+def read_csv_chunks(path_or_name, chunksize=CHUNK_ROWS, bucket=RAW_BUCKET):
+    body, origin = open_source(path_or_name, bucket)
+    return pd.read_csv(body, sep=SEP, chunksize=chunksize, dtype=str, low_memory=False), origin
+
+
+# ----------------------------------------------------------------------
+# Actifs réseau
+# ----------------------------------------------------------------------
+def load_poteaux(path_or_name, bbox=IDF_BBOX):
+    """Poteaux → DataFrame (kind, x, y, commune) ; kind = poteau_hta / poteau_bt."""
+    reader, origin = read_csv_chunks(path_or_name)
+    parts = []
+    for chunk in reader:
+        point = pick_column(chunk.columns, "geo_point_2d", "Geo Point")
+        tension = pick_column(chunk.columns, "tension", "Tension")
+        commune = pick_column(chunk.columns, "code_commune", "Code commune")
+        lat, lon = parse_geo_point(chunk[point])
+        keep = in_bbox(lon, lat, bbox)
+        xy = project(lon[keep], lat[keep])
+        t = chunk[tension].str.upper().str.strip() if tension else pd.Series("BT", index=chunk.index)
+        parts.append(pd.DataFrame({
+            "kind": np.where(t[keep].str.startswith("HTA").to_numpy(), "poteau_hta", "poteau_bt"),
+            "x": xy[:, 0], "y": xy[:, 1],
+            "commune": chunk[commune][keep].to_numpy() if commune else None,
+        }))
+    df = pd.concat(parts, ignore_index=True)
+    logging.info("%d poteaux chargés depuis %s", len(df), origin)
+    return df, origin
+
+
+def _line_coords(shape):
+    """GeoJSON LineString / MultiLineString → liste d'arrays (n, 2) lon/lat."""
+    try:
+        geom = json.loads(shape)
+    except (TypeError, ValueError):
+        return []
+    if geom.get("type") == "LineString":
+        return [np.asarray(geom["coordinates"], dtype=np.float64)]
+    if geom.get("type") == "MultiLineString":
+        return [np.asarray(c, dtype=np.float64) for c in geom["coordinates"]]
+    return []
+
+
+def densify(xy, line_id, step=DENSIFY_M):
+    """
+    Rééchantillonne des polylignes données par leurs sommets (xy) et
+    l'identifiant de ligne de chaque sommet (trié par ligne) : points régulièrement
+    espacés (au plus `step` mètres) le long de l'abscisse curviligne de chaque
+    ligne entière, extrémités comprises. Renvoie (points, ligne, poids) où le
+    poids est la longueur de ligne (m) représentée par le point ; la somme des
+    poids d'une ligne vaut sa longueur.
+    """
+    same = line_id[1:] == line_id[:-1]
+    # abscisse curviligne cumulée ; 1 m d'écart entre deux lignes pour que
+    # l'interpolation ne mélange pas la fin d'une ligne et le début de la suivante
+    gaps = np.where(same, np.hypot(*np.diff(xy, axis=0).T), 1.0)
+    s = np.concatenate([[0.0], np.cumsum(gaps)])
+    first = np.flatnonzero(np.append(True, ~same))
+    last = np.append(first[1:], len(xy)) - 1
+    length = s[last] - s[first]
+    n = np.maximum(np.ceil(length / step).astype(np.int64), 1)  # intervalles par ligne
+    line = np.repeat(np.arange(len(first)), n + 1)
+    j = np.arange(line.size) - np.repeat(np.cumsum(n + 1) - (n + 1), n + 1)
+    target = s[first][line] + j * (length / n)[line]
+    pts = np.column_stack([np.interp(target, s, xy[:, 0]), np.interp(target, s, xy[:, 1])])
+    spacing = (length / n)[line]
+    weight = np.where((j == 0) | (j == n[line]), spacing / 2, spacing)
+    return pts, line_id[first][line], weight
+
+
+def load_souterrain(path_or_name, bbox=IDF_BBOX, step=DENSIFY_M):
+    """Réseau souterrain HTA → points densifiés (kind, x, y, asset, weight = longueur représentée)."""
+    reader, origin = read_csv_chunks(path_or_name)
+    coords, ids, communes = [], [], []
+    n_lines = 0
+    for chunk in reader:
+        shape = pick_column(chunk.columns, "geo_shape", "Geo Shape")
+        commune = pick_column(chunk.columns, "code_commune", "Code commune")
+        for i, s in enumerate(chunk[shape].to_numpy()):
+            for c in _line_coords(s):
+                if len(c) == 0 or not in_bbox(c[:, 0], c[:, 1], bbox).any():
+                    continue
+                coords.append(c[:, :2])
+                ids.append(np.full(len(c), n_lines))
+                communes.append(chunk[commune].iat[i] if commune else None)
+                n_lines += 1
+    if not coords:
+        return pd.DataFrame(columns=["kind", "x", "y", "asset", "weight"]), origin
+    lonlat = np.vstack(coords)
+    pts, asset, weight = densify(project(lonlat[:, 0], lonlat[:, 1]), np.concatenate(ids), step)
+    logging.info("%d lignes HTA souterraines → %d points (pas %.0f m) depuis %s", n_lines, len(pts), step, origin)
+    df = pd.DataFrame({"kind": "souterrain_hta", "x": pts[:, 0], "y": pts[:, 1], "asset": asset, "weight": weight})
+    df["commune"] = np.asarray(communes, dtype=object)[asset]
+    return df, origin
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+class AssetIndex:
+    """Un KD-tree par type d'actif ; `asset` relie chaque point à son actif (ligne densifiée)."""
+
+    def __init__(self, assets, sources=None, step=DENSIFY_M):
+        self.sources = dict(sources or {})
+        self.step = step
+        self.kinds = {}
+        for kind, df in assets.groupby("kind"):
+            xy = df[["x", "y"]].to_numpy()
+            asset = df["asset"].to_numpy(np.int64) if "asset" in df and df["asset"].notna().all() \
+                else np.arange(len(df), dtype=np.int64)
+            self.kinds[kind] = {
+                "tree": cKDTree(xy, balanced_tree=False, compact_nodes=True),
+                "asset": asset,
+                "is_line": kind.startswith("souterrain"),
+                "weight": df["weight"].to_numpy(np.float64) if kind.startswith("souterrain") else None,
+                # une ligne par actif : commune, position représentative (premier point)
+                "table": pd.DataFrame({"asset_id": asset, "commune": df["commune"].to_numpy(),
+                                       "x": xy[:, 0], "y": xy[:, 1]}).drop_duplicates("asset_id"),
+            }
+            logging.info("Index %s : %d points", kind, len(xy))
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        joblib.dump(self, path)
+
+    def nearest(self, xy, max_distance=MAX_NEAREST_M):
+        """Actif le plus proche de chaque point, par type : {kind: (asset_id, distance_m)}."""
+        out = {}
+        for kind, k in self.kinds.items():
+            dist, idx = k["tree"].query(xy, k=1, distance_upper_bound=max_distance, workers=-1)
+            found = idx < len(k["asset"])
+            asset = np.full(len(xy), -1, dtype=np.int64)
+            asset[found] = k["asset"][idx[found]]
+            out[kind] = (asset, np.where(found, dist, np.nan))
+        return out
+
+    def within(self, xy, radius=RADIUS_M):
+        """
+        Par type : nombre de poteaux dans le rayon, ou longueur de câble (m)
+        dans le rayon pour les lignes (somme des poids des points densifiés).
+        """
+        out = {}
+        addr_tree = None
+        for kind, k in self.kinds.items():
+            if not k["is_line"]:
+                out[kind] = k["tree"].query_ball_point(xy, r=radius, return_length=True, workers=-1)
+                continue
+            if addr_tree is None:
+                addr_tree = cKDTree(xy)
+            m = addr_tree.sparse_distance_matrix(k["tree"], radius, output_type="ndarray")
+            out[kind] = np.bincount(m["i"], weights=k["weight"][m["j"]], minlength=len(xy))
+        return out
+
+    def pairs(self, xy, radius=RADIUS_M):
+        """Paires (adresse, actif, distance) dans le rayon, sans boucle Python."""
+        addr_tree = cKDTree(xy)
+        frames = []
+        for kind, k in self.kinds.items():
+            m = addr_tree.sparse_distance_matrix(k["tree"], radius, output_type="ndarray")
+            df = pd.DataFrame({"addr": m["i"], "asset": k["asset"][m["j"]], "distance_m": m["v"]})
+            if k["is_line"]:
+                df = df.sort_values("distance_m").drop_duplicates(["addr", "asset"])
+            frames.append(df.assign(kind=kind))
+        return pd.concat(frames, ignore_index=True)
+
+
+def build_index(poteaux=SOURCE_NAMES["poteaux"], souterrain=SOURCE_NAMES["souterrain"],
+                path=INDEX_PATH, bbox=IDF_BBOX, step=DENSIFY_M, rebuild=False):
+    """Charge l'index persistant s'il correspond aux sources courantes, sinon le reconstruit."""
+    # empreintes calculées avant le chargement : une source modifiée pendant
+    # la construction sera détectée au prochain run
+    current = {k: source_fingerprint(v) for k, v in {"poteaux": poteaux, "souterrain": souterrain}.items()}
+    if not rebuild and os.path.exists(path):
+        index = joblib.load(path)
+        if index.sources == current and index.step == step:
+            logging.info("Index réutilisé (%s)", path)
+            return index
+    pot, _ = load_poteaux(poteaux, bbox)
+    sout, _ = load_souterrain(souterrain, bbox, step)
+    index = AssetIndex(pd.concat([pot, sout], ignore_index=True), current, step)
+    index.save(path)
+    logging.info("Index sauvegardé → %s", path)
+    return index
+
+
+# ----------------------------------------------------------------------
+# Jointure
+# ----------------------------------------------------------------------
+def join_chunk(chunk, index, radius=RADIUS_M, bbox=IDF_BBOX):
+    """Un bloc d'adresses → colonnes d'infrastructure ajoutées (adresses hors zone écartées)."""
+    chunk = chunk.rename(columns=normalize_column)
+    point = pick_column(chunk.columns, "geo_point_2d", "Geo Point")
+    year = pick_column(chunk.columns, "annee", "Année")
+    dept = pick_column(chunk.columns, "code_departement", "Code Département")
+    commune = pick_column(chunk.columns, "code_commune", "Code Commune", "Code INSEE de la commune")
+
+    if point is None:
+        raise ValueError("Colonne de coordonnées introuvable (geo_point_2d / Geo Point)")
+    if dept is None and commune is None:
+        raise ValueError("Colonne département ou commune introuvable : impossible de partitionner par departement")
+
+    lat, lon = parse_geo_point(chunk[point])
+    keep = in_bbox(lon, lat, bbox)
+    out = chunk.loc[keep].reset_index(drop=True)
+    xy = project(lon[keep], lat[keep])
+
+    out["lat"], out["lon"] = lat[keep], lon[keep]
+    out["annee"] = pd.to_numeric(out[year], errors="coerce").astype("Int64") if year else pd.NA
+    out["departement"] = (out[dept] if dept else out[commune].str[:2]).astype(str).str.zfill(2)
+    for kind, (asset, dist) in index.nearest(xy).items():
+        out[f"{kind}_id"] = asset
+        out[f"{kind}_dist_m"] = dist.astype(np.float32)
+    suffix = f"{int(radius)}m"
+    for kind, v in index.within(xy, radius).items():
+        col = f"{kind}_len_{suffix}" if index.kinds[kind]["is_line"] else f"{kind}_n_{suffix}"
+        out[col] = v.astype(np.float32) if index.kinds[kind]["is_line"] else v.astype(np.int32)
+    return out, xy
+
+
+def run_join(index, addresses=SOURCE_NAMES["addresses"], out_dir=OUT_DIR, radius=RADIUS_M,
+             bbox=IDF_BBOX, pairs=False, chunksize=CHUNK_ROWS):
+    """Jointure bloc par bloc → Parquet partitionné annee=/departement=."""
+    reader, origin = read_csv_chunks(addresses, chunksize)
+    logging.info("Jointure des adresses %s (rayon %.0f m)", origin, radius)
+    n_rows = 0
+    for i, chunk in enumerate(reader):
+        out, xy = join_chunk(chunk, index, radius, bbox)
+        if out.empty:
+            continue
+        out["addr_id"] = np.arange(n_rows, n_rows + len(out), dtype=np.int64)
+        # sans métadonnées pandas : les partitions Hive sont relues en dictionnaires
+        table = pa.Table.from_pandas(out, preserve_index=False).replace_schema_metadata()
+        pq.write_to_dataset(table, os.path.join(out_dir, "adresses"), partition_cols=["annee", "departement"],
+                            basename_template=f"part-{i:05d}-{{i}}.parquet")
+        if pairs:
+            p = index.pairs(xy, radius)
+            p["addr_id"] = n_rows + p.pop("addr")
+            pq.write_to_dataset(pa.Table.from_pandas(p, preserve_index=False),
+                                os.path.join(out_dir, "paires"), partition_cols=["kind"],
+                                basename_template=f"part-{i:05d}-{{i}}.parquet")
+        n_rows += len(out)
+        logging.info("Bloc %d : %d adresses jointes (total %d)", i, len(out), n_rows)
+    return n_rows
+
+
+def write_assets(index, out_dir=OUT_DIR):
+    """Table des actifs (asset_id → commune, position) pour relier les identifiants de la jointure."""
+    for kind, k in index.kinds.items():
+        path = os.path.join(out_dir, "actifs", f"kind={kind}", "part-0.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        k["table"].to_parquet(path, index=False)
+
+
+def push_dir(local_dir, bucket=SILVER_BUCKET, prefix=SILVER_PREFIX):
+    s3 = get_s3()
+    n = 0
+    for root, _, files in os.walk(local_dir):
+        for f in files:
+            path = os.path.join(root, f)
+            s3.upload_file(path, bucket, prefix + os.path.relpath(path, local_dir).replace(os.sep, "/"))
+            n += 1
+    logging.info("%d fichiers poussés → s3://%s/%s", n, bucket, prefix)
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    import shutil
+    import time
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--addresses", default=SOURCE_NAMES["addresses"], help="fichier local ou nom de source RAW")
+    parser.add_argument("--poteaux", default=SOURCE_NAMES["poteaux"])
+    parser.add_argument("--souterrain", default=SOURCE_NAMES["souterrain"])
+    parser.add_argument("--radius", type=float, default=RADIUS_M)
+    parser.add_argument("--step", type=float, default=DENSIFY_M, help="pas de densification des lignes (m)")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--rebuild-index", action="store_true")
+    parser.add_argument("--pairs", action="store_true", help="écrit aussi les paires adresse × actif dans le rayon")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--push", action="store_true", help="pousse le résultat dans le bucket SILVER")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    t0 = time.perf_counter()
+    index = build_index(args.poteaux, args.souterrain, args.index, step=args.step, rebuild=args.rebuild_index)
+    shutil.rmtree(args.out, ignore_errors=True)
+    n = run_join(index, args.addresses, args.out, args.radius, pairs=args.pairs)
+    write_assets(index, args.out)
+    if args.push:
+        push_dir(args.out)
+    print(f"✅ {n} adresses jointes en {time.perf_counter() - t0:.1f}s → {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+http_session.py
+
+Session HTTP partagée par les clients et les ingestions (weather_client.py,
+range_download.py, velib_ingest.py) : pool de connexions dimensionné sur le
+nombre de workers et retries courts sur les erreurs transitoires (429 / 5xx).
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = 8
+
+
+def make_session(pool_size=POOL_SIZE, retries=2):
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.3,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -12,6 +12,9 @@ Chaque source est configurée avec :
 - un flag “streamable” (True si on peut streamer, sinon on télécharge completement)
 
 Le script gère l’upload idempotent (skip si déjà existant).
+Les sources streamables passent par range_download : segments HTTP Range en
+parallèle → parts multipart S3, avec reprise après échec (checkpoint local) ;
+repli automatique sur un flux unique si le serveur n’accepte pas les Range.
 """
 
 import logging
@@ -19,6 +22,8 @@ import requests
 from datetime import datetime
 from botocore.exceptions import ClientError
 from S3_creation import s3, RAW_BUCKET
+from range_download import S3MultipartSink, download, pending_key
+from instrument import stage, enabled
 
 # ----------------------------------------------------------------------
 # Config des sources à ingérer
@@ -90,25 +95,27 @@ def ingest_source(src):
     streamable = src.get("streamable", False)
 
     ext = ".csv" if typ == "csv" else ".geojson"
-    key = ts.strftime(f"api/{name}/date=%Y/%m/%d/{name}_%Y%m%dT%H%M%SZ{ext}")
+    # un transfert interrompu est repris sous sa clé d’origine
+    key = pending_key(name) or ts.strftime(f"api/{name}/date=%Y/%m/%d/{name}_%Y%m%dT%H%M%SZ{ext}")
 
     if object_exists(key):
         logging.info("Skipped existing %s → s3://%s/%s", name, RAW_BUCKET, key)
         return
 
     try:
-        logging.info("Téléchargement de %s depuis %s", name, url)
-        if streamable:
-            with requests.get(url, stream=True, timeout=600) as r:
-                r.raise_for_status()
-                # flux direct vers S3
-                s3.upload_fileobj(r.raw, RAW_BUCKET, key)
-            logging.info("%s upload terminé en streaming → s3://%s/%s", name, RAW_BUCKET, key)
-        else:
-            resp = requests.get(url, timeout=300)
-            resp.raise_for_status()
-            s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=resp.content, ContentType="text/csv")
-            logging.info("%s upload terminé (non-stream) → s3://%s/%s", name, RAW_BUCKET, key)
+        with stage("ingest.source", source=name) as st:
+            logging.info("Téléchargement de %s depuis %s", name, url)
+            if streamable:
+                sink = S3MultipartSink(s3, RAW_BUCKET, key, "text/csv" if typ == "csv" else "application/geo+json")
+                mode = download(url, sink, name, key=key)
+                logging.info("%s upload terminé (%s) → s3://%s/%s", name, mode, RAW_BUCKET, key)
+            else:
+                resp = requests.get(url, timeout=300)
+                resp.raise_for_status()
+                s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=resp.content, ContentType="text/csv")
+                logging.info("%s upload terminé (non-stream) → s3://%s/%s", name, RAW_BUCKET, key)
+            if enabled():
+                st.bytes = s3.head_object(Bucket=RAW_BUCKET, Key=key)["ContentLength"]
     except Exception as e:
         logging.error("Échec ingestion %s : %s", name, e)
 
@@ -0,0 +1,326 @@
+"""
+instrument.py
+
+Mesure légère des étapes du pipeline (HTTP, parsing, rééchantillonnage,
+entraînement, upload...). Pour chaque étape : temps réel, temps CPU, RSS au
+début / à la fin et pic de RSS échantillonné pendant l'étape, lignes et
+octets traités.
+
+    from instrument import stage, timed, add
+
+    with stage("clean.merge") as s:
+        merged = ...
+        s.rows = len(merged)
+
+    @timed("enedis.fetch")          # lignes = len(résultat) si possible
+    def fetch(...): ...
+
+    add(bytes=len(r.content))       # incrémente l'étape courante
+
+Activation par variable d'environnement (PERF_METRICS=1). Désactivé, `stage`
+renvoie un objet inerte partagé et `timed` appelle directement la fonction :
+le surcoût se limite à un test de booléen.
+
+Sorties (METRICS_DIR) :
+- stages.jsonl   : un enregistrement JSON par exécution d'étape
+- <job>.prom     : cumuls au format texte Prometheus (collecteur textfile de
+  node_exporter), réécrit atomiquement à la fin de chaque étape
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import threading
+from datetime import datetime
+from functools import wraps
+
+ENABLED = os.getenv("PERF_METRICS", "0").lower() in ("1", "true", "yes")
+METRICS_DIR = os.getenv("PERF_METRICS_DIR", "metrics")
+_script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ""))[0]
+JOB = os.getenv("PERF_METRICS_JOB") or (_script if _script and not _script.startswith("-") else "python")
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = {}  # (étape, labels triés) -> cumuls
+
+
+def enabled():
+    return ENABLED
+
+
+def enable(flag=True, metrics_dir=None):
+    """Active / désactive la mesure à l'exécution (ex. depuis benchmark.py)."""
+    global ENABLED, METRICS_DIR
+    ENABLED = flag
+    if metrics_dir:
+        METRICS_DIR = metrics_dir
+
+
+# ----------------------------------------------------------------------
+# Mémoire
+# ----------------------------------------------------------------------
+# Le pic de RSS du processus (VmHWM) n'est jamais remis à zéro : cela
+# fausserait les étapes concurrentes des autres threads. Chaque mesure garde
+# son propre pic : RSS au début, à la fin et échantillonné par un thread
+# partagé toutes les SAMPLE_MS millisecondes (0 : début / fin seulement).
+SAMPLE_MS = float(os.getenv("PERF_METRICS_SAMPLE_MS", "20"))
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_watched = set()
+_watch_lock = threading.Lock()
+_sampler = None
+
+
+def peak_rss():
+    """Pic de RSS du processus depuis son démarrage (octets, ru_maxrss)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def current_rss():
+    """RSS courant (octets) ; hors Linux, repli sur le pic du processus."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+
+
+def _sample_loop():
+    while True:
+        time.sleep(SAMPLE_MS / 1000)
+        with _watch_lock:
+            if not _watched:
+                continue
+            watched = list(_watched)
+        rss = current_rss()
+        for w in watched:
+            w.sample(rss)
+
+
+def _watch(peak):
+    global _sampler
+    with _watch_lock:
+        _watched.add(peak)
+        if _sampler is None and SAMPLE_MS > 0:
+            _sampler = threading.Thread(target=_sample_loop, name="rss-sampler", daemon=True)
+            _sampler.start()
+
+
+def _unwatch(peak):
+    with _watch_lock:
+        _watched.discard(peak)
+
+
+class RssPeak:
+    """
+    Pic de RSS (octets) observé pendant le bloc :
+
+        with RssPeak() as m:
+            ...
+        m.peak, m.start, m.end
+
+    Le RSS est celui du processus : les allocations concurrentes d'autres
+    threads y sont incluses.
+    """
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self.end = None
+        _watch(self)
+        return self
+
+    def sample(self, rss):
+        if rss > self.peak:
+            self.peak = rss
+
+    def __exit__(self, *exc):
+        _unwatch(self)
+        self.end = current_rss()
+        self.sample(self.end)
+        return False
+
+
+# ----------------------------------------------------------------------
+# Étapes
+# ----------------------------------------------------------------------
+class _NoopStage:
+    """Étape inerte utilisée quand la mesure est désactivée."""
+    rows = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NOOP = _NoopStage()
+
+
+class Stage:
+    def __init__(self, name, rows=None, bytes=None, **labels):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+        self.labels = {k: str(v) for k, v in labels.items()}
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._rss = RssPeak().__enter__()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._rss.__exit__(exc_type, exc, tb)
+        _local.stack.pop()
+        record = {
+            "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            "job": JOB,
+            "stage": self.name,
+            "parent": self.parent,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": round(self._rss.peak / 2**20, 1),
+            "rss_start_mb": round(self._rss.start / 2**20, 1),
+            "rss_end_mb": round(self._rss.end / 2**20, 1),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "ok": exc_type is None,
+            **({"labels": self.labels} if self.labels else {}),
+        }
+        _record(record)
+        return False
+
+
+def stage(name, rows=None, bytes=None, **labels):
+    """Context manager mesurant une étape ; objet inerte si la mesure est désactivée."""
+    if not ENABLED:
+        return _NOOP
+    return Stage(name, rows, bytes, **labels)
+
+
+def current():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else _NOOP
+
+
+def add(rows=0, bytes=0):
+    """Incrémente lignes / octets de l'étape courante (du thread courant)."""
+    if not ENABLED:
+        return
+    s = current()
+    if rows:
+        s.rows = (s.rows or 0) + rows
+    if bytes:
+        s.bytes = (s.bytes or 0) + bytes
+
+
+def _default_rows(result):
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def timed(name, rows=_default_rows, bytes=None):
+    """
+    Décorateur : `rows(résultat)` donne les lignes produites, `bytes(*args,
+    **kwargs)` les octets lus (ex. path_size). L'étape peut aussi être
+    complétée depuis la fonction avec `add`.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Stage(name) as s:
+                if bytes is not None:
+                    s.bytes = bytes(*args, **kwargs)
+                result = fn(*args, **kwargs)
+                if rows is not None and s.rows is None:
+                    s.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def path_size(path, *args, **kwargs):
+    """Taille du fichier passé en premier argument (pour `timed(bytes=...)`)."""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def _record(record):
+    key = (record["stage"], tuple(sorted(record.get("labels", {}).items())))
+    with _lock:
+        t = _totals.setdefault(key, {"calls": 0, "errors": 0, "wall": 0.0, "cpu": 0.0,
+                                     "rows": 0, "bytes": 0, "rss": 0})
+        t["calls"] += 1
+        t["errors"] += 0 if record["ok"] else 1
+        t["wall"] += record["wall_s"]
+        t["cpu"] += record["cpu_s"]
+        t["rows"] += record["rows"] or 0
+        t["bytes"] += record["bytes"] or 0
+        t["rss"] = max(t["rss"], int(record["peak_rss_mb"] * 2**20))
+
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(os.path.join(METRICS_DIR, "stages.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        _write_prometheus()
+
+
+PROM_METRICS = [
+    ("pipeline_stage_calls_total", "counter", "calls", "Exécutions de l'étape"),
+    ("pipeline_stage_errors_total", "counter", "errors", "Exécutions terminées en erreur"),
+    ("pipeline_stage_wall_seconds_total", "counter", "wall", "Temps réel cumulé"),
+    ("pipeline_stage_cpu_seconds_total", "counter", "cpu", "Temps CPU cumulé (processus)"),
+    ("pipeline_stage_rows_total", "counter", "rows", "Lignes traitées"),
+    ("pipeline_stage_bytes_total", "counter", "bytes", "Octets lus ou écrits"),
+    ("pipeline_stage_peak_rss_bytes", "gauge", "rss", "Pic de RSS observé pendant l'étape"),
+]
+
+
+def _prom_labels(stage_name, labels):
+    items = [("job", JOB), ("stage", stage_name)] + list(labels)
+    return ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for k, v in items)
+
+
+def _write_prometheus():
+    lines = []
+    for metric, kind, field, help_text in PROM_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (stage_name, labels), t in sorted(_totals.items()):
+            lines.append(f"{metric}{{{_prom_labels(stage_name, labels)}}} {t[field]}")
+    path = os.path.join(METRICS_DIR, f"{JOB}.prom")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def summary():
+    """Cumuls courants par étape (pour affichage en fin de script)."""
+    with _lock:
+        return [{"stage": s, **dict(labels), **t} for (s, labels), t in sorted(_totals.items())]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+leaderboard.py
+
+Entraîne les modèles du registre (model_registry.py) sur tout l'historique,
+sauvegarde chaque artefact dans models/ et enregistre dans un leaderboard :
+- temps d'entraînement
+- taille de l'artefact
+- latence de prédiction (p50 / p99, 1 ligne et batch)
+- précision en backtest walk-forward (MAE / RMSE / R² moyens), sur tout
+  l'horizon pour tous les modèles : les modèles à lags (hist_gbm_lags) sont
+  évalués récursivement sur leurs propres prédictions (colonne `scoring`)
+
+Le leaderboard (models/leaderboard.parquet) garde une ligne par modèle et
+permet de choisir le meilleur compromis précision / latence pour le dashboard.
+
+Exemple :
+    python leaderboard.py --models linear random_forest hist_gbm
+    python leaderboard.py --show
+    python leaderboard.py --publish   # publie aussi les artefacts dans le bucket GOLD
+"""
+
+import os
+import time
+import logging
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model_registry import MODELS, DATA_PATH, TARGET, load_dataset, make_model, model_features, is_recursive
+from backtest import run_backtest, summarize
+from instrument import stage
+
+MODELS_DIR = "models"
+LEADERBOARD_PATH = os.path.join(MODELS_DIR, "leaderboard.parquet")
+
+
+# ----------------------------------------------------------------------
+# Mesures
+# ----------------------------------------------------------------------
+def measure_latency(model, X, repeat=100, batch_rows=1000):
+    """p50 / p99 (ms) pour une prédiction d'1 ligne et d'un batch."""
+    one = X.iloc[:1]
+    batch = X.iloc[np.arange(batch_rows) % len(X)]
+    out = {}
+    for label, data, n in (("1row", one, repeat), ("batch", batch, max(1, repeat // 10))):
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            model.predict(data)
+            samples.append((time.perf_counter() - t0) * 1000)
+        out[f"predict_p50_{label}_ms"] = float(np.percentile(samples, 50))
+        out[f"predict_p99_{label}_ms"] = float(np.percentile(samples, 99))
+    return out
+
+
+def evaluate_model(name, feats, y, backtest_metrics, models_dir=MODELS_DIR):
+    """Entraîne `name` sur tout l'historique, sauvegarde l'artefact et renvoie sa ligne."""
+    X = feats[model_features(name)]
+    model = make_model(name)
+
+    t0 = time.perf_counter()
+    with stage("model.fit", rows=len(X), model=name):
+        model.fit(X, y)
+    train_s = time.perf_counter() - t0
+
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, f"{name}.joblib")
+    joblib.dump(model, path)
+
+    row = {
+        "model": name,
+        "artifact": path,
+        "trained_at": datetime.utcnow(),
+        "n_rows": len(X),
+        "scoring": "recursive" if is_recursive(name) else "direct",
+        "train_s": train_s,
+        "size_mb": os.path.getsize(path) / 1e6,
+    }
+    row.update(measure_latency(model, X))
+    row.update({f"backtest_{k}": float(v) for k, v in backtest_metrics.items()})
+    return row
+
+
+# ----------------------------------------------------------------------
+# Leaderboard
+# ----------------------------------------------------------------------
+def load_leaderboard(path=LEADERBOARD_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_parquet(path)
+
+
+def update_leaderboard(rows, path=LEADERBOARD_PATH):
+    """Remplace les lignes des modèles ré-entraînés, garde les autres."""
+    board = load_leaderboard(path)
+    new = pd.DataFrame(rows)
+    if not board.empty:
+        board = board[~board["model"].isin(new["model"])]
+        new = pd.concat([board, new], ignore_index=True)
+    new = new.sort_values("backtest_mae").reset_index(drop=True)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    new.to_parquet(path, index=False)
+    return new
+
+
+def best_model(max_latency_ms=None, path=LEADERBOARD_PATH):
+    """Modèle le plus précis dont la latence p99 (1 ligne) respecte `max_latency_ms`."""
+    board = load_leaderboard(path)
+    if board.empty:
+        raise ValueError(f"Leaderboard vide : lancer d'abord `python leaderboard.py` ({path})")
+    if max_latency_ms is not None:
+        board = board[board["predict_p99_1row_ms"] <= max_latency_ms]
+        if board.empty:
+            raise ValueError(f"Aucun modèle sous {max_latency_ms} ms de latence p99")
+    return board.sort_values("backtest_mae").iloc[0]
+
+
+def build_leaderboard(models, initial, horizon, step, workers=None,
+                      data_path=DATA_PATH, target=TARGET):
+    results = run_backtest(models, initial, horizon, step, workers=workers,
+                           data_path=data_path, target=target)
+    metrics = summarize(results)[["mae", "rmse", "r2"]]
+
+    feats, y = load_dataset(data_path, target)
+    rows = []
+    for name in models:
+        logging.info("Entraînement complet de %s", name)
+        rows.append(evaluate_model(name, feats, y, metrics.loc[name].to_dict()))
+    return update_leaderboard(rows)
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", default=sorted(MODELS))
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--target", default=TARGET)
+    parser.add_argument("--initial", type=int, default=730)
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--step", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--show", action="store_true", help="affiche le leaderboard existant")
+    parser.add_argument("--publish", action="store_true", help="publie les artefacts (model_store.py)")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    if args.show:
+        board = load_leaderboard()
+    else:
+        board = build_leaderboard(args.models, args.initial, args.horizon, args.step,
+                                  workers=args.workers, data_path=args.data, target=args.target)
+        if args.publish:
+            from model_store import publish
+            metric_cols = [c for c in board.columns if c.startswith(("backtest_", "predict_", "train_s"))]
+            for _, row in board[board["model"].isin(args.models)].iterrows():
+                publish(row["model"], row["artifact"], data_paths=[args.data],
+                        metrics={c: float(row[c]) for c in metric_cols},
+                        features=model_features(row["model"]))
+
+    cols = ["model", "scoring", "backtest_mae", "backtest_rmse", "backtest_r2", "train_s",
+            "size_mb", "predict_p50_1row_ms", "predict_p99_1row_ms", "predict_p50_batch_ms"]
+    print("=== Leaderboard des modèles ===")
+    print(board[[c for c in cols if c in board.columns]].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
+from instrument import stage
 
 # --- PARAMÈTRES ---
 DATA_PATH = "cleaned_data/idf_conso_meteo_clean.parquet"
@@ -41,10 +42,12 @@ X_train, X_test, y_train, y_test = train_test_split(
 
 # --- 5. MODÈLE ---
 model = LinearRegression()
-model.fit(X_train, y_train)
+with stage("model.fit", rows=len(X_train), model="linear"):
+    model.fit(X_train, y_train)
 
 # --- 6. PRÉDICTIONS ---
-y_pred = model.predict(X_test)
+with stage("model.predict", rows=len(X_test), model="linear"):
+    y_pred = model.predict(X_test)
 
 # --- 7. ÉVALUATION ---
 mae = mean_absolute_error(y_test, y_pred)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+materialize_forecasts.py
+
+Job de pré-calcul des prévisions, à lancer après chaque mise à jour des
+données ou des modèles (cron / ordonnanceur). Les prévisions sont écrites en
+Parquet partitionné dans GOLD_BUCKET ; le dashboard ne fait plus que les lire.
+
+Tables (partitionnement Hive, un run = un identifiant horodaté) :
+    forecasts/intraday/run=<id>/zone=<zone>/part-0.parquet   pas 15 min, 6/12/24 h
+    forecasts/daily/run=<id>/zone=<zone>/part-0.parquet      journalier, 7 jours
+    forecasts/peaks/run=<id>/part-0.parquet                  dépassements par seuil
+    forecasts/latest.json                                    run courant + provenance
+
+Le job ne recalcule rien si l'ETag des données RTE, les versions des
+modèles, la date du jour et les prévisions météo (hash du contenu) sont
+identiques à ceux du dernier run (sauf --force) : un changement de météo ou
+de jour suffit à republier la table journalière.
+
+Exemple :
+    python materialize_forecasts.py
+    python materialize_forecasts.py --force --stub-weather
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from model_store import GOLD_BUCKET, get_s3, load_model, resolve
+from batch_forecast import INTRADAY_FEATURES, forecast_daily, forecast_intraday
+from weather_client import WeatherClient, StubProvider, PARIS_ARRONDISSEMENTS
+from forest_export import load_forest
+from columnar_store import time_bounds
+
+# --- Source RTE (copie silver Parquet de download_and_push_minio.py) ---
+SOURCE_BUCKET = os.getenv("MINIO_BUCKET", "smartcity-energy")
+SOURCE_PREFIX = os.getenv("MINIO_PREFIX", "raw/")
+RTE_KEY = SOURCE_PREFIX.replace("raw/", "silver/") + "rte_eco2mix_national_tr.parquet"
+RTE_TIME_COL = "date_heure_std"
+
+# --- Modèles ---
+INTRADAY_MODEL = os.getenv("MODEL_NAME", "rf_baseline")   # registre GOLD
+DAILY_MODEL_DIR = "models/rf_compact"
+DAILY_MODEL_PKL = "random_forest_meteo_only.pkl"
+
+# --- Configuration des prévisions ---
+INTRADAY_HOURS = [6, 12, 24]
+INTRADAY_ZONES = ["national"]
+DAILY_DAYS = 7
+DAILY_ZONES = ["Paris"] + list(PARIS_ARRONDISSEMENTS)
+# mêmes valeurs que le number_input du dashboard (pas de 500 MW)
+PEAK_THRESHOLDS = np.arange(40000, 90001, 500)
+
+FORECASTS_PREFIX = "forecasts/"
+LATEST_KEY = FORECASTS_PREFIX + "latest.json"
+
+
+# ----------------------------------------------------------------------
+# Utils S3
+# ----------------------------------------------------------------------
+def _put_parquet(df, key):
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    get_s3().put_object(Bucket=GOLD_BUCKET, Key=key, Body=buf.getvalue(),
+                        ContentType="application/vnd.apache.parquet")
+
+
+def _get_parquet(key, columns=None):
+    resp = get_s3().get_object(Bucket=GOLD_BUCKET, Key=key)
+    return pd.read_parquet(io.BytesIO(resp["Body"].read()), columns=columns)
+
+
+def _partition_key(table, run_id, zone=None):
+    zone_part = f"zone={zone}/" if zone is not None else ""
+    return f"{FORECASTS_PREFIX}{table}/run={run_id}/{zone_part}part-0.parquet"
+
+
+def read_latest():
+    """Manifeste du dernier run (None si aucun run n'a encore été publié)."""
+    try:
+        resp = get_s3().get_object(Bucket=GOLD_BUCKET, Key=LATEST_KEY)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    latest = json.loads(resp["Body"].read())
+    latest["etag"] = resp["ETag"]
+    return latest
+
+
+def latest_etag():
+    """ETag du manifeste (HEAD) : sert de clé de cache côté dashboard."""
+    try:
+        return get_s3().head_object(Bucket=GOLD_BUCKET, Key=LATEST_KEY)["ETag"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+
+
+def read_forecasts(table, zones=None, latest=None):
+    """
+    Lit les prévisions pré-calculées du run courant pour `zones` (toutes
+    les zones matérialisées si None) ; seules les partitions demandées sont
+    téléchargées.
+    """
+    latest = latest or read_latest()
+    if latest is None:
+        return None
+    available = latest["tables"][table]["zones"]
+    wanted = available if zones is None else [z for z in zones if z in available]
+    if not wanted:
+        return pd.DataFrame()
+    frames = [_get_parquet(_partition_key(table, latest["run_id"], z)).assign(zone=z) for z in wanted]
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_peaks(latest=None):
+    latest = latest or read_latest()
+    if latest is None:
+        return None
+    return _get_parquet(_partition_key("peaks", latest["run_id"]))
+
+
+# ----------------------------------------------------------------------
+# Entrées du job
+# ----------------------------------------------------------------------
+def _rte_last_timestamp():
+    """
+    (dernier horodatage, ETag) de la série RTE : HEAD de l'objet puis footer
+    Parquet seul (statistiques min/max des row groups), sans lire les données.
+    """
+    etag = get_s3().head_object(Bucket=SOURCE_BUCKET, Key=RTE_KEY)["ETag"]
+    _, last_ts = time_bounds(SOURCE_BUCKET, RTE_KEY, RTE_TIME_COL)
+    return last_ts, etag
+
+
+def _local_model_version():
+    if os.path.isdir(DAILY_MODEL_DIR):
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(DAILY_MODEL_DIR)):
+            with open(os.path.join(DAILY_MODEL_DIR, name), "rb") as f:
+                h.update(f.read())
+        return DAILY_MODEL_DIR, h.hexdigest()
+    with open(DAILY_MODEL_PKL, "rb") as f:
+        return DAILY_MODEL_PKL, hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_daily_model():
+    if os.path.isdir(DAILY_MODEL_DIR):
+        return load_forest(DAILY_MODEL_DIR)
+    return joblib.load(DAILY_MODEL_PKL)
+
+
+# ----------------------------------------------------------------------
+# Calcul
+# ----------------------------------------------------------------------
+def compute_peaks(intraday, thresholds=PEAK_THRESHOLDS):
+    """
+    Pour chaque (zone, horizon, seuil) : nombre de pas au-dessus du seuil et
+    premier instant de dépassement. Calcul vectorisé (pas × seuils).
+    """
+    rows = []
+    for (zone, hours), _ in intraday.groupby(["zone", "horizon_h"]):
+        sub = intraday[(intraday["zone"] == zone) & (intraday["horizon_h"] <= hours)].sort_values("timestamp")
+        above = sub["prediction"].to_numpy()[:, None] > thresholds[None, :]
+        n_peaks = above.sum(axis=0)
+        first = np.where(n_peaks > 0, above.argmax(axis=0), -1)
+        ts = sub["timestamp"].to_numpy()
+        rows.append(pd.DataFrame({
+            "zone": zone,
+            "horizon_h": hours,
+            "threshold_mw": thresholds,
+            "n_peaks": n_peaks,
+            "first_peak": pd.to_datetime(np.where(first >= 0, ts[np.maximum(first, 0)], np.datetime64("NaT"))),
+            "max_prediction": sub["prediction"].max(),
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def _weather_hash(weather):
+    """Empreinte des prévisions météo utilisées par la table journalière."""
+    return hashlib.sha256(weather.sort_values(["zone", "date"]).to_csv(index=False).encode("utf-8")).hexdigest()[:16]
+
+
+def materialize(force=False, weather_client=None):
+    """Calcule et publie un run ; renvoie le manifeste (ou None si rien n'a changé)."""
+    last_ts, rte_etag = _rte_last_timestamp()
+    intraday_version = resolve(INTRADAY_MODEL)
+    daily_path, daily_version = _local_model_version()
+    # météo récupérée avant le test de provenance (cache TTL du client)
+    client = weather_client or WeatherClient()
+    weather = client.forecast_many(DAILY_ZONES, DAILY_DAYS)
+    provenance = {"rte_etag": rte_etag, "intraday_model": f"{INTRADAY_MODEL}@{intraday_version}",
+                  "daily_model": f"{daily_path}@{daily_version}",
+                  "run_date": datetime.utcnow().date().isoformat(),
+                  "weather": _weather_hash(weather)}
+
+    previous = read_latest()
+    if not force and previous and previous.get("provenance") == provenance:
+        logging.info("Données, modèles et météo inchangés depuis le run %s : rien à faire", previous["run_id"])
+        return None
+
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    logging.info("Run %s (dernier point RTE : %s)", run_id, last_ts)
+
+    # --- intraday 15 min ---
+    intraday_model, _ = load_model(INTRADAY_MODEL, intraday_version, features=INTRADAY_FEATURES)
+    last = {zone: last_ts for zone in INTRADAY_ZONES}
+    intraday = forecast_intraday(intraday_model, last, INTRADAY_HOURS, features=INTRADAY_FEATURES)
+    for zone, part in intraday.groupby("zone"):
+        _put_parquet(part.drop(columns="zone"), _partition_key("intraday", run_id, zone))
+
+    peaks = compute_peaks(intraday)
+    _put_parquet(peaks, _partition_key("peaks", run_id))
+
+    # --- journalier (météo) ---
+    daily = forecast_daily(_load_daily_model(), weather)
+    for zone, part in daily.groupby("zone"):
+        _put_parquet(part.drop(columns="zone"), _partition_key("daily", run_id, zone))
+
+    manifest = {
+        "run_id": run_id,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "provenance": provenance,
+        "last_observation": str(last_ts),
+        "tables": {
+            "intraday": {"zones": sorted(intraday["zone"].unique().tolist()), "hours": INTRADAY_HOURS},
+            "daily": {"zones": sorted(daily["zone"].unique().tolist()), "days": DAILY_DAYS},
+            "peaks": {"thresholds": [int(PEAK_THRESHOLDS[0]), int(PEAK_THRESHOLDS[-1])]},
+        },
+    }
+    get_s3().put_object(Bucket=GOLD_BUCKET, Key=LATEST_KEY, ContentType="application/json",
+                        Body=json.dumps(manifest, indent=2).encode("utf-8"))
+    logging.info("Run %s publié : %d lignes intraday, %d lignes journalières",
+                 run_id, len(intraday), len(daily))
+    return manifest
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force", action="store_true", help="recalcule même si rien n'a changé")
+    parser.add_argument("--stub-weather", action="store_true", help="météo hors ligne (StubProvider)")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    client = WeatherClient(provider=StubProvider()) if args.stub_weather else None
+    manifest = materialize(force=args.force, weather_client=client)
+    if manifest:
+        print(f"✅ Prévisions matérialisées : s3://{GOLD_BUCKET}/{FORECASTS_PREFIX} (run {manifest['run_id']})")
+    else:
+        print("Rien à faire : prévisions déjà à jour.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# =========================================
+# model_registry.py
+# Registre des modèles de prévision + features partagées
+# =========================================
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+
+from recursive_forecast import LAG_FEATURES, serving_lag_features
+
+# --- PARAMÈTRES ---
+DATA_PATH = "cleaned_data/idf_conso_meteo_clean.parquet"
+TARGET = "elec_MW"
+
+METEO_COLS = ["Pluie_mm", "Tn_Min", "Tx_Max", "T_Moyenne", "Vent_Moyen", "Vent_Max"]
+CALENDAR_COLS = ["annee", "mois", "jour", "jour_semaine"]
+CYCLIC_COLS = ["sin_jour", "cos_jour", "sin_mois", "cos_mois"]
+
+# nom -> {"factory": callable(**params), "features": [...]}
+MODELS = {}
+
+
+def register_model(name, features):
+    """Décorateur : enregistre une fabrique de modèle sous `name`."""
+    def wrap(factory):
+        MODELS[name] = {"factory": factory, "features": list(features)}
+        return factory
+    return wrap
+
+
+def make_model(name, **params):
+    """Instancie le modèle `name` (paramètres optionnels passés à la fabrique)."""
+    if name not in MODELS:
+        raise ValueError(f"Modèle inconnu '{name}' (disponibles : {sorted(MODELS)})")
+    return MODELS[name]["factory"](**params)
+
+
+def model_features(name):
+    return MODELS[name]["features"]
+
+
+def is_recursive(name):
+    """Vrai si le modèle utilise des lags de la cible (prévision récursive au service)."""
+    return any(f in LAG_FEATURES for f in model_features(name))
+
+
+# --- FEATURES ---
+def build_features(df):
+    """
+    Calcule en une seule passe toutes les features utilisées par les modèles
+    enregistrés (météo + calendaires + encodage cyclique).
+    L'index doit être un DatetimeIndex journalier. Les NaN météo sont
+    conservés : l'imputation fait partie des modèles (SimpleImputer ajusté sur
+    le seul jeu d'entraînement), pour qu'un fold de backtest ne voie pas les
+    statistiques de sa période de test.
+    """
+    df = df.copy()
+    idx = pd.DatetimeIndex(df.index)
+    df["annee"] = idx.year
+    df["mois"] = idx.month
+    df["jour"] = idx.day
+    df["jour_semaine"] = idx.dayofweek  # 0 = lundi
+
+    df["sin_jour"] = np.sin(2 * np.pi * df["jour_semaine"] / 7)
+    df["cos_jour"] = np.cos(2 * np.pi * df["jour_semaine"] / 7)
+    df["sin_mois"] = np.sin(2 * np.pi * df["mois"] / 12)
+    df["cos_mois"] = np.cos(2 * np.pi * df["mois"] / 12)
+    return df
+
+
+def load_dataset(path=DATA_PATH, target=TARGET):
+    """
+    Charge le parquet nettoyé et renvoie (features, cible) triés par date.
+    Les lags de la cible (LAG_FEATURES) sont NaN sur les premiers jours.
+    """
+    df = pd.read_parquet(path).sort_index()
+    df = df.dropna(subset=[target])
+    feats = serving_lag_features(build_features(df), target)
+    return feats, feats[target]
+
+
+# --- MODÈLES ENREGISTRÉS ---
+@register_model("linear", METEO_COLS + CYCLIC_COLS)
+def _linear(**params):
+    return make_pipeline(SimpleImputer(strategy="mean"), LinearRegression(**params))
+
+
+@register_model("random_forest", METEO_COLS + CALENDAR_COLS)
+def _random_forest(**params):
+    params = {"n_estimators": 200, "random_state": 42, "n_jobs": 1, **params}
+    return make_pipeline(SimpleImputer(strategy="mean"), RandomForestRegressor(**params))
+
+
+@register_model("hist_gbm", METEO_COLS + CALENDAR_COLS)
+def _hist_gbm(**params):
+    # Gradient boosting sur histogrammes (features discrétisées en 255 bins) :
+    # coût d'entraînement quasi linéaire en nombre de lignes ; NaN gérés nativement
+    params = {"max_iter": 300, "learning_rate": 0.05, "max_leaf_nodes": 31,
+              "early_stopping": False, "random_state": 42, **params}
+    return HistGradientBoostingRegressor(**params)
+
+
+@register_model("hist_gbm_lags", METEO_COLS + CALENDAR_COLS + LAG_FEATURES)
+def _hist_gbm_lags(**params):
+    # Lags servis par recursive_forecast.RecursiveForecaster ; les NaN des
+    # premiers jours sont gérés nativement par le boosting
+    return _hist_gbm(**params)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+model_store.py
+
+Registre versionné des modèles dans le bucket GOLD, avec cache local.
+
+Organisation dans GOLD_BUCKET :
+    models/<nom>/<sha256>.joblib   artefact, adressé par son contenu (immuable)
+    models/<nom>/<sha256>.json     manifeste : données, code, métriques, date,
+                                   features attendues (params.features)
+    models/<nom>/current.json      pointeur vers la version courante
+
+Côté lecture, le pointeur est revalidé par ETag (If-None-Match) et l'artefact
+n'est téléchargé qu'une fois par version dans CACHE_DIR ; les modèles déjà
+chargés sont gardés en mémoire du processus (une seule désérialisation par
+version, même si le dashboard Streamlit se ré-exécute à chaque interaction).
+Les appelants passent à `load_model` les features qu'ils vont fournir : un
+modèle publié avec d'autres features est refusé au chargement plutôt qu'au
+predict.
+
+Exemple (rf_baseline = modèle intraday hour / dow / is_weekend entraîné par
+eda_template.ipynb, copie locale de models/rf_baseline.joblib, utilisé par app.py
+et materialize_forecasts.py ; les modèles journaliers du leaderboard sont
+publiés sous leur propre nom par `leaderboard.py --publish`) :
+    python model_store.py publish rf_baseline models/rf_baseline.joblib --features hour dow is_weekend
+    python model_store.py list rf_baseline
+    python model_store.py promote rf_baseline <sha256>
+    python model_store.py pull rf_baseline
+"""
+
+import os
+import json
+import hashlib
+import logging
+import subprocess
+from datetime import datetime
+
+import boto3
+import joblib
+from botocore.client import Config
+from botocore.exceptions import ClientError
+
+# --- Configuration S3/MinIO (mêmes variables que S3_creation.py) ---
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localhost:9000")
+S3_KEY = os.getenv("S3_KEY", "minioadmin")
+S3_SECRET = os.getenv("S3_SECRET", "minioadmin123")
+GOLD_BUCKET = os.getenv("GOLD_BUCKET", "gold")
+
+MODELS_PREFIX = "models/"
+CACHE_DIR = os.getenv("MODEL_CACHE_DIR", ".model_cache")
+
+_s3 = None
+_loaded = {}  # (nom, version) -> modèle désérialisé
+
+
+def get_s3():
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT,
+            aws_access_key_id=S3_KEY,
+            aws_secret_access_key=S3_SECRET,
+            config=Config(signature_version="s3v4"),
+            region_name="us-east-1",
+        )
+    return _s3
+
+
+# ----------------------------------------------------------------------
+# Utils
+# ----------------------------------------------------------------------
+def sha256_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def git_commit():
+    """Commit git du code qui a produit le modèle (None hors dépôt git)."""
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def artifact_features(path):
+    """Features (dans l'ordre) d'un artefact joblib entraîné sur un DataFrame, None sinon."""
+    names = getattr(joblib.load(path), "feature_names_in_", None)
+    return [str(c) for c in names] if names is not None else None
+
+
+def check_features(manifest, features):
+    """Lève ValueError si la version publiée n'attend pas exactement `features`."""
+    expected = manifest.get("params", {}).get("features")
+    label = f"{manifest['name']}@{manifest['version'][:12]}"
+    if expected is None:
+        raise ValueError(f"{label} : features absentes du manifeste (republier avec --features)")
+    if list(expected) != list(features):
+        raise ValueError(f"{label} : entraîné sur {expected}, appelé avec {list(features)}")
+
+
+def _key(name, filename):
+    return f"{MODELS_PREFIX}{name}/{filename}"
+
+
+def _object_exists(key):
+    try:
+        get_s3().head_object(Bucket=GOLD_BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+
+
+def _put_json(key, payload):
+    body = json.dumps(payload, indent=2, default=str).encode("utf-8")
+    get_s3().put_object(Bucket=GOLD_BUCKET, Key=key, Body=body, ContentType="application/json")
+
+
+def _get_json(key):
+    resp = get_s3().get_object(Bucket=GOLD_BUCKET, Key=key)
+    return json.loads(resp["Body"].read())
+
+
+# ----------------------------------------------------------------------
+# Publication
+# ----------------------------------------------------------------------
+def publish(name, artifact_path, data_paths=(), metrics=None, params=None, set_current=True, features=None):
+    """
+    Publie `artifact_path` sous `name`. La version est le sha256 du fichier :
+    republier un artefact identique ne ré-uploade rien. `features` (sinon
+    lues dans l'artefact, `feature_names_in_`) est enregistré dans
+    params.features du manifeste.
+    """
+    features = features or artifact_features(artifact_path)
+    if not features:
+        raise ValueError(f"{artifact_path} : features inconnues, les passer explicitement (--features)")
+    version = sha256_file(artifact_path)
+    ext = os.path.splitext(artifact_path)[1] or ".joblib"
+    artifact_key = _key(name, f"{version}{ext}")
+
+    if _object_exists(artifact_key):
+        logging.info("Artefact déjà présent → s3://%s/%s", GOLD_BUCKET, artifact_key)
+    else:
+        get_s3().upload_file(artifact_path, GOLD_BUCKET, artifact_key)
+        logging.info("Artefact publié → s3://%s/%s", GOLD_BUCKET, artifact_key)
+
+    manifest = {
+        "name": name,
+        "version": version,
+        "artifact_key": artifact_key,
+        "size_bytes": os.path.getsize(artifact_path),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "code_commit": git_commit(),
+        "data": {p: sha256_file(p) for p in data_paths},
+        "metrics": metrics or {},
+        "params": {**(params or {}), "features": list(features)},
+    }
+    _put_json(_key(name, f"{version}.json"), manifest)
+    if set_current:
+        promote(name, version)
+    return manifest
+
+
+def promote(name, version):
+    """Fait pointer `current` sur `version` (qui doit exister)."""
+    manifest = _get_json(_key(name, f"{version}.json"))
+    _put_json(_key(name, "current.json"), {"version": version, "artifact_key": manifest["artifact_key"],
+                                           "promoted_at": datetime.utcnow().isoformat() + "Z"})
+    logging.info("%s courant → %s", name, version)
+    return manifest
+
+
+def list_versions(name):
+    """Manifestes de toutes les versions de `name`, du plus récent au plus ancien."""
+    paginator = get_s3().get_paginator("list_objects_v2")
+    manifests = []
+    for page in paginator.paginate(Bucket=GOLD_BUCKET, Prefix=_key(name, "")):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".json") and not obj["Key"].endswith("current.json"):
+                manifests.append(_get_json(obj["Key"]))
+    return sorted(manifests, key=lambda m: m["created_at"], reverse=True)
+
+
+# ----------------------------------------------------------------------
+# Lecture avec cache local
+# ----------------------------------------------------------------------
+def _cached_get(key, cache_dir=CACHE_DIR):
+    """
+    GET conditionnel : renvoie le chemin local de `key`, retéléchargé
+    seulement si l'ETag distant a changé (304 sinon).
+    """
+    local = os.path.join(cache_dir, GOLD_BUCKET, key)
+    etag_file = local + ".etag"
+    kwargs = {}
+    if os.path.exists(local) and os.path.exists(etag_file):
+        with open(etag_file, encoding="utf-8") as f:
+            kwargs["IfNoneMatch"] = f.read().strip()
+    try:
+        resp = get_s3().get_object(Bucket=GOLD_BUCKET, Key=key, **kwargs)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("304", "NotModified"):
+            return local
+        raise
+
+    os.makedirs(os.path.dirname(local), exist_ok=True)
+    tmp = local + ".part"
+    with open(tmp, "wb") as f:
+        for chunk in iter(lambda: resp["Body"].read(1 << 20), b""):
+            f.write(chunk)
+    os.replace(tmp, local)
+    with open(etag_file, "w", encoding="utf-8") as f:
+        f.write(resp["ETag"])
+    return local
+
+
+def resolve(name, version="current", cache_dir=CACHE_DIR):
+    """Version effective de `name` ("current" est résolu via le pointeur)."""
+    if version != "current":
+        return version
+    with open(_cached_get(_key(name, "current.json"), cache_dir), encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+
+def fetch(name, version="current", cache_dir=CACHE_DIR):
+    """
+    Chemin local de l'artefact. Les artefacts étant immuables (adressés par
+    contenu), une version déjà en cache n'est jamais retéléchargée.
+    """
+    version = resolve(name, version, cache_dir)
+    manifest_path = _cached_get(_key(name, f"{version}.json"), cache_dir)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    local = os.path.join(cache_dir, GOLD_BUCKET, manifest["artifact_key"])
+    if not (os.path.exists(local) and sha256_file(local) == version):
+        local = _cached_get(manifest["artifact_key"], cache_dir)
+        if sha256_file(local) != version:
+            raise ValueError(f"Artefact corrompu pour {name}@{version}")
+    return local, manifest
+
+
+def load_model(name, version="current", cache_dir=CACHE_DIR, features=None):
+    """
+    Charge (une fois par version et par processus) le modèle `name`. Avec
+    `features`, vérifie que la version a été publiée pour ces features.
+    """
+    version = resolve(name, version, cache_dir)
+    if (name, version) not in _loaded:
+        path, manifest = fetch(name, version, cache_dir)
+        if features is not None:
+            check_features(manifest, features)
+        _loaded[(name, version)] = (joblib.load(path), manifest)
+    elif features is not None:
+        check_features(_loaded[(name, version)][1], features)
+    return _loaded[(name, version)]
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_pub = sub.add_parser("publish")
+    p_pub.add_argument("name")
+    p_pub.add_argument("artifact")
+    p_pub.add_argument("--data", nargs="*", default=[])
+    p_pub.add_argument("--metrics", default=None, help="JSON des métriques")
+    p_pub.add_argument("--features", nargs="+", default=None,
+                       help="features attendues (défaut : feature_names_in_ de l'artefact)")
+    p_pub.add_argument("--no-current", action="store_true")
+
+    p_list = sub.add_parser("list")
+    p_list.add_argument("name")
+
+    p_prom = sub.add_parser("promote")
+    p_prom.add_argument("name")
+    p_prom.add_argument("version")
+
+    p_pull = sub.add_parser("pull")
+    p_pull.add_argument("name")
+    p_pull.add_argument("--version", default="current")
+
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    if args.cmd == "publish":
+        metrics = json.loads(args.metrics) if args.metrics else None
+        m = publish(args.name, args.artifact, data_paths=args.data, metrics=metrics,
+                    set_current=not args.no_current, features=args.features)
+        print(f"✅ {m['name']}@{m['version'][:12]} publié (code {m['code_commit']}, "
+              f"features {m['params']['features']})")
+    elif args.cmd == "list":
+        for m in list_versions(args.name):
+            print(f"{m['version'][:12]}  {m['created_at']}  {m['size_bytes'] / 1e6:.1f} Mo  {m['metrics']}")
+    elif args.cmd == "promote":
+        promote(args.name, args.version)
+        print(f"✅ {args.name} courant → {args.version[:12]}")
+    else:
+        path, m = fetch(args.name, args.version)
+        print(f"✅ {args.name}@{m['version'][:12]} → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+peak_stream.py
+
+Service local de détection de pics en continu sur les données eco2mix.
+
+Le service interroge l'API ODRÉ (eco2mix-national-tr) à intervalle régulier,
+ne traite que les lignes plus récentes que la dernière vue, et maintient en
+mémoire constante (buffers circulaires de taille fixe) :
+- moyenne glissante   (somme courante, O(1) par point)
+- max glissant        (deque monotone, O(1) amorti par point)
+- taux de variation   (MW / 15 min)
+- erreur prévision vs réalisé (colonne `prevision_j` d'eco2mix, MAE glissante)
+
+Les alertes (seuil, variation brutale, anomalie z-score, erreur de prévision)
+sont envoyées à un sink local : fichier JSON lines et/ou queue.Queue.
+L'alerte de seuil n'est émise qu'au franchissement à la hausse ; elle est
+réarmée quand la consommation repasse sous seuil - HYSTERESIS_MW. Les points
+historiques de l'amorçage alimentent les fenêtres sans émettre d'alerte.
+
+Exemple :
+    python peak_stream.py --threshold 60000 --interval 60 --alerts alerts/peaks.jsonl
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import logging
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+import requests
+
+API_URL = "https://odre.opendatasoft.com/api/explore/v2.1/catalog/datasets/eco2mix-national-tr/records"
+TIME_FIELD = "date_heure"
+ACTUAL_FIELD = "consommation"
+FORECAST_FIELD = "prevision_j"
+
+WINDOW = 96                # 24 h de points 15 min
+THRESHOLD_MW = 60000.0
+HYSTERESIS_MW = 500.0      # marge sous le seuil pour réarmer l'alerte
+RAMP_MW = 2500.0           # variation max tolérée entre deux points
+ZSCORE = 4.0
+FORECAST_ERROR_MW = 3000.0
+POLL_INTERVAL = 60         # secondes
+PAGE_SIZE = 100
+TIMEOUT = (3.05, 15)
+
+
+# ----------------------------------------------------------------------
+# Statistiques glissantes
+# ----------------------------------------------------------------------
+class RingBuffer:
+    """Buffer circulaire de taille fixe (valeurs float)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.data = [0.0] * size
+        self.count = 0
+        self.pos = 0
+
+    def push(self, value):
+        """Ajoute `value` ; renvoie la valeur évincée (None tant que non plein)."""
+        evicted = self.data[self.pos] if self.count == self.size else None
+        self.data[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return evicted
+
+    def __len__(self):
+        return self.count
+
+
+class RollingStats:
+    """Moyenne, écart-type, max sur les `window` derniers points, en O(1) par ajout."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.buf = RingBuffer(window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.n_seen = 0
+        self._max = deque()  # (indice, valeur), valeurs décroissantes
+
+    def push(self, value):
+        evicted = self.buf.push(value)
+        self.total += value
+        self.total_sq += value * value
+        if evicted is not None:
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((self.n_seen, value))
+        if self._max[0][0] <= self.n_seen - self.window:
+            self._max.popleft()
+        self.n_seen += 1
+
+    @property
+    def mean(self):
+        return self.total / len(self.buf) if len(self.buf) else math.nan
+
+    @property
+    def std(self):
+        n = len(self.buf)
+        if n < 2:
+            return math.nan
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else math.nan
+
+
+# ----------------------------------------------------------------------
+# Sinks
+# ----------------------------------------------------------------------
+class JsonlSink:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+
+    def emit(self, alert):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, default=str) + "\n")
+
+
+class QueueSink:
+    def __init__(self, q=None):
+        self.queue = q or queue.Queue()
+
+    def emit(self, alert):
+        self.queue.put(alert)
+
+
+# ----------------------------------------------------------------------
+# Détecteur
+# ----------------------------------------------------------------------
+class PeakDetector:
+    def __init__(self, sinks, window=WINDOW, threshold=THRESHOLD_MW, ramp=RAMP_MW,
+                 zscore=ZSCORE, forecast_error=FORECAST_ERROR_MW, hysteresis=HYSTERESIS_MW):
+        self.sinks = sinks
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.above = False  # au-dessus du seuil depuis le dernier franchissement
+        self.ramp = ramp
+        self.zscore = zscore
+        self.forecast_error = forecast_error
+        self.actual = RollingStats(window)
+        self.abs_error = RollingStats(window)
+        self.last_value = None
+        self.last_ts = None
+
+    def _alert(self, kind, ts, value, emit=True, **extra):
+        if not emit:
+            return
+        alert = {"type": kind, "timestamp": ts, "value_mw": value,
+                 "emitted_at": datetime.utcnow().isoformat() + "Z", **extra}
+        logging.warning("Alerte %s à %s : %.0f MW %s", kind, ts, value, extra)
+        for sink in self.sinks:
+            sink.emit(alert)
+
+    def update(self, ts, value, forecast=None, emit=True):
+        """
+        Traite un nouveau point ; renvoie les statistiques courantes.
+        `emit=False` (amorçage sur l'historique) met à jour l'état sans alerter.
+        """
+        # anomalie évaluée par rapport à la fenêtre avant ajout du point
+        mean, std = self.actual.mean, self.actual.std
+        rate = value - self.last_value if self.last_value is not None else 0.0
+
+        if value > self.threshold and not self.above:
+            self.above = True
+            self._alert("threshold", ts, value, emit, threshold_mw=self.threshold)
+        elif value < self.threshold - self.hysteresis:
+            self.above = False
+        if abs(rate) > self.ramp:
+            self._alert("ramp", ts, value, emit, rate_mw_per_step=rate)
+        if std and not math.isnan(std) and std > 0 and abs(value - mean) / std > self.zscore:
+            self._alert("anomaly", ts, value, emit, zscore=(value - mean) / std, rolling_mean_mw=mean)
+
+        error = None
+        if forecast is not None and not math.isnan(forecast):
+            error = value - forecast
+            self.abs_error.push(abs(error))
+            if abs(error) > self.forecast_error:
+                self._alert("forecast_error", ts, value, emit, forecast_mw=forecast, error_mw=error)
+
+        self.actual.push(value)
+        self.last_value, self.last_ts = value, ts
+        return {"timestamp": ts, "value_mw": value, "rolling_mean_mw": self.actual.mean,
+                "rolling_max_mw": self.actual.max, "rate_mw_per_step": rate,
+                "forecast_error_mw": error, "rolling_mae_mw": self.abs_error.mean}
+
+
+# ----------------------------------------------------------------------
+# Ingestion
+# ----------------------------------------------------------------------
+def fetch_new_rows(session, since=None, limit=PAGE_SIZE):
+    """
+    Lignes eco2mix avec une consommation renseignée, postérieures à `since`
+    (ordre chronologique). Sans `since`, renvoie les `limit` plus récentes
+    pour amorcer les fenêtres glissantes.
+    """
+    where = f"{ACTUAL_FIELD} is not null"
+    if since is not None:
+        where += f" and {TIME_FIELD} > '{pd.Timestamp(since).isoformat()}'"
+    order = "asc" if since is not None else "desc"
+    params = {"select": f"{TIME_FIELD},{ACTUAL_FIELD},{FORECAST_FIELD}", "where": where,
+              "order_by": f"{TIME_FIELD} {order}", "limit": limit, "timezone": "Europe/Paris"}
+    r = session.get(API_URL, params=params, timeout=TIMEOUT)
+    r.raise_for_status()
+    rows = r.json().get("results", [])
+    return rows if since is not None else rows[::-1]
+
+
+def run(detector, interval=POLL_INTERVAL, max_polls=None):
+    session = requests.Session()
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        bootstrap = detector.last_ts is None
+        try:
+            if bootstrap:
+                rows = fetch_new_rows(session, None, limit=min(detector.actual.window, PAGE_SIZE))
+            else:
+                rows = fetch_new_rows(session, detector.last_ts)
+        except requests.RequestException as e:
+            logging.error("Échec récupération eco2mix : %s", e)
+            rows = []
+        for rec in rows:
+            ts = pd.Timestamp(rec[TIME_FIELD])
+            forecast = rec.get(FORECAST_FIELD)
+            stats = detector.update(ts, float(rec[ACTUAL_FIELD]),
+                                    float(forecast) if forecast is not None else None, emit=not bootstrap)
+            logging.debug("%s", stats)
+        if rows:
+            logging.info("%d nouvelles lignes, dernière %s (moy. 24 h %.0f MW, max %.0f MW)",
+                         len(rows), detector.last_ts, detector.actual.mean, detector.actual.max)
+        # on repasse tout de suite si la page était pleine (rattrapage)
+        if len(rows) < PAGE_SIZE:
+            time.sleep(interval)
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threshold", type=float, default=THRESHOLD_MW)
+    parser.add_argument("--hysteresis", type=float, default=HYSTERESIS_MW)
+    parser.add_argument("--ramp", type=float, default=RAMP_MW)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL)
+    parser.add_argument("--alerts", default="alerts/peaks.jsonl")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    detector = PeakDetector([JsonlSink(args.alerts)], window=args.window,
+                            threshold=args.threshold, ramp=args.ramp, hysteresis=args.hysteresis)
+    logging.info("Surveillance eco2mix (seuil %.0f MW, alertes → %s)", args.threshold, args.alerts)
+    try:
+        run(detector, interval=args.interval)
+    except KeyboardInterrupt:
+        logging.info("Arrêt demandé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+query.py
+
+Couche de requêtes DuckDB sur les données nettoyées et les buckets
+silver / gold. Les fichiers Parquet sont déclarés comme vues : rien n'est
+chargé en mémoire à l'avance, DuckDB lit en streaming (projection de
+colonnes, filtres poussés dans les row groups), parallélise sur tous les
+cœurs et déborde sur disque (temp_directory) si un group-by ou une jointure
+dépasse memory_limit. Seul le résultat final est converti en pandas / Arrow.
+
+Vues déclarées :
+- une vue par fichier cleaned_data/*.parquet (nom = nom du fichier)
+- rte_eco2mix        : historique eco2mix colonnaire (silver)
+- forecasts_intraday / forecasts_daily / forecasts_peaks : prévisions gold
+  (partitions Hive run=/zone= exposées en colonnes)
+Les buckets sont lus directement dans MinIO (httpfs) ou, si LOCAL_MIRROR est
+défini, dans un miroir local <LOCAL_MIRROR>/<bucket>/<clé>.
+
+Exemple :
+    python query.py --tables
+    python query.py --example monthly
+    python query.py "SELECT year(\"Date - Heure\") AS annee, avg(elec_MW) FROM idf_conso_meteo_clean GROUP BY ALL ORDER BY 1"
+"""
+
+import os
+import glob
+import logging
+
+import duckdb
+
+CLEANED_DIR = "cleaned_data"
+LOCAL_MIRROR = os.getenv("LOCAL_MIRROR")  # ex. ./lake → ./lake/gold/forecasts/...
+
+# --- MinIO (mêmes variables que download_and_push_minio.py / model_store.py) ---
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+SOURCE_BUCKET = os.getenv("MINIO_BUCKET", "smartcity-energy")
+SILVER_PREFIX = os.getenv("MINIO_PREFIX", "raw/").replace("raw/", "silver/")
+GOLD_BUCKET = os.getenv("GOLD_BUCKET", "gold")
+
+MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "2GB")
+TEMP_DIR = os.getenv("DUCKDB_TEMP_DIR", ".duckdb_tmp")
+
+# nom de vue -> (bucket, motif de clé, partitions Hive)
+LAKE_TABLES = {
+    "rte_eco2mix": (SOURCE_BUCKET, SILVER_PREFIX + "rte_eco2mix_national_tr.parquet", False),
+    "forecasts_intraday": (GOLD_BUCKET, "forecasts/intraday/*/*/*.parquet", True),
+    "forecasts_daily": (GOLD_BUCKET, "forecasts/daily/*/*/*.parquet", True),
+    "forecasts_peaks": (GOLD_BUCKET, "forecasts/peaks/*/*.parquet", True),
+}
+
+EXAMPLES = {
+    "monthly": """
+        SELECT date_trunc('month', "Date - Heure") AS mois,
+               avg(elec_MW) AS elec_MW_moy, max(elec_MW) AS elec_MW_max,
+               avg(T_Moyenne) AS temp_moy
+        FROM idf_conso_meteo_clean
+        GROUP BY ALL ORDER BY mois
+    """,
+    "rolling": """
+        SELECT "Date - Heure" AS jour, elec_MW,
+               avg(elec_MW) OVER w AS elec_MW_moy7,
+               elec_MW - lag(elec_MW, 7) OVER (ORDER BY "Date - Heure") AS delta_7j
+        FROM idf_conso_meteo_clean
+        WINDOW w AS (ORDER BY "Date - Heure" ROWS BETWEEN 6 PRECEDING AND CURRENT ROW)
+        ORDER BY jour
+    """,
+    "temp_bins": """
+        SELECT floor(T_Moyenne / 2) * 2 AS temp_bin, count(*) AS n_jours,
+               avg(elec_MW) AS elec_MW_moy
+        FROM idf_conso_meteo_clean
+        GROUP BY ALL ORDER BY temp_bin
+    """,
+}
+
+
+def _ident(name):
+    """Identifiant SQL entre guillemets (noms de fichiers avec tirets, espaces...)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    """Littéral chaîne SQL (apostrophes doublées)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _lake_path(bucket, key):
+    if LOCAL_MIRROR:
+        return os.path.join(LOCAL_MIRROR, bucket, key)
+    return f"s3://{bucket}/{key}"
+
+
+def _configure_s3(con):
+    con.execute("INSTALL httpfs")
+    con.execute("LOAD httpfs")
+    con.execute(f"SET s3_endpoint={_literal(MINIO_ENDPOINT)}")
+    con.execute(f"SET s3_access_key_id={_literal(MINIO_ACCESS_KEY)}")
+    con.execute(f"SET s3_secret_access_key={_literal(MINIO_SECRET_KEY)}")
+    con.execute(f"SET s3_use_ssl={'true' if MINIO_SECURE else 'false'}")
+    con.execute("SET s3_url_style='path'")
+    con.execute("SET s3_region='us-east-1'")
+
+
+def connect(database=":memory:", threads=None, memory_limit=MEMORY_LIMIT, lake=True):
+    """
+    Connexion DuckDB avec les vues déclarées. Les vues du lac injoignables
+    (MinIO arrêté, miroir absent) sont ignorées avec un warning.
+    """
+    con = duckdb.connect(database)
+    con.execute(f"SET memory_limit={_literal(memory_limit)}")
+    con.execute(f"SET temp_directory={_literal(TEMP_DIR)}")
+    if threads:
+        con.execute(f"SET threads={int(threads)}")
+
+    for path in sorted(glob.glob(os.path.join(CLEANED_DIR, "*.parquet"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        con.execute(f"CREATE OR REPLACE VIEW {_ident(name)} AS SELECT * FROM read_parquet({_literal(path)})")
+
+    if lake:
+        if not LOCAL_MIRROR:
+            try:
+                _configure_s3(con)
+            except duckdb.Error as e:
+                logging.warning("httpfs indisponible, vues du lac ignorées : %s", e)
+                return con
+        for name, (bucket, key, hive) in LAKE_TABLES.items():
+            path = _lake_path(bucket, key)
+            try:
+                con.execute(f"CREATE OR REPLACE VIEW {_ident(name)} AS SELECT * FROM "
+                            f"read_parquet({_literal(path)}, hive_partitioning={str(hive).lower()})")
+            except duckdb.Error as e:
+                logging.warning("Vue %s ignorée (%s) : %s", name, path, e)
+    return con
+
+
+def tables(con):
+    return [r[0] for r in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal").fetchall()]
+
+
+def query(sql, con=None, arrow=False):
+    """Exécute `sql` ; renvoie un DataFrame pandas (ou une table Arrow)."""
+    con = con or connect()
+    rel = con.sql(sql)
+    return rel.arrow() if arrow else rel.df()
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sql", nargs="?", help="requête SQL")
+    parser.add_argument("--example", choices=sorted(EXAMPLES))
+    parser.add_argument("--tables", action="store_true", help="liste les vues déclarées")
+    parser.add_argument("--no-lake", action="store_true", help="n'expose que cleaned_data/")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--out", default=None, help="écrit le résultat en Parquet")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    con = connect(threads=args.threads, lake=not args.no_lake)
+    if args.tables:
+        print("\n".join(tables(con)))
+        return
+
+    sql = EXAMPLES[args.example] if args.example else args.sql
+    if not sql:
+        parser.error("une requête SQL ou --example est requis")
+    if args.out:
+        con.execute(f"COPY ({sql}) TO {_literal(args.out)} (FORMAT parquet)")
+        print(f"✅ Résultat écrit dans {args.out}")
+    else:
+        print(query(sql, con).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
+from forest_export import export_forest
+from instrument import stage
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -71,7 +73,8 @@ grid_search = GridSearchCV(
     scoring="r2",
     verbose=1
 )
-grid_search.fit(X_train, y_train)
+with stage("model.fit", rows=len(X_train), model="random_forest_gridsearch"):
+    grid_search.fit(X_train, y_train)
 
 best_rf = grid_search.best_estimator_
 print("Meilleurs hyperparamètres :", grid_search.best_params_)
@@ -79,7 +82,8 @@ print("Meilleurs hyperparamètres :", grid_search.best_params_)
 # ==========================
 # 5. Évaluation du modèle
 # ==========================
-y_pred = best_rf.predict(X_test)
+with stage("model.predict", rows=len(X_test), model="random_forest"):
+    y_pred = best_rf.predict(X_test)
 print(f"MAE  : {mean_absolute_error(y_test, y_pred):.2f}")
 print(f"RMSE : {np.sqrt(mean_squared_error(y_test, y_pred)):.2f}")
 print(f"R²   : {r2_score(y_test, y_pred):.3f}")
@@ -103,3 +107,7 @@ plt.show()
 # ==========================
 joblib.dump(best_rf, "random_forest_meteo_only.pkl")
 print("✅ Modèle sauvegardé dans 'random_forest_meteo_only.pkl'")
+
+# Export compact (tableaux numpy memory-mappables) pour le dashboard
+export_forest(best_rf, "models/rf_compact", float32=True)
+print("✅ Export compact dans 'models/rf_compact'")
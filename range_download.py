@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+range_download.py
+
+Téléchargement reprenable et parallèle des gros exports bruts.
+
+Si le serveur accepte les requêtes HTTP Range (sondé par un GET bytes=0-0),
+le fichier est découpé en segments de PART_SIZE octets, téléchargés en
+parallèle ; chaque segment devient directement une part d'upload multipart
+S3 (ou est écrit à sa place dans un fichier local). Les segments terminés
+sont notés dans un checkpoint JSON (CHECKPOINT_DIR) : après une erreur, le
+run suivant reprend l'upload multipart existant et ne récupère que les
+segments manquants. Le checkpoint est invalidé si la ressource a changé
+(ETag / Last-Modified / taille). Les segments sont demandés avec If-Range
+(ETag fort uniquement, sinon Last-Modified) : si le serveur répond 200, la
+ressource a changé en cours de route, le checkpoint est supprimé et le
+transfert repart de zéro.
+
+Sans support des Range (ou sans taille connue), repli sur un flux unique
+comme avant.
+
+Exemple (avec le serveur local stub_server.py) :
+    python stub_server.py --dir data --port 8765 &
+    python range_download.py http://localhost:8765/gros.csv --dest-file /tmp/gros.csv --workers 8
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from http_session import make_session
+
+PART_SIZE = 16 << 20          # >= 5 Mo (minimum S3 hors dernière part)
+MAX_WORKERS = 6
+SEGMENT_RETRIES = 4
+TIMEOUT = (5, 120)
+CHECKPOINT_DIR = ".ingest_checkpoints"
+
+
+class RangesUnsupported(Exception):
+    pass
+
+
+# ----------------------------------------------------------------------
+# Sondage
+# ----------------------------------------------------------------------
+def probe(session, url):
+    """
+    GET bytes=0-0 : renvoie (taille, validateur) si le serveur répond 206 avec
+    Content-Range (ou 416 pour un objet vide) ; lève RangesUnsupported sinon. Le validateur est l'ETag
+    s'il est fort (les ETags faibles W/"..." sont interdits dans If-Range),
+    sinon Last-Modified.
+    """
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT) as r:
+        content_range = r.headers.get("Content-Range", "")
+        etag = r.headers.get("ETag", "")
+        validator = etag if etag and not etag.startswith("W/") else r.headers.get("Last-Modified", "")
+        # objet vide : bytes=0-0 n'est pas satisfiable (416, Content-Range bytes */0)
+        if r.status_code == 416 and content_range == "bytes */0":
+            return 0, validator
+        r.raise_for_status()
+        if r.status_code != 206 or "/" not in content_range or content_range.endswith("/*"):
+            raise RangesUnsupported(f"{url} : statut {r.status_code}, Content-Range '{content_range}'")
+        size = int(content_range.rsplit("/", 1)[1])
+    return size, validator
+
+
+def segments(size, part_size=PART_SIZE):
+    """[(numéro de part 1..n, début, fin incluse)]."""
+    return [(i + 1, start, min(start + part_size, size) - 1)
+            for i, start in enumerate(range(0, size, part_size))]
+
+
+# ----------------------------------------------------------------------
+# Checkpoint
+# ----------------------------------------------------------------------
+class Checkpoint:
+    """État reprenable d'un transfert, réécrit atomiquement à chaque segment terminé."""
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self._lock = threading.Lock()
+
+    @classmethod
+    def path_for(cls, name, checkpoint_dir=CHECKPOINT_DIR):
+        return os.path.join(checkpoint_dir, f"{name}.json")
+
+    @classmethod
+    def load(cls, name, checkpoint_dir=CHECKPOINT_DIR):
+        path = cls.path_for(name, checkpoint_dir)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def create(cls, name, checkpoint_dir=CHECKPOINT_DIR, **state):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        cp = cls(cls.path_for(name, checkpoint_dir), {**state, "parts": {}})
+        cp.save()
+        return cp
+
+    def matches(self, url, size, validator, part_size):
+        s = self.state
+        return (s.get("url"), s.get("size"), s.get("validator"), s.get("part_size")) == \
+            (url, size, validator, part_size)
+
+    def done(self, part_number, token):
+        with self._lock:
+            self.state["parts"][str(part_number)] = token
+            self.save()
+
+    def completed(self):
+        return {int(k): v for k, v in self.state["parts"].items()}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def pending_key(name, checkpoint_dir=CHECKPOINT_DIR):
+    """Clé de destination d'un transfert interrompu pour `name` (None sinon)."""
+    cp = Checkpoint.load(name, checkpoint_dir)
+    return cp.state.get("key") if cp else None
+
+
+# ----------------------------------------------------------------------
+# Destinations
+# ----------------------------------------------------------------------
+class S3MultipartSink:
+    """Chaque segment devient une part multipart ; le jeton de part est son ETag."""
+
+    def __init__(self, s3, bucket, key, content_type="text/csv"):
+        self.s3, self.bucket, self.key, self.content_type = s3, bucket, key, content_type
+        self.upload_id = None
+
+    def open(self, checkpoint):
+        upload_id = checkpoint.state.get("upload_id")
+        if upload_id:
+            try:
+                # list_parts renvoie au plus 1000 parts par appel : pagination
+                pages = self.s3.get_paginator("list_parts").paginate(
+                    Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+                present = {p["PartNumber"] for page in pages for p in page.get("Parts", [])}
+                self.upload_id = upload_id
+                # les parts notées mais absentes côté S3 seront refaites
+                checkpoint.state["parts"] = {k: v for k, v in checkpoint.state["parts"].items()
+                                             if int(k) in present}
+                return
+            except Exception as e:
+                logging.warning("Upload multipart %s introuvable, redémarrage : %s", upload_id, e)
+                checkpoint.state["parts"] = {}
+        self.upload_id = self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key, ContentType=self.content_type)["UploadId"]
+        checkpoint.state["upload_id"] = self.upload_id
+        checkpoint.save()
+
+    def write(self, part_number, offset, data):
+        r = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                PartNumber=part_number, Body=data)
+        return r["ETag"]
+
+    def complete(self, parts):
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": n, "ETag": parts[n]} for n in sorted(parts)]})
+
+    def abort(self, checkpoint):
+        upload_id = checkpoint.state.get("upload_id")
+        if upload_id:
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+            except Exception as e:
+                logging.debug("Abort multipart %s : %s", upload_id, e)
+
+    def stream(self, raw):
+        self.s3.upload_fileobj(raw, self.bucket, self.key)
+
+
+class FileSink:
+    """Fichier local pré-alloué ; chaque segment est écrit à son offset."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self, checkpoint):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path):
+            checkpoint.state["parts"] = {}
+        if not checkpoint.state["parts"]:
+            with open(self.path, "wb") as f:
+                f.truncate(checkpoint.state["size"])
+
+    def write(self, part_number, offset, data):
+        with open(self.path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+        return hashlib.md5(data).hexdigest()
+
+    def complete(self, parts):
+        pass
+
+    def abort(self, checkpoint):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def stream(self, raw):
+        with open(self.path, "wb") as f:
+            while True:
+                chunk = raw.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+
+# ----------------------------------------------------------------------
+# Transfert
+# ----------------------------------------------------------------------
+def fetch_segment(session, url, start, end, validator=""):
+    """Télécharge [start, end] avec quelques tentatives ; vérifie la longueur reçue."""
+    headers = {"Range": f"bytes={start}-{end}"}
+    if validator:
+        headers["If-Range"] = validator
+    for attempt in range(1, SEGMENT_RETRIES + 1):
+        try:
+            r = session.get(url, headers=headers, timeout=TIMEOUT)
+            r.raise_for_status()
+            if r.status_code != 206:
+                # If-Range non satisfait : la ressource a changé pendant le transfert
+                raise RangesUnsupported(f"réponse {r.status_code} à une requête Range")
+            if len(r.content) != end - start + 1:
+                raise IOError(f"segment {start}-{end} tronqué ({len(r.content)} octets)")
+            return r.content
+        except (requests.RequestException, IOError) as e:
+            if attempt == SEGMENT_RETRIES:
+                raise
+            logging.debug("Segment %d-%d, tentative %d : %s", start, end, attempt, e)
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+
+def download(url, sink, name, workers=MAX_WORKERS, part_size=PART_SIZE, session=None,
+             checkpoint_dir=CHECKPOINT_DIR, key=None, restart=True):
+    """
+    Télécharge `url` vers `sink` ; reprend un transfert interrompu de même
+    nom. Renvoie "ranged", "resumed" ou "stream". Si la ressource change
+    pendant le transfert, repart une fois de zéro (`restart`).
+    """
+    session = session or make_session(pool_size=workers)
+    try:
+        size, validator = probe(session, url)
+    except RangesUnsupported as e:
+        logging.info("%s : pas de Range (%s), flux unique", name, e)
+        stale = Checkpoint.load(name, checkpoint_dir)
+        if stale:
+            sink.abort(stale)
+            stale.remove()
+        with session.get(url, stream=True, timeout=(TIMEOUT[0], 600)) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            sink.stream(r.raw)
+        return "stream"
+
+    if size == 0:
+        # aucune part à envoyer (S3 refuse un multipart sans part)
+        sink.stream(io.BytesIO(b""))
+        return "ranged"
+
+    cp = Checkpoint.load(name, checkpoint_dir)
+    if cp and not cp.matches(url, size, validator, part_size):
+        logging.info("%s : ressource modifiée depuis le checkpoint, redémarrage", name)
+        sink.abort(cp)
+        cp.remove()
+        cp = None
+    resumed = cp is not None
+    if cp is None:
+        cp = Checkpoint.create(name, checkpoint_dir, url=url, size=size, validator=validator,
+                               part_size=part_size, key=key)
+    sink.open(cp)
+
+    todo = [s for s in segments(size, part_size) if s[0] not in cp.completed()]
+    logging.info("%s : %d octets, %d/%d segments à télécharger%s", name, size, len(todo),
+                 len(segments(size, part_size)), " (reprise)" if resumed else "")
+
+    def work(seg):
+        n, start, end = seg
+        token = sink.write(n, start, fetch_segment(session, url, start, end, validator))
+        cp.done(n, token)
+        return n
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(work, s) for s in todo]
+        errors = []
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        if any(isinstance(e, RangesUnsupported) for e in errors):
+            # If-Range non satisfait : les segments reçus ne sont plus valides,
+            # garder le checkpoint ferait échouer toutes les reprises
+            logging.warning("%s : ressource modifiée pendant le transfert, redémarrage depuis zéro", name)
+            sink.abort(cp)
+            cp.remove()
+            if restart:
+                return download(url, sink, name, workers, part_size, session, checkpoint_dir, key, restart=False)
+            raise IOError(f"{name} : ressource modifiée pendant le transfert : {errors[0]}")
+        # le checkpoint garde les segments terminés pour le prochain run
+        raise IOError(f"{name} : {len(errors)} segment(s) en échec, reprise possible : {errors[0]}")
+
+    sink.complete(cp.completed())
+    cp.remove()
+    return "resumed" if resumed else "ranged"
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url")
+    parser.add_argument("--dest-file", required=True, help="fichier local de destination")
+    parser.add_argument("--name", default=None, help="nom du checkpoint (défaut : nom du fichier)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--part-mb", type=int, default=PART_SIZE >> 20)
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    name = args.name or os.path.basename(args.dest_file)
+    t0 = time.perf_counter()
+    mode = download(args.url, FileSink(args.dest_file), name, args.workers, args.part_mb << 20)
+    size = os.path.getsize(args.dest_file)
+    print(f"✅ {args.dest_file} : {size} octets en {time.perf_counter() - t0:.1f}s ({mode})")
+
+
+if __name__ == "__main__":
+    main()
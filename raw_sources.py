@@ -0,0 +1,75 @@
+"""
+raw_sources.py
+
+Accès partagé aux exports bruts déposés dans le bucket RAW par ingest_raw.py
+(ou à leurs copies locales) : noms des sources, séparateur CSV, ouverture en
+flux de la dernière version, empreinte pour invalider les caches, et
+résolution des colonnes quel que soit le libellé (labels ODRÉ / Enedis ou
+noms techniques).
+
+Utilisé par geo_join.py et residential_rollup.py.
+"""
+
+import os
+import logging
+import unicodedata
+
+from model_store import get_s3
+
+RAW_BUCKET = os.getenv("RAW_BUCKET", "raw")
+SILVER_BUCKET = os.getenv("SILVER_BUCKET", "silver")
+SEP = ";"
+
+SOURCE_NAMES = {
+    "addresses": "enedis_residentiel",
+    "poteaux": "poteaux_hta_bt",
+    "souterrain": "reseau_souterrain_hta",
+}
+
+
+# ----------------------------------------------------------------------
+# Colonnes
+# ----------------------------------------------------------------------
+def normalize_column(name):
+    """Libellé → nom technique (ASCII minuscule, séparateurs en « _ »)."""
+    s = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return "".join(c if c.isalnum() else "_" for c in s.lower()).strip("_")
+
+
+def pick_column(columns, *candidates):
+    """Première colonne dont le nom normalisé figure dans `candidates` (labels ou noms techniques)."""
+    by_norm = {normalize_column(c): c for c in columns}
+    for cand in candidates:
+        if normalize_column(cand) in by_norm:
+            return by_norm[normalize_column(cand)]
+    return None
+
+
+# ----------------------------------------------------------------------
+# Sources (bucket RAW ou fichiers locaux)
+# ----------------------------------------------------------------------
+def latest_raw_key(name, bucket=RAW_BUCKET):
+    """Dernière clé api/<name>/... (les noms contiennent un horodatage triable)."""
+    keys = []
+    for page in get_s3().get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"api/{name}/"):
+        keys += [o["Key"] for o in page.get("Contents", [])]
+    if not keys:
+        raise FileNotFoundError(f"Aucun fichier pour {name} dans s3://{bucket}/api/{name}/")
+    return max(keys)
+
+
+def open_source(path_or_name, bucket=RAW_BUCKET):
+    """Chemin local si le fichier existe, sinon dernière version du dataset dans le bucket RAW."""
+    if os.path.exists(path_or_name):
+        return open(path_or_name, "rb"), path_or_name
+    key = latest_raw_key(path_or_name, bucket)
+    logging.info("Lecture en streaming de s3://%s/%s", bucket, key)
+    return get_s3().get_object(Bucket=bucket, Key=key)["Body"], f"s3://{bucket}/{key}"
+
+
+def source_fingerprint(path_or_name, bucket=RAW_BUCKET):
+    """Empreinte d'une source : chemin + taille + mtime en local (fichier réécrit sur place), clé RAW sinon."""
+    if os.path.exists(path_or_name):
+        st = os.stat(path_or_name)
+        return f"{os.path.abspath(path_or_name)}@{st.st_size}-{st.st_mtime_ns}"
+    return f"s3://{bucket}/{latest_raw_key(path_or_name, bucket)}"
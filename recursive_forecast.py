@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+recursive_forecast.py
+
+Prévision multi-pas récursive pour les modèles qui utilisent des lags de la
+cible (t-1, t-7, moyenne glissante 7 jours).
+
+Au service, on ne recalcule pas les features sur tout l'historique : chaque
+zone garde un petit état (buffer circulaire des dernières valeurs + somme
+glissante). À chaque pas, les features de lag de toutes les zones sont lues
+en O(1), le modèle est appelé une seule fois pour toutes les zones, puis la
+prédiction est poussée dans l'état pour le pas suivant.
+
+La moyenne glissante porte sur les valeurs *passées* (t-1 ... t-7) : la
+version de clean_data.add_lag_features inclut le jour courant et ne peut
+donc pas être servie. `serving_lag_features` construit les mêmes features
+pour l'entraînement, garantissant la parité entraînement / service.
+
+Exemple :
+    python recursive_forecast.py --model models/hist_gbm_lags.joblib --days 7 --stub-weather
+"""
+
+import numpy as np
+import pandas as pd
+
+LAGS = (1, 7)
+ROLL = 7
+LAG_FEATURES = [f"y_t-{k}" for k in LAGS] + [f"y_roll{ROLL}"]
+
+
+def serving_lag_features(df, target, lags=LAGS, roll=ROLL):
+    """Ajoute les features de lag (noms génériques y_t-k / y_rollN) calculables au service."""
+    df = df.copy()
+    y = df[target]
+    for k in lags:
+        df[f"y_t-{k}"] = y.shift(k)
+    df[f"y_roll{roll}"] = y.shift(1).rolling(roll).mean()
+    return df
+
+
+class LagState:
+    """
+    État de lag de `n_zones` séries avancées ensemble : buffer circulaire
+    (n_zones, taille) + somme glissante par zone.
+    """
+
+    def __init__(self, zones, history, lags=LAGS, roll=ROLL):
+        """`history` : array (n_zones, n_obs) des dernières valeurs observées (chronologique)."""
+        self.zones = list(zones)
+        self.lags = tuple(lags)
+        self.roll = roll
+        self.size = max(max(self.lags), roll)
+        history = np.asarray(history, dtype=np.float64)
+        if history.shape != (len(self.zones), history.shape[1]) or history.shape[1] < self.size:
+            raise ValueError(f"history doit être de forme ({len(self.zones)}, >= {self.size}), reçu {history.shape}")
+
+        self.ring = history[:, -self.size:].copy()
+        self.pos = 0  # prochaine case écrite = plus ancienne valeur
+        self.roll_sum = self.ring[:, -roll:].sum(axis=1)
+
+    @classmethod
+    def from_frame(cls, df, lags=LAGS, roll=ROLL):
+        """`df` : index temporel, une colonne par zone."""
+        return cls(df.columns, df.to_numpy().T, lags, roll)
+
+    def copy(self):
+        new = object.__new__(LagState)
+        new.__dict__.update(self.__dict__)
+        new.ring = self.ring.copy()
+        new.roll_sum = self.roll_sum.copy()
+        return new
+
+    def features(self):
+        """Features de lag courantes, dict nom -> array (n_zones,)."""
+        feats = {f"y_t-{k}": self.ring[:, (self.pos - k) % self.size] for k in self.lags}
+        feats[f"y_roll{self.roll}"] = self.roll_sum / self.roll
+        return feats
+
+    def push(self, values):
+        """Ajoute une valeur par zone (observée ou prédite) en O(1)."""
+        values = np.asarray(values, dtype=np.float64)
+        evicted = self.ring[:, (self.pos - self.roll) % self.size]
+        self.roll_sum += values - evicted
+        self.ring[:, self.pos] = values
+        self.pos = (self.pos + 1) % self.size
+
+
+class RecursiveForecaster:
+    def __init__(self, model, state, exog_features):
+        self.model = model
+        self.state = state
+        self.exog_features = list(exog_features)
+        names = getattr(model, "feature_names_in_", None)
+        self.feature_order = list(names) if names is not None else self.exog_features + LAG_FEATURES
+
+    def observe(self, values):
+        """Nouvelle observation réelle (une valeur par zone, dans l'ordre de state.zones)."""
+        self.state.push(values)
+
+    def forecast(self, exog):
+        """
+        `exog` : une ligne par (zone, date) avec les features exogènes
+        (météo, calendrier) ; toutes les zones doivent avoir les mêmes dates.
+        L'état courant n'est pas modifié.
+        """
+        state = self.state.copy()
+        exog = exog.copy()
+        exog["_zone_order"] = exog["zone"].map({z: i for i, z in enumerate(state.zones)})
+        if exog["_zone_order"].isna().any():
+            raise ValueError("exog contient des zones absentes de l'état")
+        exog = exog.sort_values(["date", "_zone_order"])
+        dates = exog["date"].drop_duplicates().sort_values().to_list()
+        n_zones = len(state.zones)
+        if len(exog) != len(dates) * n_zones:
+            raise ValueError("exog doit contenir toutes les zones pour chaque date")
+
+        exog_values = exog[self.exog_features].to_numpy(dtype=np.float64).reshape(len(dates), n_zones, -1)
+        preds = np.empty((len(dates), n_zones))
+        for step in range(len(dates)):
+            X = pd.DataFrame(exog_values[step], columns=self.exog_features)
+            for name, values in state.features().items():
+                X[name] = values
+            preds[step] = self.model.predict(X[self.feature_order])
+            state.push(preds[step])
+
+        return pd.DataFrame({
+            "zone": np.tile(state.zones, len(dates)),
+            "date": np.repeat(pd.to_datetime(dates), n_zones),
+            "step": np.repeat(np.arange(1, len(dates) + 1), n_zones),
+            "prediction": preds.ravel(),
+        })
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    import joblib
+    from model_registry import DATA_PATH, TARGET, METEO_COLS, CALENDAR_COLS
+    from weather_client import WeatherClient, StubProvider
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/hist_gbm_lags.joblib")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--target", default=TARGET)
+    parser.add_argument("--zone", default="Paris")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--stub-weather", action="store_true")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    hist = pd.read_parquet(args.data).sort_index()[[args.target]].dropna()
+    state = LagState([args.zone], hist[args.target].to_numpy()[None, :])
+
+    client = WeatherClient(provider=StubProvider() if args.stub_weather else None)
+    exog = client.forecast_many([args.zone], args.days)
+    dates = pd.to_datetime(exog["date"])
+    exog["annee"], exog["mois"] = dates.dt.year, dates.dt.month
+    exog["jour"], exog["jour_semaine"] = dates.dt.day, dates.dt.weekday
+
+    out = RecursiveForecaster(model, state, METEO_COLS + CALENDAR_COLS).forecast(exog)
+    print(out.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+residential_rollup.py
+
+Agrégation hors mémoire de l'export « consommation-annuelle-residentielle-
+par-adresse » (plusieurs Go) déposé dans le bucket RAW par ingest_raw.py.
+
+Le fichier est lu en flux par blocs d'octets coupés sur une fin de ligne ;
+chaque bloc est parsé et pré-agrégé dans un processus worker (seules les
+colonnes utiles sont lues). Le processus principal fusionne les agrégats
+partiels au fil de l'eau, avec un nombre borné de blocs en vol : la mémoire
+ne dépend que de BLOCK_BYTES × workers et du nombre de groupes, pas de la
+taille du fichier.
+
+Rollups produits (année × commune, année × IRIS) :
+- somme et nombre d'adresses, somme des logements
+- percentiles de consommation par adresse via un sketch à buckets
+  logarithmiques (erreur relative <= ALPHA) : les sketches se fusionnent par
+  simple addition des compteurs, donc entre blocs, workers ou exports
+
+Sortie : Parquet compact (float32, zstd) dans OUT_DIR, poussé optionnellement
+dans le bucket SILVER sous rollups/ ; les sketches sont aussi écrits pour
+pouvoir être refusionnés sans relire l'export.
+
+Exemple :
+    python residential_rollup.py --workers 8
+    python residential_rollup.py --source conso_residentielle.csv --percentiles 0.5 0.9 0.99
+"""
+
+import io
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from raw_sources import SEP, SILVER_BUCKET, SOURCE_NAMES, open_source, pick_column
+from model_store import get_s3
+
+OUT_DIR = "rollups"
+SILVER_PREFIX = "rollups/"
+BLOCK_BYTES = 32 << 20
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+ZERO_BUCKET = np.iinfo(np.int16).min  # valeurs <= 0
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+MERGE_EVERY = 4  # agrégats partiels accumulés avant fusion
+
+LEVELS = {
+    "commune": ["annee", "code_commune"],
+    "iris": ["annee", "code_iris"],
+}
+# rôle -> libellés possibles dans l'export (labels ou noms techniques)
+COLUMNS = {
+    "annee": ("Année", "annee"),
+    "code_commune": ("Code Commune", "code_commune", "Code INSEE de la commune"),
+    "code_iris": ("Code IRIS", "code_iris"),
+    "conso_mwh": ("Consommation annuelle totale de l'adresse (MWh)", "consommation_annuelle_totale_de_l_adresse_mwh"),
+    "logements": ("Nombre de logements", "nombre_de_logements"),
+}
+
+
+# ----------------------------------------------------------------------
+# Sketch à buckets logarithmiques
+# ----------------------------------------------------------------------
+def sketch_bucket(values, gamma=GAMMA):
+    """Indice de bucket : ceil(log_gamma(x)) ; ZERO_BUCKET pour x <= 0."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), ZERO_BUCKET, dtype=np.int16)
+    pos = values > 0
+    out[pos] = np.ceil(np.log(values[pos]) / np.log(gamma)).astype(np.int16)
+    return out
+
+
+def bucket_value(bucket, gamma=GAMMA):
+    """Valeur représentative d'un bucket (erreur relative <= alpha)."""
+    bucket = np.asarray(bucket, dtype=np.float64)
+    return np.where(bucket == ZERO_BUCKET, 0.0, 2 * gamma ** bucket / (gamma + 1))
+
+
+def sketch_quantiles(sketch, keys, qs=PERCENTILES, gamma=GAMMA):
+    """
+    `sketch` : (keys..., bucket, n) ; renvoie une colonne p<q> par quantile,
+    calculée pour tous les groupes à la fois.
+    """
+    s = sketch.sort_values(keys + ["bucket"]).reset_index(drop=True)
+    g = s.groupby(keys, sort=False, observed=True)["n"]
+    cum = g.cumsum().to_numpy()
+    total = g.transform("sum").to_numpy()
+    out = s[keys].drop_duplicates().reset_index(drop=True)
+    for q in qs:
+        rank = q * (total - 1)
+        # premier bucket dont le cumul dépasse le rang
+        hit = s.loc[cum > rank].drop_duplicates(keys)
+        col = f"p{round(q * 100):g}_mwh"
+        out = out.merge(hit[keys + ["bucket"]].rename(columns={"bucket": col}), on=keys, how="left")
+        out[col] = bucket_value(out[col].to_numpy(), gamma).astype(np.float32)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Agrégation par bloc (worker)
+# ----------------------------------------------------------------------
+def _to_float(s):
+    return pd.to_numeric(s.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def aggregate_block(header, block, usecols, gamma=GAMMA):
+    """Parse un bloc de lignes CSV et renvoie {niveau: (stats, sketch)} partiels."""
+    df = pd.read_csv(io.BytesIO(header + block), sep=SEP, usecols=list(usecols.values()), dtype=str)
+    df = df.rename(columns={v: k for k, v in usecols.items()})
+    df["conso_mwh"] = _to_float(df["conso_mwh"])
+    df["logements"] = _to_float(df["logements"]) if "logements" in df else np.nan
+    df = df.dropna(subset=["conso_mwh"])
+    df["bucket"] = sketch_bucket(df["conso_mwh"].to_numpy(), gamma)
+
+    out = {}
+    for level, keys in LEVELS.items():
+        if not all(k in df for k in keys):
+            continue
+        g = df.groupby(keys, sort=False)
+        stats = g.agg(total_mwh=("conso_mwh", "sum"), n_adresses=("conso_mwh", "size"),
+                      n_logements=("logements", "sum")).reset_index()
+        sketch = df.groupby(keys + ["bucket"], sort=False).size().rename("n").reset_index()
+        out[level] = (stats, sketch)
+    return out
+
+
+def merge_partials(partials, keys):
+    """Fusion associative : sommes et compteurs de buckets s'additionnent."""
+    stats = pd.concat([p[0] for p in partials], ignore_index=True)
+    sketch = pd.concat([p[1] for p in partials], ignore_index=True)
+    stats = stats.groupby(keys, sort=False).sum().reset_index()
+    sketch = sketch.groupby(keys + ["bucket"], sort=False)["n"].sum().reset_index()
+    return stats, sketch
+
+
+# ----------------------------------------------------------------------
+# Lecture en flux
+# ----------------------------------------------------------------------
+def iter_blocks(body, block_bytes=BLOCK_BYTES):
+    """(en-tête, blocs de lignes complètes) depuis un flux binaire."""
+    header = body.readline()
+    if header.startswith(b"\xef\xbb\xbf"):
+        header = header[3:]
+    tail = b""
+    def blocks():
+        nonlocal tail
+        while True:
+            chunk = body.read(block_bytes)
+            if not chunk:
+                break
+            data = tail + chunk
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                tail = data
+                continue
+            tail = data[cut:]
+            yield data[:cut]
+        if tail.strip():
+            yield tail
+    return header, blocks()
+
+
+def resolve_columns(header):
+    names = [c.strip().strip('"') for c in header.decode("utf-8").rstrip("\r\n").split(SEP)]
+    usecols = {role: pick_column(names, *labels) for role, labels in COLUMNS.items()}
+    missing = [r for r in ("annee", "conso_mwh") if usecols[r] is None]
+    if missing:
+        raise ValueError(f"Colonnes introuvables dans l'export : {missing}")
+    return {role: col for role, col in usecols.items() if col is not None}
+
+
+def rollup(source=SOURCE_NAMES["addresses"], workers=None, block_bytes=BLOCK_BYTES,
+           qs=PERCENTILES, gamma=GAMMA):
+    """Agrège l'export en flux ; renvoie {niveau: (rollup, sketch)}."""
+    body, origin = open_source(source)
+    header, blocks = iter_blocks(body, block_bytes)
+    usecols = resolve_columns(header)
+    workers = workers or os.cpu_count()
+    logging.info("Agrégation de %s (%d workers, blocs de %d Mo)", origin, workers, block_bytes >> 20)
+
+    partials = {level: [] for level in LEVELS}
+    n_blocks = 0
+
+    def collect(done):
+        nonlocal n_blocks
+        for fut in done:
+            for level, part in fut.result().items():
+                partials[level].append(part)
+                if len(partials[level]) >= MERGE_EVERY:
+                    partials[level] = [merge_partials(partials[level], LEVELS[level])]
+            n_blocks += 1
+        logging.debug("%d blocs agrégés", n_blocks)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for block in blocks:
+            # au plus 2 blocs en vol par worker : mémoire bornée
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(aggregate_block, header, block, usecols, gamma))
+        collect(pending)
+    logging.info("%d blocs agrégés", n_blocks)
+
+    results = {}
+    for level, keys in LEVELS.items():
+        if not partials[level]:
+            continue
+        stats, sketch = merge_partials(partials[level], keys)
+        table = stats.merge(sketch_quantiles(sketch, keys, qs, gamma), on=keys)
+        table["moyenne_mwh"] = table["total_mwh"] / table["n_adresses"]
+        table["annee"] = pd.to_numeric(table["annee"], errors="coerce").astype("Int16")
+        for c in ("total_mwh", "n_logements", "moyenne_mwh"):
+            table[c] = table[c].astype(np.float32)
+        table["n_adresses"] = table["n_adresses"].astype(np.int32)
+        sketch["bucket"] = sketch["bucket"].astype(np.int16)
+        sketch["n"] = sketch["n"].astype(np.int32)
+        results[level] = (table.sort_values(keys).reset_index(drop=True), sketch.sort_values(keys + ["bucket"]))
+    return results
+
+
+def save_rollups(results, out_dir=OUT_DIR, push=False):
+    os.makedirs(out_dir, exist_ok=True)
+    for level, (table, sketch) in results.items():
+        for suffix, df in (("", table), ("_sketch", sketch)):
+            name = f"conso_residentielle_{level}{suffix}.parquet"
+            path = os.path.join(out_dir, name)
+            df.to_parquet(path, index=False, compression="zstd")
+            if push:
+                get_s3().upload_file(path, SILVER_BUCKET, SILVER_PREFIX + name)
+            logging.info("%s : %d lignes → %s", level, len(df), path)
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    import time
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=SOURCE_NAMES["addresses"], help="fichier local ou nom de source RAW")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--block-mb", type=int, default=BLOCK_BYTES >> 20)
+    parser.add_argument("--percentiles", type=float, nargs="+", default=list(PERCENTILES))
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--push", action="store_true", help="pousse les rollups dans le bucket SILVER")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    t0 = time.perf_counter()
+    results = rollup(args.source, args.workers, args.block_mb << 20, args.percentiles)
+    save_rollups(results, args.out, args.push)
+    print(f"✅ Rollups {', '.join(results)} écrits en {time.perf_counter() - t0:.1f}s → {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+stub_server.py
+
+Serveur HTTP local pour développer l'ingestion hors ligne : sert les
+fichiers d'un répertoire avec support des requêtes Range (206 +
+Content-Range, ETag, If-Range), et peut simuler les défaillances des
+serveurs réels :
+- --no-ranges   : ignore l'en-tête Range (200 + fichier complet)
+- --fail-rate   : proportion de réponses coupées au milieu du corps
+- --latency     : délai ajouté à chaque requête (secondes)
+
+Avec --enedis <répertoire>, sert aussi l'API Explore d'Enedis paginée
+(/api/explore/v2.1/catalog/datasets/<id>/records?limit&offset&refine.<champ>)
+à partir des fichiers <id>.jsonl produits par synthetic_data.py.
+
+Exemple :
+    python stub_server.py --dir data --port 8765 --fail-rate 0.2
+    python range_download.py http://localhost:8765/gros.csv --dest-file /tmp/gros.csv
+    python stub_server.py --dir data/synthetic --enedis data/synthetic/enedis
+"""
+
+import os
+import re
+import json
+import random
+import logging
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, unquote, parse_qs
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+RECORDS_RE = re.compile(r"^/api/explore/v2\.1/catalog/datasets/([\w-]+)/records/?$")
+CHUNK = 1 << 16
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    root = "."
+    ranges = True
+    fail_rate = 0.0
+    latency = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logging.debug("%s %s", self.address_string(), fmt % args)
+
+    def _file(self):
+        rel = unquote(urlparse(self.path).path).lstrip("/")
+        path = os.path.realpath(os.path.join(self.root, rel))
+        if not path.startswith(os.path.realpath(self.root)) or not os.path.isfile(path):
+            return None
+        return path
+
+    def _etag(self, st):
+        return f'"{st.st_size:x}-{int(st.st_mtime_ns):x}"'
+
+    def _send_error(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _byte_range(self, size, etag, last_modified=None):
+        """(début, fin incluse) demandés, None pour tout le fichier, False si non satisfiable."""
+        header = self.headers.get("Range")
+        if not self.ranges or not header:
+            return None
+        if_range = self.headers.get("If-Range")
+        # If-Range : ETag fort ou date Last-Modified exacte, sinon fichier complet
+        if if_range and (if_range.startswith("W/") or if_range not in (etag, last_modified)):
+            return None
+        m = RANGE_RE.match(header.strip())
+        if not m or m.groups() == ("", ""):
+            return None
+        first, last = m.groups()
+        if first == "":
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        return (start, end) if start <= end and start < size else False
+
+    def _serve(self, with_body):
+        if self.latency:
+            threading.Event().wait(self.latency)
+        path = self._file()
+        if path is None:
+            return self._send_error(404)
+        st = os.stat(path)
+        etag = self._etag(st)
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        rng = self._byte_range(st.st_size, etag, last_modified)
+        if rng is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{st.st_size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = rng if rng else (0, st.st_size - 1)
+        length = end - start + 1
+
+        self.send_response(206 if rng else 200)
+        if rng:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Content-Type", "text/csv" if path.endswith(".csv") else "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if not with_body:
+            return
+
+        # coupure simulée : on envoie une partie du corps puis on ferme
+        cut = length // 2 if length > 1 and random.random() < self.fail_rate else None
+        with open(path, "rb") as f:
+            f.seek(start)
+            sent = 0
+            while sent < length:
+                n = min(CHUNK, length - sent) if cut is None else min(CHUNK, cut - sent)
+                if n <= 0:
+                    self.close_connection = True
+                    return
+                try:
+                    self.wfile.write(f.read(n))
+                except (BrokenPipeError, ConnectionResetError):
+                    # client parti (ex. sondage bytes=0-0 sans support des Range)
+                    self.close_connection = True
+                    return
+                sent += n
+
+    def do_GET(self):
+        self._serve(True)
+
+    def do_HEAD(self):
+        self._serve(False)
+
+
+class EnedisHandler(StubHandler):
+    """Ajoute l'API Explore paginée d'Enedis ; les autres chemins sont servis comme fichiers."""
+    enedis_dir = None
+    max_limit = 10000
+    _records = {}  # chemin du .jsonl -> enregistrements (partagé entre serveurs)
+    _records_lock = threading.Lock()
+
+    def _dataset(self, dataset_id):
+        path = os.path.join(self.enedis_dir, f"{dataset_id}.jsonl")
+        with self._records_lock:
+            if path not in self._records:
+                if not os.path.isfile(path):
+                    return None
+                with open(path, encoding="utf-8") as f:
+                    self._records[path] = [json.loads(line) for line in f if line.strip()]
+            return self._records[path]
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        m = RECORDS_RE.match(url.path)
+        if not m or not self.enedis_dir:
+            return self._serve(True)
+        if self.latency:
+            threading.Event().wait(self.latency)
+        records = self._dataset(m.group(1))
+        if records is None:
+            return self._send_json(404, {"error_code": "DatasetNotFound"})
+
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            limit = int(query.get("limit", 10))
+            offset = int(query.get("offset", 0))
+        except ValueError:
+            return self._send_json(400, {"error_code": "InvalidRESTParameterError"})
+        if limit > self.max_limit or offset < 0:
+            return self._send_json(400, {"error_code": "InvalidRESTParameterError",
+                                         "message": f"limit <= {self.max_limit}"})
+        refine = {k[len("refine."):]: v for k, v in query.items() if k.startswith("refine.")}
+        if refine:
+            records = [r for r in records if all(str(r.get(f)) == v for f, v in refine.items())]
+        page = records[offset:offset + limit]
+        self._send_json(200, {"total_count": len(records), "results": [{"fields": r} for r in page]})
+
+
+def serve(root=".", host="127.0.0.1", port=8765, ranges=True, fail_rate=0.0, latency=0.0,
+          handler=StubHandler, **extra):
+    """
+    Démarre le serveur dans un thread ; renvoie (serveur, url de base).
+    `extra` : attributs supplémentaires du handler (ex. enedis_dir pour EnedisHandler).
+    """
+    attrs = {"root": root, "ranges": ranges, "fail_rate": fail_rate, "latency": latency, **extra}
+    server = ThreadingHTTPServer((host, port), type("ConfiguredStubHandler", (handler,), attrs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=".")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-ranges", action="store_true")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--enedis", default=None, help="répertoire des <id>.jsonl à servir en API paginée")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    extra = {"handler": EnedisHandler, "enedis_dir": args.enedis} if args.enedis else {}
+    server, url = serve(args.dir, args.host, args.port, not args.no_ranges, args.fail_rate, args.latency, **extra)
+    logging.info("Stub HTTP sur %s (racine %s, ranges=%s, fail_rate=%.2f)",
+                 url, os.path.abspath(args.dir), not args.no_ranges, args.fail_rate)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
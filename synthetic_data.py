@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py
+
+Générateur de données synthétiques réalistes, aux mêmes formats que les
+sources réelles, pour développer et mesurer le pipeline sans fichiers dans
+data/ ni accès aux API. Échelle réglable : années × régions × stations ×
+pas de temps.
+
+Fichiers produits (dans --out) :
+- consommation-quotidienne-brute-regionale.csv : export ODRÉ régional (;)
+- consommation-idf.csv                         : filtre Île-de-France
+                                                 (sortie de traitement_donnees_conso.py)
+- meteo75.parquet                              : schéma Météo-France brut (RR, TN, TX, ...)
+- meteo75.csv                                  : colonnes renommées
+                                                 (sortie de traitement_donnees_meteo.py)
+- eco2mix-national-tr.csv                      : export eco2mix 15 min (;)
+- enedis/<dataset-id>.jsonl                    : enregistrements Enedis, servis
+                                                 paginés par stub_server.py --enedis
+
+Les séries partagent une même température journalière : la consommation
+dépend du froid, du jour de la semaine et de l'heure, ce qui donne aux
+modèles un signal comparable à celui des vraies données.
+
+Exemple :
+    python synthetic_data.py --out data/synthetic --years 3 --regions 12 --stations 20 --freq 15min
+    python stub_server.py --dir data/synthetic --enedis data/synthetic/enedis --port 8765
+"""
+
+import os
+import json
+import zlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+START = "2019-01-01"
+TZ = "Europe/Paris"
+
+REGIONS = [
+    ("11", "Île-de-France", 1.00), ("84", "Auvergne-Rhône-Alpes", 0.95), ("75", "Nouvelle-Aquitaine", 0.70),
+    ("76", "Occitanie", 0.70), ("32", "Hauts-de-France", 0.75), ("44", "Grand Est", 0.70),
+    ("93", "Provence-Alpes-Côte d'Azur", 0.60), ("52", "Pays de la Loire", 0.50), ("53", "Bretagne", 0.45),
+    ("28", "Normandie", 0.45), ("24", "Centre-Val de Loire", 0.35), ("27", "Bourgogne-Franche-Comté", 0.35),
+    ("94", "Corse", 0.05),
+]
+CONSO_COLS = {
+    "natran": "Consommation brute gaz (MW PCS 0°C) - NaTran",
+    "terega": "Consommation brute gaz (MW PCS 0°C) - Teréga",
+    "gaz": "Consommation brute gaz totale (MW PCS 0°C)",
+    "elec": "Consommation brute électricité (MW) - RTE",
+    "total": "Consommation brute totale (MW)",
+}
+# colonnes Météo-France brutes -> noms de traitement_donnees_meteo.py
+METEO_RENAME = {
+    "NUM_POSTE": "Station_Num", "NOM_USUEL": "Station_Nom", "LAT": "Latitude", "LON": "Longitude",
+    "ALTI": "Altitude", "AAAAMMJJ": "Date", "RR": "Pluie_mm", "QRR": "Qualite_Pluie",
+    "TN": "Tn_Min", "QTN": "Qualite_Tn_Min", "TX": "Tx_Max", "QTX": "Qualite_Tx_Max",
+    "TM": "T_Moyenne", "QTM": "Qualite_T_Moyenne", "FFM": "Vent_Moyen", "QFFM": "Qualite_Vent_Moyen",
+    "FXY": "Vent_Max", "QFXY": "Qualite_Vent_Max", "DXY": "Direction_Vent_Max",
+}
+# nom court (api_enedis.DATASETS) -> identifiant du dataset dans l'URL de l'API
+ENEDIS_DATASETS = {
+    "consommation_commune": "consommation-electrique-par-secteur-dactivite-commune",
+    "bilan_electrique": "bilan-electrique",
+    "conso_residentielle": "consommation-annuelle-residentielle-par-adresse",
+}
+ENEDIS_YEARS = ("2021", "2022", "2023")
+COMMUNES = ["Paris", "Boulogne-Billancourt", "Saint-Denis", "Versailles", "Créteil", "Nanterre", "Montreuil"]
+
+
+# ----------------------------------------------------------------------
+# Signal commun
+# ----------------------------------------------------------------------
+def daily_temperature(days, rng):
+    """Température moyenne journalière : saison + anomalies persistantes (AR(1))."""
+    doy = days.dayofyear.to_numpy()
+    seasonal = 12.5 - 8.0 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+    noise = np.empty(len(days))
+    noise[0] = 0.0
+    eps = rng.normal(0, 1.6, len(days))
+    for i in range(1, len(days)):
+        noise[i] = 0.8 * noise[i - 1] + eps[i]
+    return seasonal + noise
+
+
+def _days(years, start=START):
+    return pd.date_range(start, periods=int(round(365.25 * years)), freq="D")
+
+
+# ----------------------------------------------------------------------
+# Consommation régionale (ODRÉ)
+# ----------------------------------------------------------------------
+def make_regional_consumption(years=3, regions=1, freq="30min", start=START, seed=0):
+    """Export « consommation-quotidienne-brute-regionale » : une ligne par région × pas."""
+    rng = np.random.default_rng(seed)
+    days = _days(years, start)
+    temp = pd.Series(daily_temperature(days, rng), index=days)
+    idx = pd.date_range(days[0], days[-1] + pd.Timedelta(days=1), freq=freq, inclusive="left", tz=TZ)
+    local = idx.tz_localize(None)
+    t = temp.reindex(local.normalize()).to_numpy()
+    hour = local.hour.to_numpy() + local.minute.to_numpy() / 60
+    weekend = local.dayofweek.to_numpy() >= 5
+
+    # profil journalier (creux nocturne, pointes matin / soir), effet du froid, week-end
+    profile = 1 + 0.12 * np.sin(2 * np.pi * (hour - 7) / 24) + 0.06 * np.exp(-((hour - 19) ** 2) / 4)
+    heating = np.clip(15.5 - t, 0, None)
+
+    frames = []
+    for code, name, scale in REGIONS[:regions]:
+        n = len(idx)
+        elec = scale * (6500 + 260 * heating) * profile * np.where(weekend, 0.9, 1.0)
+        elec *= 1 + rng.normal(0, 0.02, n)
+        gaz = scale * (2500 + 420 * heating) * (1 + rng.normal(0, 0.04, n))
+        natran = gaz * 0.93
+        df = pd.DataFrame({
+            "Code INSEE région": code,
+            "Région": name,
+            "Date": local.strftime("%Y-%m-%d"),
+            "Heure": local.strftime("%H:%M"),
+            "Date - Heure": idx.strftime("%Y-%m-%dT%H:%M:%S%z").str.replace(r"(\d\d)(\d\d)$", r"\1:\2", regex=True),
+            CONSO_COLS["natran"]: natran.round(0),
+            "Statut - NaTran": "Définitif",
+            CONSO_COLS["terega"]: (gaz - natran).round(0),
+            "Statut - Teréga": "Définitif",
+            CONSO_COLS["gaz"]: gaz.round(0),
+            CONSO_COLS["elec"]: elec.round(0),
+            "Statut - RTE": "Définitif",
+            CONSO_COLS["total"]: (gaz + elec).round(0),
+        })
+        # le gaz n'est publié qu'à l'heure : NaN sur les demi-heures, comme l'export réel
+        off_hour = local.minute.to_numpy() != 0
+        df.loc[off_hour, [CONSO_COLS["natran"], CONSO_COLS["terega"], CONSO_COLS["gaz"], CONSO_COLS["total"]]] = np.nan
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+# ----------------------------------------------------------------------
+# Météo (Météo-France, département 75)
+# ----------------------------------------------------------------------
+def make_meteo(years=3, stations=5, start=START, seed=0):
+    """Schéma brut de meteo75.parquet : une ligne par station × jour."""
+    rng = np.random.default_rng(seed)
+    days = _days(years, start)
+    temp = daily_temperature(days, rng)
+    frames = []
+    for s in range(stations):
+        n = len(days)
+        tm = temp + rng.normal(0, 0.4, n) + rng.normal(0, 0.5)
+        amp = np.clip(rng.normal(8, 2.5, n), 2, None)
+        rain = np.where(rng.random(n) < 0.45, rng.gamma(1.2, 3.5, n), 0.0)
+        ffm = np.clip(rng.gamma(3, 1.2, n), 0.3, None)
+        df = pd.DataFrame({
+            "NUM_POSTE": f"75{114001 + s:06d}",
+            "NOM_USUEL": f"STATION-{s + 1:02d}",
+            "LAT": 48.82 + 0.01 * s, "LON": 2.25 + 0.012 * s, "ALTI": 35 + 5 * s,
+            "AAAAMMJJ": days.strftime("%Y%m%d"),
+            "RR": rain.round(1), "QRR": 1,
+            "TN": (tm - amp / 2).round(1), "QTN": 1,
+            "TX": (tm + amp / 2).round(1), "QTX": 1,
+            "TM": tm.round(1), "QTM": 1,
+            "FFM": ffm.round(1), "QFFM": 1,
+            "FXY": (ffm * rng.uniform(1.6, 2.6, n)).round(1), "QFXY": 1,
+            "DXY": rng.integers(0, 36, n) * 10,
+        })
+        # quelques valeurs manquantes, comme dans les relevés réels
+        for col in ("RR", "FFM", "FXY"):
+            df.loc[rng.random(n) < 0.01, col] = np.nan
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def meteo_to_clean_csv(meteo):
+    """Équivalent de traitement_donnees_meteo.py (filtre > 2018 + renommage)."""
+    df = meteo.copy()
+    df["AAAAMMJJ"] = pd.to_datetime(df["AAAAMMJJ"], errors="coerce")
+    df = df[df["AAAAMMJJ"].dt.year > 2018]
+    return df.rename(columns=METEO_RENAME)
+
+
+# ----------------------------------------------------------------------
+# eco2mix (RTE, 15 min)
+# ----------------------------------------------------------------------
+def make_eco2mix(years=1, freq="15min", start=START, seed=0):
+    """Export eco2mix-national-tr (labels ODRÉ)."""
+    rng = np.random.default_rng(seed + 1)
+    days = _days(years, start)
+    temp = pd.Series(daily_temperature(days, rng), index=days)
+    idx = pd.date_range(days[0], days[-1] + pd.Timedelta(days=1), freq=freq, inclusive="left", tz=TZ)
+    local = idx.tz_localize(None)
+    n = len(idx)
+    hour = local.hour.to_numpy() + local.minute.to_numpy() / 60
+    heating = np.clip(15.5 - temp.reindex(local.normalize()).to_numpy(), 0, None)
+    conso = (45000 + 2200 * heating) * (1 + 0.1 * np.sin(2 * np.pi * (hour - 7) / 24))
+    conso *= np.where(local.dayofweek.to_numpy() >= 5, 0.9, 1.0) * (1 + rng.normal(0, 0.01, n))
+    solaire = np.clip(np.sin(np.pi * (hour - 6) / 14), 0, None) * rng.uniform(2000, 9000, n)
+    eolien = np.clip(rng.normal(6000, 2500, n), 300, None)
+    nucleaire = np.clip(conso * 0.68 + rng.normal(0, 800, n), 20000, 61000)
+    hydro = np.clip(conso - nucleaire - solaire - eolien, 1500, 12000)
+    gaz = np.clip(conso - nucleaire - solaire - eolien - hydro + 3000, 500, None)
+    return pd.DataFrame({
+        "Périmètre": "France",
+        "Nature": "Données temps réel",
+        "Date": local.strftime("%Y-%m-%d"),
+        "Heure": local.strftime("%H:%M"),
+        "Date - Heure": idx.strftime("%Y-%m-%dT%H:%M:%S%z").str.replace(r"(\d\d)(\d\d)$", r"\1:\2", regex=True),
+        "Consommation (MW)": conso.round(0),
+        "Prévision J-1 (MW)": (conso * (1 + rng.normal(0, 0.02, n))).round(0),
+        "Prévision J (MW)": (conso * (1 + rng.normal(0, 0.01, n))).round(0),
+        "Fioul (MW)": rng.integers(50, 200, n),
+        "Charbon (MW)": rng.integers(0, 50, n),
+        "Gaz (MW)": gaz.round(0),
+        "Nucléaire (MW)": nucleaire.round(0),
+        "Eolien (MW)": eolien.round(0),
+        "Solaire (MW)": solaire.round(0),
+        "Hydraulique (MW)": hydro.round(0),
+        "Pompage (MW)": -rng.integers(0, 1500, n),
+        "Bioénergies (MW)": rng.integers(800, 1200, n),
+        "Ech. physiques (MW)": (nucleaire + hydro + gaz + solaire + eolien - conso).round(0),
+        "Taux de Co2 (g/kWh)": rng.integers(15, 60, n),
+    })
+
+
+# ----------------------------------------------------------------------
+# Enedis (enregistrements paginés)
+# ----------------------------------------------------------------------
+def make_enedis_records(dataset, rows=10000, seed=0):
+    """Champs `fields` des enregistrements Enedis, répartis sur ENEDIS_YEARS et COMMUNES."""
+    rng = np.random.default_rng([seed, zlib.crc32(dataset.encode())])
+    annee = rng.choice(ENEDIS_YEARS, rows)
+    commune = rng.choice(COMMUNES, rows, p=[0.55] + [0.45 / (len(COMMUNES) - 1)] * (len(COMMUNES) - 1))
+    code = {c: f"{75056 if c == 'Paris' else 92000 + i}" for i, c in enumerate(COMMUNES)}
+    df = pd.DataFrame({"annee": annee, "nom_commune": commune, "code_commune": [code[c] for c in commune]})
+    if dataset == "conso_residentielle":
+        lat, lon = rng.uniform(48.81, 48.90, rows), rng.uniform(2.25, 2.42, rows)
+        df["adresse"] = [f"{rng.integers(1, 200)} RUE {i % 500}" for i in range(rows)]
+        df["code_iris"] = [f"{code[c]}{rng.integers(1, 999):04d}" for c in commune]
+        df["nombre_de_logements"] = rng.integers(1, 80, rows)
+        df["consommation_annuelle_totale_de_l_adresse_mwh"] = (df["nombre_de_logements"] * rng.lognormal(1.5, 0.4, rows)).round(3)
+        df["geo_point_2d"] = [{"lat": float(a), "lon": float(b)} for a, b in zip(lat, lon)]
+    elif dataset == "consommation_commune":
+        df["code_grand_secteur"] = rng.choice(["RESIDENTIEL", "PROFESSIONNEL", "TERTIAIRE", "INDUSTRIE"], rows)
+        df["nb_sites"] = rng.integers(10, 50000, rows)
+        df["conso_totale_mwh"] = (df["nb_sites"] * rng.lognormal(1.8, 0.5, rows)).round(1)
+    else:
+        df["date"] = pd.to_datetime(df["annee"] + "-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+        df["profil"] = rng.choice(["RES1", "RES2", "PRO1", "ENT1"], rows)
+        df["energie_soutiree_wh"] = rng.integers(1_000_000, 90_000_000, rows)
+    return df
+
+
+def write_jsonl(df, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in df.to_dict(orient="records"):
+            f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+
+# ----------------------------------------------------------------------
+# Génération complète
+# ----------------------------------------------------------------------
+def generate(out_dir, years=3, regions=1, stations=5, freq="30min", eco2mix_years=1,
+             enedis_rows=10000, seed=0):
+    """Écrit tous les fichiers dans `out_dir` ; renvoie {nom: (chemin, lignes)}."""
+    os.makedirs(out_dir, exist_ok=True)
+    out = {}
+
+    regional = make_regional_consumption(years, regions, freq, seed=seed)
+    path = os.path.join(out_dir, "consommation-quotidienne-brute-regionale.csv")
+    regional.to_csv(path, sep=";", index=False)
+    out["regional"] = (path, len(regional))
+    idf = regional[regional["Région"] == "Île-de-France"]
+    path = os.path.join(out_dir, "consommation-idf.csv")
+    idf.to_csv(path, sep=";", index=False, encoding="utf-8")
+    out["consommation_idf"] = (path, len(idf))
+
+    meteo = make_meteo(years, stations, seed=seed)
+    path = os.path.join(out_dir, "meteo75.parquet")
+    meteo.to_parquet(path, index=False)
+    out["meteo_parquet"] = (path, len(meteo))
+    path = os.path.join(out_dir, "meteo75.csv")
+    meteo_to_clean_csv(meteo).to_csv(path, index=False)
+    out["meteo_csv"] = (path, len(meteo))
+
+    eco = make_eco2mix(eco2mix_years, seed=seed)
+    path = os.path.join(out_dir, "eco2mix-national-tr.csv")
+    eco.to_csv(path, sep=";", index=False)
+    out["eco2mix"] = (path, len(eco))
+
+    for ds, slug in ENEDIS_DATASETS.items():
+        path = os.path.join(out_dir, "enedis", f"{slug}.jsonl")
+        write_jsonl(make_enedis_records(ds, enedis_rows, seed), path)
+        out[f"enedis_{ds}"] = (path, enedis_rows)
+
+    for name, (path, n) in out.items():
+        logging.info("%-28s %9d lignes → %s", name, n, path)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="data/synthetic")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--regions", type=int, default=1, help=f"1 à {len(REGIONS)}")
+    parser.add_argument("--stations", type=int, default=5)
+    parser.add_argument("--freq", default="30min", help="pas de la consommation régionale (15min, 30min...)")
+    parser.add_argument("--eco2mix-years", type=float, default=1)
+    parser.add_argument("--enedis-rows", type=int, default=10000, help="lignes par dataset Enedis")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    generate(args.out, args.years, args.regions, args.stations, args.freq, args.eco2mix_years,
+             args.enedis_rows, args.seed)
+    print(f"✅ Données synthétiques écrites dans {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Longueur de câble dans un rayon (geo_join.densify / AssetIndex.within)."""
+
+import numpy as np
+import pandas as pd
+
+import geo_join
+
+
+def line_index(xy, line_id, step=25.0):
+    pts, asset, weight = geo_join.densify(xy, line_id, step)
+    return geo_join.AssetIndex(pd.DataFrame({"kind": "souterrain_hta", "x": pts[:, 0], "y": pts[:, 1],
+                                             "asset": asset, "weight": weight, "commune": "75056"}), step=step)
+
+
+def test_dense_vertices_do_not_inflate_length():
+    # ligne droite de 100 m, un sommet tous les 2 m
+    xy = np.column_stack([np.arange(0, 101, 2.0), np.zeros(51)])
+    index = line_index(xy, np.zeros(51, dtype=np.int64))
+
+    length = index.within(np.array([[50.0, 0.0]]), radius=1000)["souterrain_hta"]
+
+    assert np.allclose(length, 100.0)
+
+
+def test_lines_are_resampled_separately():
+    xy = np.array([[0, 0], [100, 0], [0, 50], [30, 50], [30, 90]], dtype=np.float64)
+    pts, asset, weight = geo_join.densify(xy, np.array([0, 0, 1, 1, 1]), step=25.0)
+
+    assert np.allclose([weight[asset == 0].sum(), weight[asset == 1].sum()], [100.0, 70.0])
+    assert np.allclose(pts[asset == 1][[0, -1]], [[0, 50], [30, 90]])
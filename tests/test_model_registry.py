@@ -0,0 +1,20 @@
+"""Pas de fuite de statistiques de la période de test via l'imputation météo."""
+
+import numpy as np
+import pandas as pd
+
+from model_registry import METEO_COLS, build_features, make_model, model_features
+
+
+def test_meteo_imputed_from_training_slice_only():
+    idx = pd.date_range("2020-01-01", periods=20, freq="D")
+    df = pd.DataFrame({c: 1.0 for c in METEO_COLS}, index=idx)
+    df.iloc[10:, :] = 100.0          # période de test : valeurs très différentes
+    df.iloc[5, 0] = np.nan           # trou dans la période d'entraînement
+
+    feats = build_features(df)
+    assert np.isnan(feats[METEO_COLS[0]].iloc[5])
+
+    X = feats[model_features("linear")]
+    model = make_model("linear").fit(X.iloc[:10], np.arange(10.0))
+    assert model[0].statistics_[0] == 1.0
@@ -0,0 +1,22 @@
+"""Compatibilité features entre le manifeste publié et l'appelant (model_store.check_features)."""
+
+import pytest
+
+from model_store import check_features
+
+MANIFEST = {"name": "rf_baseline", "version": "0" * 64, "params": {"features": ["hour", "dow", "is_weekend"]}}
+
+
+def test_matching_features_accepted():
+    check_features(MANIFEST, ["hour", "dow", "is_weekend"])
+
+
+def test_daily_model_refused_for_intraday():
+    daily = {**MANIFEST, "params": {"features": ["Pluie_mm", "T_Moyenne", "annee", "mois"]}}
+    with pytest.raises(ValueError, match="entraîné sur"):
+        check_features(daily, ["hour", "dow", "is_weekend"])
+
+
+def test_manifest_without_features_refused():
+    with pytest.raises(ValueError, match="absentes"):
+        check_features({**MANIFEST, "params": {}}, ["hour", "dow", "is_weekend"])
@@ -0,0 +1,138 @@
+"""
+Tests de range_download.py contre le serveur local stub_server.py
+(port libre, fichiers dans un répertoire temporaire, destination FileSink).
+"""
+
+import os
+import random
+import hashlib
+
+import pytest
+
+import range_download
+import stub_server
+from range_download import FileSink, download
+
+PART_SIZE = 64 << 10
+
+
+@pytest.fixture
+def root(tmp_path):
+    d = tmp_path / "www"
+    d.mkdir()
+    return d
+
+
+@pytest.fixture
+def server(root):
+    servers = []
+
+    def start(**kwargs):
+        srv, url = stub_server.serve(str(root), port=0, **kwargs)
+        servers.append(srv)
+        return srv, url
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def write_source(root, name, size):
+    data = os.urandom(size)
+    (root / name).write_bytes(data)
+    return data
+
+
+def assert_same(path, data):
+    got = open(path, "rb").read()
+    assert len(got) == len(data)
+    assert hashlib.sha256(got).hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_parallel_ranged_download(root, server, tmp_path):
+    data = write_source(root, "gros.csv", 20 * PART_SIZE + 123)
+    _, url = server()
+    dest = tmp_path / "out" / "gros.csv"
+    cps = tmp_path / "cp"
+
+    mode = download(f"{url}/gros.csv", FileSink(str(dest)), "gros", workers=4,
+                    part_size=PART_SIZE, checkpoint_dir=str(cps))
+
+    assert mode == "ranged"
+    assert_same(dest, data)
+    assert not os.listdir(cps)
+
+
+def test_resume_after_injected_failures(root, server, tmp_path, monkeypatch):
+    data = write_source(root, "gros.csv", 20 * PART_SIZE + 7)
+    _, url = server(fail_rate=0.5)
+    monkeypatch.setattr(range_download, "SEGMENT_RETRIES", 1)
+    random.seed(1)
+    dest = tmp_path / "gros.csv"
+    cps = tmp_path / "cp"
+
+    failures, mode = 0, None
+    for _ in range(50):
+        try:
+            mode = download(f"{url}/gros.csv", FileSink(str(dest)), "gros", workers=4,
+                            part_size=PART_SIZE, checkpoint_dir=str(cps))
+            break
+        except IOError:
+            failures += 1
+            assert os.path.exists(cps / "gros.json")
+
+    assert failures > 0
+    assert mode == "resumed"
+    assert_same(dest, data)
+    assert not os.path.exists(cps / "gros.json")
+
+
+def test_single_stream_without_ranges(root, server, tmp_path):
+    data = write_source(root, "gros.csv", 5 * PART_SIZE + 1)
+    _, url = server(ranges=False)
+    dest = tmp_path / "gros.csv"
+
+    mode = download(f"{url}/gros.csv", FileSink(str(dest)), "gros", part_size=PART_SIZE,
+                    checkpoint_dir=str(tmp_path / "cp"))
+
+    assert mode == "stream"
+    assert_same(dest, data)
+
+
+def test_restart_when_etag_changes(root, server, tmp_path):
+    write_source(root, "gros.csv", 10 * PART_SIZE)
+    new = b"nouvelle version\n" * (PART_SIZE // 4)
+    _, url = server()
+    dest = tmp_path / "gros.csv"
+    cps = tmp_path / "cp"
+
+    class ChangingSource(FileSink):
+        """Remplace la source (taille différente → nouvel ETag) après le premier segment."""
+        changed = False
+
+        def write(self, part_number, offset, data):
+            token = super().write(part_number, offset, data)
+            if not self.changed:
+                type(self).changed = True
+                (root / "gros.csv").write_bytes(new)
+            return token
+
+    mode = download(f"{url}/gros.csv", ChangingSource(str(dest)), "gros", workers=1,
+                    part_size=PART_SIZE, checkpoint_dir=str(cps))
+
+    assert ChangingSource.changed
+    assert mode == "ranged"
+    assert_same(dest, new)
+    assert not os.listdir(cps)
+
+
+def test_empty_object(root, server, tmp_path):
+    (root / "vide.csv").write_bytes(b"")
+    _, url = server()
+    dest = tmp_path / "vide.csv"
+
+    mode = download(f"{url}/vide.csv", FileSink(str(dest)), "vide", checkpoint_dir=str(tmp_path / "cp"))
+
+    assert mode == "ranged"
+    assert_same(dest, b"")
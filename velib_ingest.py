@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+velib_ingest.py
+
+Ingestion haute fréquence de la disponibilité Vélib' temps réel
+(opendata.paris.fr, velib-disponibilite-en-temps-reel).
+
+Au lieu de stocker ~1 500 stations à chaque poll, on n'écrit que les
+stations dont les compteurs ont changé depuis le poll précédent (deltas
+colonnaires en Parquet), plus un keyframe complet périodique. Le volume
+stocké suit donc l'activité réelle, pas fréquence de poll × nb de stations.
+Les stations disparues du flux sont écrites dans les deltas avec
+`deleted=True` ; les stations apparues y portent aussi leurs colonnes
+statiques (nom, capacité, position).
+
+Organisation (OUT_DIR, poussée optionnellement dans le bucket RAW) :
+    velib/keyframes/date=YYYY-MM-DD/keyframe_<ts>.parquet
+    velib/deltas/date=YYYY-MM-DD/deltas_<ts_début>_<ts_fin>.parquet
+
+`rebuild_state(at)` reconstruit l'état de toutes les stations à un instant
+donné : dernier keyframe <= at, puis deltas (élagués par nom de fichier).
+
+Exemple :
+    python velib_ingest.py --interval 60 --keyframe-every 60
+    python velib_ingest.py --rebuild "2025-10-18 08:30"
+"""
+
+import os
+import glob
+import time
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from http_session import make_session
+
+API_URL = ("https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/"
+           "velib-disponibilite-en-temps-reel/exports/json")
+KEY = "stationcode"
+COUNT_COLS = ["numbikesavailable", "mechanical", "ebike", "numdocksavailable"]
+FLAG_COLS = ["is_renting", "is_returning"]
+STATIC_COLS = ["name", "capacity", "nom_arrondissement_communes", "lat", "lon"]
+TRACKED = COUNT_COLS + FLAG_COLS
+
+OUT_DIR = "data/velib"
+POLL_INTERVAL = 60        # secondes
+KEYFRAME_EVERY = 60       # polls (1 h à 1 poll / min)
+FLUSH_EVERY = 10          # polls entre deux fichiers de deltas
+TIMEOUT = (3.05, 30)
+TS_FMT = "%Y%m%dT%H%M%SZ"
+
+
+# ----------------------------------------------------------------------
+# Récupération
+# ----------------------------------------------------------------------
+def fetch_snapshot(session):
+    """Un snapshot complet (une ligne par station) en une seule requête."""
+    fields = [KEY] + TRACKED + [c for c in STATIC_COLS if c not in ("lat", "lon")] + ["coordonnees_geo"]
+    r = session.get(API_URL, params={"select": ",".join(fields)}, timeout=TIMEOUT)
+    r.raise_for_status()
+    df = pd.DataFrame(r.json())
+    geo = df.pop("coordonnees_geo") if "coordonnees_geo" in df else pd.Series([None] * len(df))
+    df["lat"] = [g.get("lat") if isinstance(g, dict) else None for g in geo]
+    df["lon"] = [g.get("lon") if isinstance(g, dict) else None for g in geo]
+    df[KEY] = df[KEY].astype(str)
+    for c in COUNT_COLS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(-1).astype("int16")
+    for c in FLAG_COLS:
+        df[c] = df[c].astype(str).str.upper().isin(["OUI", "TRUE", "1"])
+    return df.drop_duplicates(KEY).set_index(KEY).sort_index()
+
+
+def changed_rows(prev, snap):
+    """
+    Stations nouvelles ou dont au moins un compteur / flag a changé
+    (deleted=False), et stations disparues depuis `prev` (deleted=True, derniers
+    compteurs connus). Les colonnes statiques (nom, capacité, position) ne sont
+    renseignées que pour les stations nouvelles, nulles sinon.
+    """
+    if prev is None:
+        return snap[TRACKED + STATIC_COLS].assign(deleted=False)
+    aligned = prev[TRACKED].reindex(snap.index)
+    diff = (aligned != snap[TRACKED]).any(axis=1) | aligned.isna().any(axis=1)
+    new = snap.index.difference(prev.index)
+    removed = prev.index.difference(snap.index)
+    changed = snap.loc[diff, TRACKED].join(snap.loc[new, STATIC_COLS])
+    return pd.concat([changed.assign(deleted=False),
+                      prev.loc[removed, TRACKED].assign(deleted=True)])
+
+
+# ----------------------------------------------------------------------
+# Ingesteur
+# ----------------------------------------------------------------------
+class VelibIngester:
+    def __init__(self, out_dir=OUT_DIR, keyframe_every=KEYFRAME_EVERY, flush_every=FLUSH_EVERY,
+                 session=None, push=False):
+        self.out_dir = out_dir
+        self.keyframe_every = keyframe_every
+        self.flush_every = flush_every
+        self.session = session or make_session(pool_size=1)
+        self.push = push
+        self.state = None
+        self.polls = 0
+        self.pending = []  # deltas en attente d'écriture
+
+    def _write(self, df, kind, name, ts):
+        rel = os.path.join("velib", kind, ts.strftime("date=%Y-%m-%d"), name)
+        path = os.path.join(self.out_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, index=False, compression="zstd")
+        if self.push:
+            from S3_creation import s3, RAW_BUCKET
+            s3.upload_file(path, RAW_BUCKET, rel)
+        return path
+
+    def _keyframe(self, snap, ts):
+        kf = snap.reset_index().assign(ts=ts)
+        self._write(kf, "keyframes", f"keyframe_{ts.strftime(TS_FMT)}.parquet", ts)
+        logging.info("Keyframe %s : %d stations", ts, len(kf))
+
+    def flush(self):
+        if not self.pending:
+            return None
+        deltas = pd.concat(self.pending, ignore_index=True)
+        start, end = deltas["ts"].min(), deltas["ts"].max()
+        name = f"deltas_{start.strftime(TS_FMT)}_{end.strftime(TS_FMT)}.parquet"
+        path = self._write(deltas, "deltas", name, start)
+        logging.info("%d changements écrits (%s → %s)", len(deltas), start, end)
+        self.pending = []
+        return path
+
+    def poll_once(self, ts=None):
+        """Un poll : keyframe périodique, sinon deltas ; renvoie le nb de stations changées."""
+        snap = fetch_snapshot(self.session)
+        ts = ts or pd.Timestamp(datetime.utcnow()).floor("s")
+
+        if self.state is None or self.polls % self.keyframe_every == 0:
+            # les deltas en attente sont antérieurs au keyframe
+            self.flush()
+            self._keyframe(snap, ts)
+            n_changed = len(snap)
+        else:
+            delta = changed_rows(self.state, snap)
+            if len(delta):
+                self.pending.append(delta.reset_index().assign(ts=ts))
+            n_changed = len(delta)
+            if self.polls % self.flush_every == 0:
+                self.flush()
+
+        self.state = snap
+        self.polls += 1
+        return n_changed
+
+    def run(self, interval=POLL_INTERVAL, max_polls=None):
+        try:
+            while max_polls is None or self.polls < max_polls:
+                t0 = time.monotonic()
+                try:
+                    n = self.poll_once()
+                    logging.debug("Poll %d : %d stations modifiées", self.polls, n)
+                except Exception as e:
+                    logging.error("Échec poll Vélib' : %s", e)
+                time.sleep(max(0.0, interval - (time.monotonic() - t0)))
+        finally:
+            self.flush()
+
+
+# ----------------------------------------------------------------------
+# Reconstruction
+# ----------------------------------------------------------------------
+def _file_ts(path, position):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return pd.Timestamp(datetime.strptime(stem.split("_")[position], TS_FMT))
+
+
+def rebuild_state(at, out_dir=OUT_DIR):
+    """État de toutes les stations à l'instant `at` (UTC)."""
+    at = pd.Timestamp(at)
+    keyframes = sorted(glob.glob(os.path.join(out_dir, "velib", "keyframes", "*", "*.parquet")))
+    keyframes = [p for p in keyframes if _file_ts(p, 1) <= at]
+    if not keyframes:
+        raise ValueError(f"Aucun keyframe antérieur à {at}")
+    base_path = max(keyframes, key=lambda p: _file_ts(p, 1))
+    base_ts = _file_ts(base_path, 1)
+    state = pd.read_parquet(base_path).set_index(KEY)
+
+    # seuls les fichiers de deltas qui recoupent ]base_ts, at] sont lus
+    files = [p for p in glob.glob(os.path.join(out_dir, "velib", "deltas", "*", "*.parquet"))
+             if _file_ts(p, 2) > base_ts and _file_ts(p, 1) <= at]
+    if files:
+        deltas = pd.concat([pd.read_parquet(p) for p in files], ignore_index=True)
+        deltas = deltas[(deltas["ts"] > base_ts) & (deltas["ts"] <= at)]
+        deltas = deltas.sort_values("ts")
+        last = deltas.drop_duplicates(KEY, keep="last").set_index(KEY)
+        deleted = last["deleted"].astype(bool)
+        last = last[~deleted]
+        new = last.index.difference(state.index)
+        # colonnes statiques écrites à l'apparition de la station (nulles ensuite)
+        static = deltas.groupby(KEY)[STATIC_COLS].last()
+        dtypes = state.dtypes
+        state = state.reindex(state.index.union(new))
+        state.loc[last.index, TRACKED + ["ts"]] = last[TRACKED + ["ts"]]
+        state.loc[new, STATIC_COLS] = static.loc[new]
+        state = state.drop(index=deleted[deleted].index, errors="ignore")
+        # le reindex a promu les entiers / booléens en float / object
+        for col, dtype in dtypes.items():
+            if state[col].dtype != dtype and state[col].notna().all():
+                state[col] = state[col].astype(dtype)
+    return state.rename(columns={"ts": "last_change"}).reset_index()
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL)
+    parser.add_argument("--keyframe-every", type=int, default=KEYFRAME_EVERY)
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY)
+    parser.add_argument("--max-polls", type=int, default=None)
+    parser.add_argument("--push", action="store_true", help="pousse aussi les fichiers dans le bucket RAW")
+    parser.add_argument("--rebuild", default=None, help="reconstruit l'état à cet instant (UTC) et quitte")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    if args.rebuild:
+        state = rebuild_state(args.rebuild, args.out)
+        print(state.to_string(index=False))
+        print(f"\n✅ {len(state)} stations, {int(state['numbikesavailable'].sum())} vélos disponibles")
+        return
+
+    ingester = VelibIngester(args.out, args.keyframe_every, args.flush_every, push=args.push)
+    logging.info("Ingestion Vélib' toutes les %ds → %s", args.interval, args.out)
+    try:
+        ingester.run(args.interval, args.max_polls)
+    except KeyboardInterrupt:
+        logging.info("Arrêt demandé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+weather_client.py
+
+Client de prévisions météo journalières (weatherapi.com) :
+- cache disque avec TTL, clé = (ville, jours)
+- requêtes concurrentes pour plusieurs villes sur une session HTTP poolée
+- timeouts bornés + retries courts
+- repli sur la dernière prévision valide si l'appel échoue
+- provider "stub" déterministe pour travailler hors ligne
+
+Les colonnes renvoyées sont celles attendues par le modèle Random Forest
+(Pluie_mm, Tn_Min, Tx_Max, T_Moyenne, Vent_Moyen, Vent_Max).
+
+Exemple :
+    python weather_client.py --zones paris --days 3
+    python weather_client.py --stub --zones paris
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from http_session import make_session
+
+API_URL = "http://api.weatherapi.com/v1/forecast.json"
+API_KEY = os.getenv("WEATHER_API_KEY", "ad835a8d9bf14e938e0204738251610")
+CACHE_DIR = os.getenv("WEATHER_CACHE_DIR", ".weather_cache")
+CACHE_TTL = 1800              # secondes
+TIMEOUT = (3.05, 10)          # (connexion, lecture)
+MAX_WORKERS = 8
+
+# Centroïdes approximatifs (lat, lon) des arrondissements parisiens
+PARIS_ARRONDISSEMENTS = {
+    "Paris 01": (48.8625, 2.3364), "Paris 02": (48.8683, 2.3428),
+    "Paris 03": (48.8630, 2.3600), "Paris 04": (48.8543, 2.3576),
+    "Paris 05": (48.8445, 2.3497), "Paris 06": (48.8491, 2.3328),
+    "Paris 07": (48.8562, 2.3122), "Paris 08": (48.8727, 2.3125),
+    "Paris 09": (48.8771, 2.3375), "Paris 10": (48.8761, 2.3607),
+    "Paris 11": (48.8591, 2.3800), "Paris 12": (48.8396, 2.3876),
+    "Paris 13": (48.8283, 2.3623), "Paris 14": (48.8292, 2.3265),
+    "Paris 15": (48.8401, 2.2930), "Paris 16": (48.8637, 2.2769),
+    "Paris 17": (48.8873, 2.3067), "Paris 18": (48.8925, 2.3484),
+    "Paris 19": (48.8871, 2.3848), "Paris 20": (48.8634, 2.4011),
+}
+
+WEATHER_COLS = ["Pluie_mm", "Tn_Min", "Tx_Max", "T_Moyenne", "Vent_Moyen", "Vent_Max"]
+
+
+def zone_query(zone):
+    """Paramètre `q` pour l'API : coordonnées si la zone est connue, sinon le nom."""
+    if zone in PARIS_ARRONDISSEMENTS:
+        lat, lon = PARIS_ARRONDISSEMENTS[zone]
+        return f"{lat},{lon}"
+    return zone
+
+
+# ----------------------------------------------------------------------
+# Providers
+# ----------------------------------------------------------------------
+class WeatherApiProvider:
+    """weatherapi.com : une requête par (zone, jours)."""
+
+    def __init__(self, api_key=API_KEY, session=None, timeout=TIMEOUT):
+        self.api_key = api_key
+        self.session = session or make_session(MAX_WORKERS)
+        self.timeout = timeout
+
+    def fetch(self, zone, days):
+        params = {"key": self.api_key, "q": zone_query(zone), "days": days, "aqi": "no", "alerts": "no"}
+        r = self.session.get(API_URL, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        forecast = []
+        for day in r.json()["forecast"]["forecastday"]:
+            forecast.append({
+                "date": day["date"],
+                "Pluie_mm": day["day"]["totalprecip_mm"],
+                "Tn_Min": day["day"]["mintemp_c"],
+                "Tx_Max": day["day"]["maxtemp_c"],
+                "T_Moyenne": day["day"]["avgtemp_c"],
+                "Vent_Moyen": day["day"]["maxwind_kph"],  # ou avg si dispo
+                "Vent_Max": day["day"]["maxwind_kph"],
+            })
+        return forecast
+
+
+class StubProvider:
+    """Prévisions synthétiques déterministes (par zone et par date), sans réseau."""
+
+    def __init__(self, start=None, fail_zones=()):
+        self.start = start or date.today()
+        self.fail_zones = set(fail_zones)
+
+    def fetch(self, zone, days):
+        if zone in self.fail_zones:
+            raise requests.ConnectionError(f"stub : échec simulé pour {zone}")
+        seed = int(hashlib.sha1(f"{zone}|{self.start}".encode()).hexdigest()[:8], 16)
+        rng = np.random.default_rng(seed)
+        forecast = []
+        for i in range(days):
+            d = self.start + timedelta(days=i)
+            t_moy = 12 + 8 * np.sin(2 * np.pi * (d.timetuple().tm_yday - 110) / 365) + rng.normal(0, 2)
+            wind = abs(rng.normal(15, 5))
+            forecast.append({
+                "date": d.isoformat(),
+                "Pluie_mm": round(float(max(0.0, rng.normal(1, 2))), 1),
+                "Tn_Min": round(float(t_moy - 4), 1),
+                "Tx_Max": round(float(t_moy + 4), 1),
+                "T_Moyenne": round(float(t_moy), 1),
+                "Vent_Moyen": round(float(wind), 1),
+                "Vent_Max": round(float(wind * 1.6), 1),
+            })
+        return forecast
+
+
+# ----------------------------------------------------------------------
+# Cache disque
+# ----------------------------------------------------------------------
+class DiskTTLCache:
+    """Un fichier JSON par clé ; les entrées expirées restent lisibles pour le repli."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1("|".join(map(str, key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key, ttl=None):
+        """Valeur en cache si elle a moins de `ttl` secondes (ou quel que soit son âge si ttl=None)."""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if ttl is not None and time.time() - entry["fetched_at"] > ttl:
+            return None
+        return entry["data"]
+
+    def set(self, key, data):
+        path = self._path(key)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": list(key), "fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+class WeatherClient:
+    def __init__(self, provider=None, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_workers=MAX_WORKERS):
+        self.provider = provider or WeatherApiProvider(session=make_session(max_workers))
+        self.cache = DiskTTLCache(cache_dir)
+        self.ttl = ttl
+        self.max_workers = max_workers
+
+    def _records(self, zone, days):
+        key = (zone, days)
+        cached = self.cache.get(key, self.ttl)
+        if cached is not None:
+            return cached
+        try:
+            data = self.provider.fetch(zone, days)
+        except (requests.RequestException, KeyError, ValueError) as e:
+            stale = self.cache.get(key)
+            if stale is None:
+                raise
+            logging.warning("Météo %s indisponible (%s) : dernière prévision en cache utilisée", zone, e)
+            return stale
+        self.cache.set(key, data)
+        return data
+
+    def forecast(self, zone, days=7):
+        """Prévision journalière d'une zone (DataFrame, colonne `date` en datetime)."""
+        df = pd.DataFrame(self._records(zone, days))
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def forecast_many(self, zones, days=7):
+        """
+        Prévisions de plusieurs zones en parallèle, concaténées avec une
+        colonne `zone`. Les zones sans prévision (ni réseau ni cache) sont
+        ignorées avec un warning.
+        """
+        def one(zone):
+            try:
+                return zone, self._records(zone, days)
+            except Exception as e:
+                logging.warning("Météo %s ignorée : %s", zone, e)
+                return zone, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(one, zones))
+
+        frames = [pd.DataFrame(recs).assign(zone=zone) for zone, recs in results if recs]
+        if not frames:
+            return pd.DataFrame(columns=["zone", "date"] + WEATHER_COLS)
+        df = pd.concat(frames, ignore_index=True)
+        df["date"] = pd.to_datetime(df["date"])
+        return df[["zone", "date"] + WEATHER_COLS]
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", nargs="+", default=["Paris"],
+                        help="villes ou 'paris' pour les 20 arrondissements")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--stub", action="store_true", help="provider hors ligne")
+    parser.add_argument("--log", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log),
+                        format="%(asctime)s %(levelname)s %(message)s",
+                        datefmt="%Y-%m-%dT%H:%M:%S")
+
+    zones = list(PARIS_ARRONDISSEMENTS) if args.zones == ["paris"] else args.zones
+    client = WeatherClient(provider=StubProvider() if args.stub else None)
+    t0 = time.perf_counter()
+    df = client.forecast_many(zones, args.days)
+    print(df.to_string(index=False))
+    print(f"\n✅ {df['zone'].nunique()} zones × {args.days} jours en {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()